@@ -16,6 +16,8 @@ LOAD DATA OVERWRITE `citibike_raw.trips_2024`
     end_lng FLOAT64,
     member_casual STRING
 )
+PARTITION BY DATE(started_at)
+CLUSTER BY start_station_name, end_station_name
 FROM FILES (
   format = 'CSV',
   uris = ['gs://citibike-project-2425/raw_data/2024*.csv'], 
@@ -41,6 +43,8 @@ LOAD DATA OVERWRITE `citibike_raw.trips_2025`
     end_lng FLOAT64,
     member_casual STRING
 )
+PARTITION BY DATE(started_at)
+CLUSTER BY start_station_name, end_station_name
 FROM FILES (
   format = 'CSV',
   uris = ['gs://citibike-project-2425/raw_data/2025*.csv'], 
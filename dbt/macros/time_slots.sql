@@ -0,0 +1,52 @@
+{# 15 minute slot helpers shared by BigQuery and the local DuckDB profile #}
+
+{% macro slot_of_day(ts) %}
+    {{ return(adapter.dispatch('slot_of_day')(ts)) }}
+{% endmacro %}
+
+{% macro default__slot_of_day(ts) %}
+    CAST(FLOOR((EXTRACT(HOUR FROM {{ ts }}) * 60 + EXTRACT(MINUTE FROM {{ ts }})) / 15) AS INT64)
+{% endmacro %}
+
+{% macro duckdb__slot_of_day(ts) %}
+    CAST(FLOOR((EXTRACT(HOUR FROM {{ ts }}) * 60 + EXTRACT(MINUTE FROM {{ ts }})) / 15) AS BIGINT)
+{% endmacro %}
+
+
+{% macro slot_time(slot_date, slot) %}
+    {{ return(adapter.dispatch('slot_time')(slot_date, slot)) }}
+{% endmacro %}
+
+{% macro default__slot_time(slot_date, slot) %}
+    TIMESTAMP_ADD(CAST({{ slot_date }} AS TIMESTAMP), INTERVAL {{ slot }} * 15 MINUTE)
+{% endmacro %}
+
+{% macro duckdb__slot_time(slot_date, slot) %}
+    CAST({{ slot_date }} AS TIMESTAMP) + TO_MINUTES(CAST({{ slot }} * 15 AS BIGINT))
+{% endmacro %}
+
+
+{% macro day_slots() %}
+    {{ return(adapter.dispatch('day_slots')()) }}
+{% endmacro %}
+
+{% macro default__day_slots() %}
+    (SELECT slot FROM UNNEST(GENERATE_ARRAY(0, 95)) AS slot)
+{% endmacro %}
+
+{% macro duckdb__day_slots() %}
+    (SELECT UNNEST(GENERATE_SERIES(0, 95)) AS slot)
+{% endmacro %}
+
+
+{% macro date_spine(start_date, end_date) %}
+    {{ return(adapter.dispatch('date_spine')(start_date, end_date)) }}
+{% endmacro %}
+
+{% macro default__date_spine(start_date, end_date) %}
+    (SELECT slot_date FROM UNNEST(GENERATE_DATE_ARRAY({{ start_date }}, {{ end_date }})) AS slot_date)
+{% endmacro %}
+
+{% macro duckdb__date_spine(start_date, end_date) %}
+    (SELECT CAST(UNNEST(GENERATE_SERIES(CAST({{ start_date }} AS TIMESTAMP), CAST({{ end_date }} AS TIMESTAMP), INTERVAL 1 DAY)) AS DATE) AS slot_date)
+{% endmacro %}
@@ -1,4 +1,4 @@
-{{ config(materialized='table')}}
+{{ config(unique_key='trip_date') }}
 
 WITH top_stations AS (
     SELECT station_name FROM {{ ref('int_top_3_stations_2024')}}
@@ -7,5 +7,11 @@ WITH top_stations AS (
 
 SELECT *
 FROM {{ ref('stg_trips_2025')}}
-WHERE start_station_name IN (SELECT station_name FROM top_stations)
-    OR end_station_name IN (SELECT station_name FROM top_stations)
\ No newline at end of file
+WHERE (
+    start_station_name IN (SELECT station_name FROM top_stations)
+    OR end_station_name IN (SELECT station_name FROM top_stations)
+)
+{% if is_incremental() %}
+    -- Rebuild only from the last loaded day onwards; earlier partitions are untouched
+    AND trip_date >= (SELECT MAX(trip_date) FROM {{ this }})
+{% endif %}
\ No newline at end of file
@@ -0,0 +1,137 @@
+{{
+    config(
+        unique_key='slot_date',
+        partition_by={'field': 'slot_date', 'data_type': 'date'},
+        cluster_by=['station', 'rideable_type'],
+    )
+}}
+
+{% if is_incremental() %}
+    {% set last_slot_date = '(SELECT MAX(slot_date) FROM ' ~ this ~ ')' %}
+{% endif %}
+
+WITH top_stations AS (
+    SELECT station_name FROM {{ ref('int_top_3_stations_2024')}}
+
+),
+
+trips AS (
+    SELECT * FROM {{ ref('fct_2024_top_trips')}}
+    UNION ALL
+    SELECT * FROM {{ ref('fct_2025_top_trips')}}
+),
+
+-- Same cleaning as data_processing.preprocess / remove_outlier
+valid_trips AS (
+    SELECT
+        *,
+        {{ dbt.datediff('started_at', 'ended_at', 'second') }} / 60.0 AS duration
+    FROM trips
+    WHERE ride_id IS NOT NULL
+        AND rideable_type IS NOT NULL
+        AND started_at IS NOT NULL
+        AND ended_at IS NOT NULL
+        AND start_station_name IS NOT NULL
+        AND start_station_id IS NOT NULL
+        AND end_station_name IS NOT NULL
+        AND end_station_id IS NOT NULL
+        AND start_lat IS NOT NULL
+        AND start_lng IS NOT NULL
+        AND end_lat IS NOT NULL
+        AND end_lng IS NOT NULL
+        AND member_casual IS NOT NULL
+),
+
+-- Outlier bounds use the whole year (as each yearly file does in Python),
+-- which only touches the duration columns of the clustered top-trip tables
+duration_stats AS (
+    SELECT
+        EXTRACT(YEAR FROM trip_date) AS trip_year,
+        AVG(duration) AS mean_duration,
+        STDDEV_SAMP(duration) AS std_duration
+    FROM valid_trips
+    GROUP BY 1
+),
+
+clean_trips AS (
+    SELECT t.*
+    FROM valid_trips AS t
+    INNER JOIN duration_stats AS s
+        ON EXTRACT(YEAR FROM t.trip_date) = s.trip_year
+    WHERE ABS((t.duration - s.mean_duration) / s.std_duration) <= 2
+    {% if is_incremental() %}
+        -- Trips ending on the last loaded day may have started the day before
+        AND t.trip_date >= CAST({{ dbt.dateadd('day', -1, last_slot_date) }} AS DATE)
+    {% endif %}
+),
+
+-- Outflow (-1) / Inflow (+1)
+events AS (
+    SELECT started_at AS event_time, start_station_name AS station, rideable_type, -1 AS flow
+    FROM clean_trips
+    WHERE start_station_name IN (SELECT station_name FROM top_stations)
+
+    UNION ALL
+
+    SELECT ended_at AS event_time, end_station_name AS station, rideable_type, 1 AS flow
+    FROM clean_trips
+    WHERE end_station_name IN (SELECT station_name FROM top_stations)
+),
+
+flows AS (
+    SELECT
+        CAST(event_time AS DATE) AS slot_date,
+        {{ slot_of_day('event_time') }} AS slot,
+        station,
+        rideable_type,
+        SUM(CASE WHEN flow > 0 THEN 1 ELSE 0 END) AS inflow,
+        SUM(CASE WHEN flow < 0 THEN 1 ELSE 0 END) AS outflow
+    FROM events
+    {% if is_incremental() %}
+        WHERE CAST(event_time AS DATE) >= {{ last_slot_date }}
+    {% endif %}
+    GROUP BY 1, 2, 3, 4
+),
+
+-- Every series seen so far, not only those with events in the reprocessed
+-- days, so a quiet series still gets its slots (at the initial stock)
+series AS (
+    SELECT DISTINCT station, rideable_type
+    FROM (
+        SELECT station, rideable_type FROM flows
+        {% if is_incremental() %}
+            UNION ALL
+            SELECT station, rideable_type FROM {{ this }}
+        {% endif %}
+    ) AS seen
+),
+
+-- Every 15 min slot of every day for every series, like the reindex in Python
+spine AS (
+    SELECT d.slot_date, s.slot, r.station, r.rideable_type
+    FROM {{ date_spine('(SELECT MIN(slot_date) FROM flows)', '(SELECT MAX(slot_date) FROM flows)') }} AS d
+    CROSS JOIN {{ day_slots() }} AS s
+    CROSS JOIN series AS r
+)
+
+SELECT
+    spine.slot_date,
+    spine.slot,
+    {{ slot_time('spine.slot_date', 'spine.slot') }} AS slot_time,
+    spine.station,
+    spine.rideable_type,
+    COALESCE(flows.inflow, 0) AS inflow,
+    COALESCE(flows.outflow, 0) AS outflow,
+    COALESCE(flows.inflow, 0) - COALESCE(flows.outflow, 0) AS net_flow,
+    -- Initial stock: Restore at every 00:00
+    {{ var('initial_stock') }} + SUM(COALESCE(flows.inflow, 0) - COALESCE(flows.outflow, 0)) OVER (
+        PARTITION BY spine.station, spine.rideable_type, spine.slot_date
+        ORDER BY spine.slot
+        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+    ) AS stock
+FROM spine
+LEFT JOIN flows
+    ON spine.slot_date = flows.slot_date
+    AND spine.slot = flows.slot
+    AND spine.station = flows.station
+    AND spine.rideable_type = flows.rideable_type
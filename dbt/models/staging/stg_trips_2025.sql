@@ -3,6 +3,7 @@ SELECT
     rideable_type,
     CAST(started_at AS TIMESTAMP) as started_at,
     CAST(ended_at AS TIMESTAMP) as ended_at,
+    CAST(CAST(started_at AS TIMESTAMP) AS DATE) as trip_date,
     start_station_name,
     start_station_id,
     end_station_name,
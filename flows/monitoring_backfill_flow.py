@@ -0,0 +1,205 @@
+import datetime
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import psycopg2
+from prefect import flow, task
+from psycopg2.extras import execute_values
+
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+import flows.monitoring_daily_flow as daily_flow  # noqa: E402
+import flows.monitoring_data_flow as data_flow  # noqa: E402
+import flows.monitoring_db as monitoring_db  # noqa: E402
+import flows.monitoring_performance_flow as performance_flow  # noqa: E402
+import flows.monitoring_sampling as monitoring_sampling  # noqa: E402
+from src.features import scaled_date  # noqa: E402
+from src.model_loader import FileSource  # noqa: E402
+
+logging.basicConfig(
+    # Configure basic logging
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+)
+
+CONNECTION_STRING_DB = data_flow.CONNECTION_STRING_DB
+
+# Days are written (and marked done) in batches of this size
+BATCH_DAYS = 7
+
+create_table_statement = """
+create table if not exists monitoring_backfill_progress(
+    run_key TEXT,
+    day DATE,
+    PRIMARY KEY (run_key, day)
+);
+"""
+
+# Reference frames of a worker process, set once by the pool initializer
+_reference = {}
+
+
+def init_worker(ref_data, ref_performance):
+    _reference["data"] = ref_data
+    _reference["performance"] = ref_performance
+
+
+def evaluate_day(day, current_day):
+    """Drift and performance rows for one day, computed in a worker process"""
+
+    report_dict = data_flow.run_evidently.fn(
+        _reference["data"], current_day.drop(columns=["predict"]), day, 0
+    )
+    summary_row, column_rows = data_flow.drift_rows(report_dict, day)
+
+    report_dict = performance_flow.run_evidently.fn(
+        _reference["performance"], current_day, day, 0
+    )
+    performance_row = performance_flow.performance_row(report_dict, day)
+    station_rows = performance_flow.station_performance_rows(current_day, day)
+
+    return day, summary_row, column_rows, performance_row, station_rows
+
+
+@task(name="Prepare progress table")
+def prep_progress_table():
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            cur.execute(create_table_statement)
+            conn.commit()
+
+
+@task(name="Find completed days")
+def completed_days(run_key):
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT day FROM monitoring_backfill_progress WHERE run_key = %s",
+                (run_key,),
+            )
+            return {row[0] for row in cur.fetchall()}
+
+
+def write_results(results, run_key):
+    """Bulk upsert the metrics of several days and mark them done, atomically"""
+
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            monitoring_db.write_metrics(
+                cur,
+                summary_rows=[summary_row for _, summary_row, _, _, _ in results],
+                column_rows=[row for _, _, rows, _, _ in results for row in rows],
+                performance_rows=[row for _, _, _, row, _ in results],
+                version=run_key,
+                station_performance_rows=[
+                    pair for *_, pairs in results for pair in pairs
+                ],
+            )
+            execute_values(
+                cur,
+                "INSERT INTO monitoring_backfill_progress (run_key, day) VALUES %s ON CONFLICT DO NOTHING",
+                [(run_key, day.date()) for day, *_ in results],
+            )
+            conn.commit()
+
+
+@task(name="Evaluate days")
+def evaluate_days(ref_data, ref_performance, current_processed, days, run_key, workers):
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(ref_data, ref_performance),
+    ) as executor:
+        # Workers only receive the slice of their own day
+        futures = [
+            executor.submit(
+                evaluate_day,
+                day,
+                current_processed[current_processed["date"] == scaled_date(day)],
+            )
+            for day in days
+        ]
+
+        batch = []
+        for future in as_completed(futures):
+            batch.append(future.result())
+
+            if len(batch) == BATCH_DAYS:
+                write_results(batch, run_key)
+                logging.info("%d days written", len(batch))
+                batch = []
+
+        if batch:
+            write_results(batch, run_key)
+            logging.info("%d days written", len(batch))
+
+
+@flow(name="Monitoring backfill", log_prints=True)
+def monitoring_backfill(
+    start_date,
+    end_date,
+    workers=None,
+    reference_file=data_flow.REFERENCE_FILE,
+    current_file=data_flow.CURRENT_FILE,
+    model_file="bin/model.bin",
+    reference_size=monitoring_sampling.SAMPLE_SIZE,
+):
+    data_flow.prep_db()
+    performance_flow.prep_db()
+    prep_progress_table()
+
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+
+    # Progress (and the metrics' model_version) is per model version: a new model
+    # re-evaluates every day, an interrupted run with the same model resumes
+    # with the missing days
+    run_key = FileSource(model_file).fingerprint()
+    done = completed_days(run_key)
+
+    days = [
+        start + datetime.timedelta(days=i)
+        for i in range((end - start).days + 1)
+        if start + datetime.timedelta(days=i) not in done
+    ]
+    if not days:
+        logging.info("Nothing to backfill for model %s", run_key)
+        return
+
+    ref_processed, summary = daily_flow.load_reference(reference_file, model_file)
+    ref_data, ref_performance = daily_flow.sample_reference(
+        ref_processed, summary["key"], reference_size
+    )
+
+    # Featurize and score the whole range once
+    watermark = days[0] - datetime.timedelta(days=1)
+    trips = daily_flow.read_new_trips(
+        current_file, watermark, until=days[-1], stations=summary["stations"]
+    )
+    current_processed, available = daily_flow.featurize(trips, summary, watermark)
+    current_processed = performance_flow.prediction(current_processed)
+
+    available = set(available)
+    days = [
+        datetime.datetime.combine(day, datetime.time())
+        for day in days
+        if day in available
+    ]
+
+    evaluate_days(
+        ref_data,
+        ref_performance,
+        current_processed,
+        days,
+        run_key,
+        workers or os.cpu_count(),
+    )
+
+
+if __name__ == "__main__":
+    monitoring_backfill(*sys.argv[1:3], *[int(arg) for arg in sys.argv[3:4]])
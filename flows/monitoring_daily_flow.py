@@ -0,0 +1,363 @@
+import datetime
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import psycopg2
+from prefect import flow, task
+
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+import flows.monitoring_data_flow as data_flow  # noqa: E402
+import flows.monitoring_performance_flow as performance_flow  # noqa: E402
+import flows.monitoring_sampling as monitoring_sampling  # noqa: E402
+from src import checkpoint, trip_lake  # noqa: E402
+from src.data_processing import (  # noqa: E402
+    duration_stats,
+    feature_engineering,
+    feature_time_series,
+    preprocess,
+    read_trips,
+    remove_outlier,
+    top_stations,
+    wide_to_long,
+)
+from src.model_loader import FileSource  # noqa: E402
+
+logging.basicConfig(
+    # Configure basic logging
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s]: %(message)s",
+)
+
+CONNECTION_STRING_DB = data_flow.CONNECTION_STRING_DB
+
+# Persisted reference features/predictions and summary statistics
+STATE_DIR = Path("data/monitoring")
+REFERENCE_FEATURES = STATE_DIR / "reference.parquet"
+REFERENCE_SUMMARY = STATE_DIR / "reference_summary.json"
+
+# Fixed-size samples of the reference the daily checks compare against, and
+# how closely they track the full reference
+REFERENCE_DATA_SAMPLE = STATE_DIR / "reference_sample_data.parquet"
+REFERENCE_PERFORMANCE_SAMPLE = STATE_DIR / "reference_sample_performance.parquet"
+REFERENCE_FIDELITY = STATE_DIR / "reference_fidelity.json"
+
+FLOW_NAME = "daily_monitoring"
+
+# Trip lake the daily runs read (make lake, see trip_lake)
+LAKE_DIR = "data/lake"
+CHUNK_SIZE = 500_000
+
+create_table_statement = """
+create table if not exists monitoring_watermark(
+    flow_name TEXT PRIMARY KEY,
+    last_day DATE
+);
+"""
+
+
+@task(name="Prepare watermark table")
+def prep_watermark_table():
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            cur.execute(create_table_statement)
+            conn.commit()
+
+
+def reference_key(reference_file, model_file="bin/model.bin"):
+    # The reference data and the model whose predictions it holds
+    return (
+        f"{checkpoint.file_key(reference_file)}-{FileSource(model_file).fingerprint()}"
+    )
+
+
+@task(name="Load reference")
+def load_reference(reference_file, model_file="bin/model.bin"):
+    """
+    Processed reference with predictions, plus the summary the current data is
+    featurized with (station set, duration statistics). Built once per
+    reference file and model, then read from data/monitoring/ on later runs.
+    """
+
+    key = reference_key(reference_file, model_file)
+
+    if REFERENCE_FEATURES.exists() and REFERENCE_SUMMARY.exists():
+        summary = json.loads(REFERENCE_SUMMARY.read_text())
+        if summary.get("key") == key:
+            return pd.read_parquet(REFERENCE_FEATURES), summary
+
+    df = preprocess(pd.read_csv(reference_file))
+    duration_mean, duration_std = duration_stats(df)
+    df = remove_outlier(df, duration_mean, duration_std)
+
+    summary = {
+        "key": key,
+        "stations": top_stations(df),
+        "duration_mean": duration_mean,
+        "duration_std": duration_std,
+    }
+
+    df = feature_time_series(df, summary["stations"])
+    df = wide_to_long(df)
+    df = feature_engineering(df)
+    df = performance_flow.prediction.fn(df)
+
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(REFERENCE_FEATURES, index=False)
+    REFERENCE_SUMMARY.write_text(json.dumps(summary))
+
+    return df, summary
+
+
+@task(name="Sample reference")
+def sample_reference(
+    ref_processed,
+    key,
+    size=monitoring_sampling.SAMPLE_SIZE,
+    seed=monitoring_sampling.SEED,
+):
+    """
+    Stratified samples of the reference for the drift (all of it) and the
+    performance (its validation part) checks. Built once per reference (its
+    `key`, see reference_key), size, seed and sampling version, together with
+    their fidelity report, then read from data/monitoring/.
+    """
+
+    if REFERENCE_FIDELITY.exists():
+        fidelity = json.loads(REFERENCE_FIDELITY.read_text())
+        built_for = (
+            fidelity.get("version"),
+            fidelity.get("key"),
+            fidelity["size"],
+            fidelity["seed"],
+        )
+        if built_for == (monitoring_sampling.VERSION, key, size, seed):
+            return (
+                pd.read_parquet(REFERENCE_DATA_SAMPLE),
+                pd.read_parquet(REFERENCE_PERFORMANCE_SAMPLE),
+            )
+
+    ref_data = ref_processed.drop(columns=["predict"])
+
+    # Only consider validation set as reference
+    split_idx = int(len(ref_processed) * 0.8)
+    ref_performance = ref_processed.iloc[split_idx:]
+
+    data_sample = monitoring_sampling.stratified_sample(ref_data, size, seed)
+    performance_sample = monitoring_sampling.stratified_sample(
+        ref_performance, size, seed
+    )
+
+    fidelity = {
+        "version": monitoring_sampling.VERSION,
+        "key": key,
+        "size": size,
+        "seed": seed,
+        "data": monitoring_sampling.fidelity_report(ref_data, data_sample),
+        "performance": monitoring_sampling.fidelity_report(
+            ref_performance, performance_sample
+        ),
+    }
+    for check in ("data", "performance"):
+        worst = max(fidelity[check]["columns"].items(), key=lambda kv: kv[1]["ks"])
+        logging.info(
+            "%s reference sample: largest KS %.4f (%s)", check, worst[1]["ks"], worst[0]
+        )
+
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    data_sample.to_parquet(REFERENCE_DATA_SAMPLE)
+    performance_sample.to_parquet(REFERENCE_PERFORMANCE_SAMPLE)
+    REFERENCE_FIDELITY.write_text(json.dumps(fidelity, indent=2))
+
+    return data_sample, performance_sample
+
+
+@task(name="Read watermark")
+def read_watermark():
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT last_day FROM monitoring_watermark WHERE flow_name = %s",
+                (FLOW_NAME,),
+            )
+            row = cur.fetchone()
+
+    return row[0] if row else None
+
+
+@task(name="Save watermark")
+def save_watermark(day):
+    with psycopg2.connect(CONNECTION_STRING_DB) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO monitoring_watermark (flow_name, last_day) VALUES (%s, %s) ON CONFLICT (flow_name) DO UPDATE SET last_day = EXCLUDED.last_day",
+                (FLOW_NAME, day),
+            )
+            conn.commit()
+
+
+@task(name="Read new trips")
+def read_new_trips(file, watermark, until=None, stations=None):
+    """
+    Trips ending on or after the day before the watermark. That day is only
+    lag context: the watermark day itself must be complete so the first slots
+    of the next day get their lag features. With `until`, trips starting more
+    than a day after it are skipped (the next day only supplies targets). With
+    `stations`, only trips starting or ending there are kept.
+
+    A lake directory is read by partition, so the cost follows the days read.
+    A csv is parsed whole on every call (O(year to date)); only the one-off
+    range backfill reads one, daily runs require the lake.
+    """
+
+    since = None if watermark is None else watermark - datetime.timedelta(days=1)
+    before = None if until is None else until + datetime.timedelta(days=2)
+
+    if os.path.isdir(file):
+        # Trip lake: only the partitions of these stations and days are read.
+        # Trips are partitioned by start day; a day of lookback covers trips
+        # of up to a day, longer ones are duration outliers anyway.
+        df = read_trips(
+            file,
+            stations,
+            None if since is None else since - datetime.timedelta(days=1),
+            None if before is None else before - datetime.timedelta(days=1),
+        )
+        if since is not None:
+            df = df[df["ended_at"] >= pd.Timestamp(since)]
+        if before is not None:
+            df = df[df["started_at"] < pd.Timestamp(before)]
+        return df.reset_index(drop=True)
+
+    if watermark is None and until is None and stations is None:
+        return pd.read_csv(file)
+
+    chunks = []
+    for chunk in pd.read_csv(file, chunksize=CHUNK_SIZE):
+        # Timestamps are ISO strings, so a string comparison filters before parsing
+        if since is not None:
+            chunk = chunk[chunk["ended_at"] >= str(since)]
+        if before is not None:
+            chunk = chunk[chunk["started_at"] < str(before)]
+        if stations is not None:
+            chunk = chunk[
+                chunk["start_station_name"].isin(stations)
+                | chunk["end_station_name"].isin(stations)
+            ]
+        chunks.append(chunk)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def complete_until(lake, today=None):
+    """
+    First day that may still be incomplete: the newest partition of the lake
+    (it may have been written partway through that day), or today if earlier.
+    Only the days before it are evaluated.
+    """
+
+    today = datetime.date.today() if today is None else today
+    newest = trip_lake.last_date(lake)
+    return today if newest is None else min(newest, today)
+
+
+@task(name="Featurize new trips")
+def featurize(df, summary, watermark, until=None):
+    """
+    Features of the new trips and the days to evaluate: those after the
+    watermark and, with `until`, before it (see complete_until).
+    """
+
+    df = preprocess(df)
+    df = remove_outlier(df, summary["duration_mean"], summary["duration_std"])
+
+    # A day after the last trip start only holds returns of earlier trips
+    last_day = df["started_at"].max().date()
+
+    df = feature_time_series(df, summary["stations"])
+
+    days = sorted({ts.date() for ts in df.index.normalize()})
+    days = [
+        day
+        for day in days
+        if day <= last_day
+        and (watermark is None or day > watermark)
+        and (until is None or day < until)
+    ]
+
+    df = wide_to_long(df)
+    df = feature_engineering(df)
+
+    return df, days
+
+
+@flow(name="Daily monitoring", log_prints=True)
+def daily_monitoring(
+    reference_file=data_flow.REFERENCE_FILE,
+    current_file=LAKE_DIR,
+    reference_size=monitoring_sampling.SAMPLE_SIZE,
+):
+    """
+    Drift and performance of the complete days after the watermark (see
+    complete_until). `current_file` must be a trip lake directory, so a run
+    only reads the days it evaluates.
+    """
+
+    if not os.path.isdir(current_file):
+        raise ValueError(
+            f"{current_file} is not a trip lake directory; build one with `make lake`"
+        )
+
+    data_flow.prep_db()
+    performance_flow.prep_db()
+    prep_watermark_table()
+
+    ref_processed, summary = load_reference(reference_file)
+    ref_data, ref_performance = sample_reference(
+        ref_processed, summary["key"], reference_size
+    )
+
+    watermark = read_watermark()
+    trips = read_new_trips(current_file, watermark, stations=summary["stations"])
+
+    if trips.empty:
+        logging.info("No new trips after %s", watermark)
+        return
+
+    current_processed, days = featurize(
+        trips, summary, watermark, complete_until(current_file)
+    )
+    current_processed = performance_flow.prediction(current_processed)
+
+    for day in days:
+        day = datetime.datetime.combine(day, datetime.time())
+
+        report_dict = data_flow.run_evidently(
+            ref_data, current_processed.drop(columns=["predict"]), day, 0
+        )
+        data_flow.save_drift_to_db(report_dict, day, 0)
+
+        report_dict = performance_flow.run_evidently(
+            ref_performance, current_processed, day, 0
+        )
+        performance_flow.save_drift_to_db(
+            report_dict,
+            day,
+            0,
+            performance_flow.station_performance_rows(current_processed, day),
+        )
+
+        # Advance per day, so an interrupted run resumes after the last saved day
+        save_watermark(day.date())
+
+        logging.info("%s evaluated", day.date())
+
+
+if __name__ == "__main__":
+    daily_monitoring(*sys.argv[1:3])
@@ -14,6 +14,8 @@ root_path = Path(__file__).resolve().parent.parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+import flows.monitoring_db as monitoring_db  # noqa: E402
+import flows.monitoring_sampling as monitoring_sampling  # noqa: E402
 from src.data_processing import (  # noqa: E402
     feature_engineering,
     feature_time_series,
@@ -21,6 +23,7 @@ from src.data_processing import (  # noqa: E402
     remove_outlier,
     wide_to_long,
 )
+from src.features import scaled_date  # noqa: E402
 
 logging.basicConfig(
     # Configure basic logging
@@ -32,27 +35,9 @@ logging.basicConfig(
 CONNECTION_STRING = "host=localhost port=5432 user=postgres password=example"
 CONNECTION_STRING_DB = CONNECTION_STRING + " dbname=evidently"
 
-# SQL statement to create the metrics tables.
-create_table_statement = """
-create table if not exists column_drift(
-	timestamp TIMESTAMP,
-	column_name TEXT,
-	drift_score FLOAT,
-    is_drift BOOLEAN,
-    PRIMARY KEY (timestamp, column_name)
-);
-
-create table if not exists dataset_summary(
-    timestamp TIMESTAMP PRIMARY KEY,
-    number_of_drifted_columns INTEGER,
-    share_of_drifted_columns FLOAT,
-    dataset_drift BOOLEAN
-);
-"""
-
-# data
-reference_data = pd.read_csv("data/2024_top3.csv")
-raw_data = pd.read_csv("data/2025.csv")
+# data (read inside the flows, so importing the tasks stays cheap)
+REFERENCE_FILE = "data/2024_top3.csv"
+CURRENT_FILE = "data/2025.csv"
 
 
 num_features = [
@@ -80,7 +65,7 @@ report = Report(metrics=[DataDriftPreset()])
 def prep_db():
     """
     Prefect task to set up the database. It creates the 'evidently' database if it
-    doesn't exist and then creates the 'dummy_metrics' table.
+    doesn't exist and then creates (or migrates) the metrics schema of monitoring_db.
     """
 
     conn = psycopg2.connect(CONNECTION_STRING)
@@ -100,7 +85,7 @@ def prep_db():
 
     with psycopg2.connect(CONNECTION_STRING_DB) as conn:
         with conn.cursor() as cur:
-            cur.execute(create_table_statement)
+            monitoring_db.prep_schema(cur)
             conn.commit()
 
 
@@ -116,15 +101,8 @@ def data_preprocessing(df):
 
 @task(name="Calculate metrics and save it to postgresql")
 def run_evidently(ref_data, cur_data, month, i):
-    start_ts = pd.to_datetime("2024-01-01").value
-    end_ts = pd.to_datetime("2025-01-01").value
-
-    target_date = pd.Timestamp(month + datetime.timedelta(days=i)).normalize()
-    target_ts = target_date.value
-
-    scaled_date = (target_ts - start_ts) / (end_ts - start_ts)
-
-    current_data = cur_data[cur_data["date"] == scaled_date]
+    target_date = month + datetime.timedelta(days=i)
+    current_data = cur_data[cur_data["date"] == scaled_date(target_date)]
 
     current_dataset = Dataset.from_pandas(current_data, data_definition=data_definition)
     ref_dataset = Dataset.from_pandas(ref_data, data_definition=data_definition)
@@ -134,10 +112,8 @@ def run_evidently(ref_data, cur_data, month, i):
     return run.dict()
 
 
-@task(name="Save drift metrics to database")
-def save_drift_to_db(report_dict, month, i):
+def drift_rows(report_dict, target_date):
     metrics = report_dict["metrics"]
-    target_date = month + datetime.timedelta(days=i)
 
     # Data set Summary
     summary_data = metrics[0]["value"]
@@ -157,18 +133,21 @@ def save_drift_to_db(report_dict, month, i):
 
         column_results.append((target_date, col_name, drift_score, is_drifted))
 
+    return (target_date, n_drifted, share_drifted, dataset_drift), column_results
+
+
+@task(name="Save drift metrics to database")
+def save_drift_to_db(report_dict, month, i):
+    target_date = month + datetime.timedelta(days=i)
+    summary_row, column_results = drift_rows(report_dict, target_date)
+
     with psycopg2.connect(CONNECTION_STRING_DB) as conn:
         with conn.cursor() as cur:
-            # Summary insert
-            cur.execute(
-                "INSERT INTO dataset_summary (timestamp, number_of_drifted_columns, share_of_drifted_columns, dataset_drift) VALUES (%s, %s, %s, %s) ON CONFLICT (timestamp) DO UPDATE SET number_of_drifted_columns = EXCLUDED.number_of_drifted_columns",
-                (target_date, n_drifted, share_drifted, dataset_drift),
-            )
-
-            # Column drift insert
-            cur.executemany(
-                "INSERT INTO column_drift (timestamp, column_name, drift_score, is_drift) VALUES (%s, %s, %s, %s) ON CONFLICT (timestamp, column_name) DO NOTHING",
-                column_results,
+            monitoring_db.write_metrics(
+                cur,
+                summary_rows=[summary_row],
+                column_rows=column_results,
+                version=monitoring_db.model_version(),
             )
             conn.commit()
 
@@ -177,7 +156,11 @@ def save_drift_to_db(report_dict, month, i):
 def batch_monitoring_backfill():
     prep_db()
 
+    reference_data = pd.read_csv(REFERENCE_FILE)
+    raw_data = pd.read_csv(CURRENT_FILE)
+
     ref_processed = data_preprocessing(reference_data)
+    ref_processed = monitoring_sampling.stratified_sample(ref_processed)
     current_processed = data_preprocessing(raw_data)
 
     month = datetime.datetime(2025, int(sys.argv[1]), 1, 0, 0)
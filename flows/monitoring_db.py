@@ -0,0 +1,290 @@
+import datetime
+import sys
+from pathlib import Path
+
+from psycopg2.extras import execute_values
+
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.model_loader import FileSource  # noqa: E402
+
+# Metrics schema of the monitoring flows. Metric tables are range-partitioned
+# by month on `timestamp`, carry station and model version dimensions, and
+# have weekly and monthly rollups that every write refreshes for the periods
+# it touched, so dashboards read a few pre-aggregated rows per period.
+
+# Station value of metrics computed over all stations
+ALL_STATIONS = "__all__"
+
+# Table -> metric columns, extra key columns and rollup aggregates
+METRICS = {
+    "column_drift": {
+        "columns": {
+            "column_name": "TEXT",
+            "drift_score": "FLOAT",
+            "is_drift": "BOOLEAN",
+        },
+        "keys": ["column_name"],
+        "rollup": {
+            "drift_score_avg": ("FLOAT", "avg(drift_score)"),
+            "drift_score_max": ("FLOAT", "max(drift_score)"),
+            "drifted_days": ("INTEGER", "count(*) FILTER (WHERE is_drift)"),
+        },
+    },
+    "dataset_summary": {
+        "columns": {
+            "number_of_drifted_columns": "INTEGER",
+            "share_of_drifted_columns": "FLOAT",
+            "dataset_drift": "BOOLEAN",
+        },
+        "keys": [],
+        "rollup": {
+            "number_of_drifted_columns_avg": (
+                "FLOAT",
+                "avg(number_of_drifted_columns)",
+            ),
+            "share_of_drifted_columns_avg": ("FLOAT", "avg(share_of_drifted_columns)"),
+            "drifted_days": ("INTEGER", "count(*) FILTER (WHERE dataset_drift)"),
+        },
+    },
+    "model_performance": {
+        "columns": {"rmse": "FLOAT", "mae": "FLOAT", "abs_error_max": "FLOAT"},
+        "keys": [],
+        "rollup": {
+            "rmse_avg": ("FLOAT", "avg(rmse)"),
+            "mae_avg": ("FLOAT", "avg(mae)"),
+            "abs_error_max": ("FLOAT", "max(abs_error_max)"),
+        },
+    },
+}
+
+# Rollup table suffix -> date_trunc unit
+GRAINS = {"weekly": "week", "monthly": "month"}
+
+DIMENSIONS = ["station", "model_version"]
+
+
+def model_version(model_file="bin/model.bin"):
+    # Same version string as the serving ModelHolder reports for a model file
+    return FileSource(model_file).fingerprint()
+
+
+def schema_statements():
+    statements = []
+    for table, spec in METRICS.items():
+        key = ["timestamp", *DIMENSIONS, *spec["keys"]]
+        columns = ",\n    ".join(
+            f"{name} {kind}" for name, kind in spec["columns"].items()
+        )
+        statements.append(
+            f"""
+create table if not exists {table}(
+    timestamp TIMESTAMP NOT NULL,
+    station TEXT NOT NULL DEFAULT '{ALL_STATIONS}',
+    model_version TEXT NOT NULL DEFAULT '',
+    {columns},
+    PRIMARY KEY ({", ".join(key)})
+) PARTITION BY RANGE (timestamp);
+
+create index if not exists {table}_dimensions_idx
+    on {table} (station, model_version, timestamp);
+"""
+        )
+
+        rollup_key = ["period_start", *DIMENSIONS, *spec["keys"]]
+        key_columns = "".join(
+            f"    {name} {spec['columns'][name]} NOT NULL,\n" for name in spec["keys"]
+        )
+        aggregates = ",\n    ".join(
+            f"{name} {kind}" for name, (kind, _) in spec["rollup"].items()
+        )
+        for grain in GRAINS:
+            statements.append(
+                f"""
+create table if not exists {table}_{grain}(
+    period_start TIMESTAMP NOT NULL,
+    station TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+{key_columns}    days INTEGER,
+    {aggregates},
+    PRIMARY KEY ({", ".join(rollup_key)})
+);
+
+create index if not exists {table}_{grain}_dimensions_idx
+    on {table}_{grain} (station, model_version, period_start);
+"""
+            )
+
+    return statements
+
+
+def month_start(day):
+    return datetime.datetime(day.year, day.month, 1)
+
+
+def next_month(start):
+    return datetime.datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def partition_name(table, start):
+    return f"{table}_{start.year}_{start.month:02d}"
+
+
+def ensure_partitions(cur, days):
+    """Create the monthly partitions of every metric table holding `days`"""
+
+    for start in sorted({month_start(day) for day in days}):
+        for table in METRICS:
+            cur.execute(
+                f"create table if not exists {partition_name(table, start)} "
+                f"partition of {table} for values from ('{start:%Y-%m-%d}') "
+                f"to ('{next_month(start):%Y-%m-%d}')"
+            )
+
+
+def migrate_legacy_table(cur, table):
+    # A table from before partitioning is moved into the partitioned one
+    cur.execute(
+        "SELECT relkind FROM pg_class WHERE relname = %s "
+        "AND relnamespace = 'public'::regnamespace",
+        (table,),
+    )
+    row = cur.fetchone()
+    if row is None or row[0] != "r":
+        return None
+
+    cur.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    cur.execute(
+        f"ALTER TABLE {table}_legacy RENAME CONSTRAINT {table}_pkey "
+        f"TO {table}_legacy_pkey"
+    )
+    return f"{table}_legacy"
+
+
+def prep_schema(cur):
+    """Create (or migrate to) the partitioned metric tables and their rollups"""
+
+    legacy = {table: migrate_legacy_table(cur, table) for table in METRICS}
+
+    for statement in schema_statements():
+        cur.execute(statement)
+
+    for table, legacy_table in legacy.items():
+        if legacy_table is None:
+            continue
+
+        cur.execute(f"SELECT DISTINCT timestamp::date FROM {legacy_table}")
+        days = [row[0] for row in cur.fetchall()]
+        ensure_partitions(cur, days)
+
+        columns = ", ".join(["timestamp", *METRICS[table]["columns"]])
+        cur.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {legacy_table}"
+        )
+        cur.execute(f"DROP TABLE {legacy_table}")
+        refresh_rollups(cur, days, tables=[table])
+
+
+def upsert(cur, table, rows, station, version):
+    """Rows as built by the flows: (timestamp, *metric columns)"""
+
+    spec = METRICS[table]
+    metric_columns = list(spec["columns"])
+    key = ["timestamp", *DIMENSIONS, *spec["keys"]]
+    updates = ", ".join(
+        f"{name} = EXCLUDED.{name}" for name in metric_columns if name not in key
+    )
+
+    execute_values(
+        cur,
+        f"INSERT INTO {table} (timestamp, station, model_version, "
+        f"{', '.join(metric_columns)}) VALUES %s "
+        f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}",
+        [(row[0], station, version, *row[1:]) for row in rows],
+    )
+
+
+def period_bounds(days, unit):
+    # [first period start, end of the last period) covering `days`
+    days = sorted(days)
+    if unit == "week":
+        first = datetime.datetime.combine(days[0], datetime.time())
+        first -= datetime.timedelta(days=first.weekday())
+        last = datetime.datetime.combine(days[-1], datetime.time())
+        last += datetime.timedelta(days=7 - last.weekday())
+        return first, last
+
+    return month_start(days[0]), next_month(month_start(days[-1]))
+
+
+def refresh_rollups(cur, days, tables=METRICS):
+    """Recompute the weekly and monthly rows of the periods containing `days`"""
+
+    if not days:
+        return
+
+    for table in tables:
+        spec = METRICS[table]
+        group = [*DIMENSIONS, *spec["keys"]]
+        names = ", ".join(spec["rollup"])
+        expressions = ", ".join(expr for _, expr in spec["rollup"].values())
+        updates = ", ".join(
+            f"{name} = EXCLUDED.{name}" for name in ["days", *spec["rollup"]]
+        )
+
+        for grain, unit in GRAINS.items():
+            start, end = period_bounds(days, unit)
+            cur.execute(
+                f"INSERT INTO {table}_{grain} "
+                f"(period_start, {', '.join(group)}, days, {names}) "
+                f"SELECT date_trunc('{unit}', timestamp), {', '.join(group)}, "
+                f"count(*), {expressions} FROM {table} "
+                "WHERE timestamp >= %s AND timestamp < %s "
+                f"GROUP BY 1, {', '.join(group)} "
+                f"ON CONFLICT (period_start, {', '.join(group)}) DO UPDATE SET {updates}",
+                (start, end),
+            )
+
+
+def write_metrics(
+    cur,
+    summary_rows=(),
+    column_rows=(),
+    performance_rows=(),
+    version="",
+    station=ALL_STATIONS,
+    station_performance_rows=(),
+):
+    """
+    Upsert metric rows of some days and refresh the rollups they change. The
+    rows are of `station`; `station_performance_rows` are (station, row)
+    pairs of model_performance rows of single stations.
+    """
+
+    rows = {
+        "dataset_summary": list(summary_rows),
+        "column_drift": list(column_rows),
+        "model_performance": list(performance_rows),
+    }
+    by_station = {}
+    for name, row in station_performance_rows:
+        by_station.setdefault(name, []).append(row)
+
+    days = {row[0] for table_rows in rows.values() for row in table_rows}
+    days |= {row[0] for station_rows in by_station.values() for row in station_rows}
+    if not days:
+        return
+
+    ensure_partitions(cur, days)
+    for table, table_rows in rows.items():
+        if table_rows:
+            upsert(cur, table, table_rows, station, version)
+    for name, station_rows in by_station.items():
+        upsert(cur, "model_performance", station_rows, name, version)
+
+    written = [table for table in rows if rows[table]]
+    if by_station and "model_performance" not in written:
+        written.append("model_performance")
+    refresh_rollups(cur, days, tables=written)
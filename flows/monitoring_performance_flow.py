@@ -5,6 +5,7 @@ import pickle
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import psycopg2
 from evidently import DataDefinition, Dataset, Regression, Report
@@ -15,6 +16,8 @@ root_path = Path(__file__).resolve().parent.parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+import flows.monitoring_db as monitoring_db  # noqa: E402
+import flows.monitoring_sampling as monitoring_sampling  # noqa: E402
 from src.data_processing import (  # noqa: E402
     feature_engineering,
     feature_time_series,
@@ -22,6 +25,7 @@ from src.data_processing import (  # noqa: E402
     remove_outlier,
     wide_to_long,
 )
+from src.features import scaled_date  # noqa: E402
 
 logging.basicConfig(
     # Configure basic logging
@@ -33,19 +37,9 @@ logging.basicConfig(
 CONNECTION_STRING = "host=localhost port=5432 user=postgres password=example"
 CONNECTION_STRING_DB = CONNECTION_STRING + " dbname=evidently"
 
-# SQL statement to create the metrics tables.
-create_table_statement = """
-create table if not exists model_performance(
-	timestamp TIMESTAMP PRIMARY KEY,
-	rmse FLOAT,
-	mae FLOAT,
-    abs_error_max FLOAT
-);
-"""
-
-# data
-reference_data = pd.read_csv("data/2024_top3.csv")
-raw_data = pd.read_csv("data/2025.csv")
+# data (read inside the flows, so importing the tasks stays cheap)
+REFERENCE_FILE = "data/2024_top3.csv"
+CURRENT_FILE = "data/2025.csv"
 
 
 num_features = [
@@ -73,7 +67,7 @@ report = Report(metrics=[RegressionPreset()])
 def prep_db():
     """
     Prefect task to set up the database. It creates the 'evidently' database if it
-    doesn't exist and then creates the 'dummy_metrics' table.
+    doesn't exist and then creates (or migrates) the metrics schema of monitoring_db.
     """
 
     conn = psycopg2.connect(CONNECTION_STRING)
@@ -93,7 +87,7 @@ def prep_db():
 
     with psycopg2.connect(CONNECTION_STRING_DB) as conn:
         with conn.cursor() as cur:
-            cur.execute(create_table_statement)
+            monitoring_db.prep_schema(cur)
             conn.commit()
 
 
@@ -125,15 +119,8 @@ def prediction(df):
 
 @task(name="Calculate metrics and save it to postgresql")
 def run_evidently(ref_data, cur_data, month, i):
-    start_ts = pd.to_datetime("2024-01-01").value
-    end_ts = pd.to_datetime("2025-01-01").value
-
-    target_date = pd.Timestamp(month + datetime.timedelta(days=i)).normalize()
-    target_ts = target_date.value
-
-    scaled_date = (target_ts - start_ts) / (end_ts - start_ts)
-
-    current_data = cur_data[cur_data["date"] == scaled_date]
+    target_date = month + datetime.timedelta(days=i)
+    current_data = cur_data[cur_data["date"] == scaled_date(target_date)]
 
     current_dataset = Dataset.from_pandas(current_data, data_definition=data_definition)
     ref_dataset = Dataset.from_pandas(ref_data, data_definition=data_definition)
@@ -143,12 +130,9 @@ def run_evidently(ref_data, cur_data, month, i):
     return run.dict()
 
 
-@task(name="Save drift metrics to database")
-def save_drift_to_db(report_dict, month, i):
+def performance_row(report_dict, target_date):
     metrics = report_dict["metrics"]
 
-    target_date = month + datetime.timedelta(days=i)
-
     for metric in metrics:
         val = metric.get("value")
 
@@ -163,14 +147,49 @@ def save_drift_to_db(report_dict, month, i):
             # np.float64 타입을 일반 float으로 변환
             abs_error_max = float(val)
 
+    return (target_date, rmse, mae, abs_error_max)
+
+
+def station_performance_rows(cur_data, target_date):
+    """
+    (station, row) pairs of the same errors as performance_row for every
+    station of the day, computed from the predictions directly (no report)
+    """
+
+    day = cur_data[cur_data["date"] == scaled_date(target_date)]
+    error = (day["predict"] - day["target_next_stock"]).dropna()
+
+    rows = []
+    for station, station_error in error.groupby(
+        day.loc[error.index, "station"], observed=True
+    ):
+        rows.append(
+            (
+                str(station),
+                (
+                    target_date,
+                    float(np.sqrt((station_error**2).mean())),
+                    float(station_error.abs().mean()),
+                    float(station_error.abs().max()),
+                ),
+            )
+        )
+
+    return rows
+
+
+@task(name="Save drift metrics to database")
+def save_drift_to_db(report_dict, month, i, station_rows=()):
+    target_date = month + datetime.timedelta(days=i)
+
     with psycopg2.connect(CONNECTION_STRING_DB) as conn:
         with conn.cursor() as cur:
-            # Summary insert
-            cur.execute(
-                "INSERT INTO model_performance (timestamp, rmse, mae, abs_error_max) VALUES (%s, %s, %s, %s) ON CONFLICT (timestamp) DO NOTHING",
-                (target_date, rmse, mae, abs_error_max),
+            monitoring_db.write_metrics(
+                cur,
+                performance_rows=[performance_row(report_dict, target_date)],
+                version=monitoring_db.model_version(),
+                station_performance_rows=station_rows,
             )
-
             conn.commit()
 
 
@@ -178,12 +197,16 @@ def save_drift_to_db(report_dict, month, i):
 def batch_monitoring_backfill():
     prep_db()
 
+    reference_data = pd.read_csv(REFERENCE_FILE)
+    raw_data = pd.read_csv(CURRENT_FILE)
+
     ref_processed = data_preprocessing(reference_data)
     ref_processed = prediction(ref_processed)
 
     # Only consider validation set as reference
     split_idx = int(len(ref_processed) * 0.8)
-    ref_processed = ref_processed.iloc[split_idx:].copy()
+    ref_processed = ref_processed.iloc[split_idx:]
+    ref_processed = monitoring_sampling.stratified_sample(ref_processed)
 
     current_processed = data_preprocessing(raw_data)
     current_processed = prediction(current_processed)
@@ -196,7 +219,10 @@ def batch_monitoring_backfill():
 
     for i in range(0, num_days):
         report_dict = run_evidently(ref_processed, current_processed, month, i)
-        save_drift_to_db(report_dict, month, i)
+        station_rows = station_performance_rows(
+            current_processed, month + datetime.timedelta(days=i)
+        )
+        save_drift_to_db(report_dict, month, i, station_rows)
 
         logging.info("data sent")
 
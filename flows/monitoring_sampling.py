@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+# Fixed-size reference for the monitoring checks. The processed reference is
+# sampled per stratum (station, rideable type, day of week, hour), each stratum
+# getting its share of the rows, so every day is compared against the same
+# number of rows however large the full reference grows.
+
+STRATA = ["station", "rideable_type", "dayofweek", "hour"]
+
+SAMPLE_SIZE = 20_000
+SEED = 42
+
+# Bumped when the sampling changes, so persisted samples are rebuilt
+VERSION = 2
+
+
+def strata_frame(df, strata=STRATA):
+    # 'hour' is fractional (minute / 60): its stratum is the whole hour
+    frame = df[strata]
+    if "hour" in strata:
+        frame = frame.assign(hour=np.floor(frame["hour"]))
+    return frame
+
+
+def systematic(share, rng):
+    """
+    Integer quotas summing to `share` by systematic selection over the strata
+    in a random order: each gets the floor or the ceiling of its share, the
+    ceiling with probability equal to its fraction.
+    """
+
+    order = rng.permutation(len(share))
+    size = round(share.sum())
+    edges = np.r_[0, np.cumsum(share.to_numpy()[order])]
+    edges[-1] = size
+
+    points = rng.random() + np.arange(size)
+    quota = pd.Series(0, index=share.index)
+    quota.iloc[order] = np.diff(np.searchsorted(points, edges))
+    return quota
+
+
+def allocate(counts, size, rng=None):
+    """
+    Rows per stratum: proportional to its size (largest remainders first), at
+    least one for every stratum while `size` allows, never more than it holds.
+    With more strata than `size`, the strata are drawn by seeded systematic
+    selection (see systematic), so every part of the reference can be picked.
+    """
+
+    counts = counts[counts > 0]
+    if size >= counts.sum():
+        return counts
+
+    share = counts / counts.sum() * size
+    if size < len(counts):
+        return systematic(share, np.random.default_rng(rng))
+
+    quota = np.floor(share).astype(int)
+    quota = quota.clip(lower=1)
+
+    # Hand out (or take back) the rounding remainder by largest fraction
+    order = (share - np.floor(share)).sort_values(ascending=False, kind="stable")
+    missing = size - quota.sum()
+    if missing > 0:
+        room = order.index[(counts - quota)[order.index] > 0]
+        quota.loc[room[:missing]] += 1
+    elif missing < 0:
+        spare = order.index[::-1][quota[order.index[::-1]] > 1]
+        quota.loc[spare[:-missing]] -= 1
+
+    return quota
+
+
+def stratified_sample(df, size=SAMPLE_SIZE, seed=SEED, strata=STRATA):
+    """
+    Seeded stratified sample of `df` with `size` rows. Within a stratum the
+    rows with the smallest random keys are kept, which is a uniform reservoir
+    sample of it; rows keep their reference order.
+    """
+
+    rng = np.random.default_rng(seed)
+    keys = rng.random(len(df))
+    groups = (
+        strata_frame(df, strata)
+        .groupby(strata, observed=True, sort=False, dropna=False)
+        .ngroup()
+        .to_numpy()
+    )
+
+    counts = pd.Series(np.bincount(groups))
+    quota = allocate(counts, size, rng).reindex(counts.index, fill_value=0).to_numpy()
+
+    # Rank of each row's key within its stratum
+    order = np.lexsort((keys, groups))
+    starts = np.r_[0, np.cumsum(counts.to_numpy())[:-1]]
+    rank = np.empty(len(df), dtype=np.int64)
+    rank[order] = np.arange(len(df)) - starts[groups[order]]
+
+    return df[rank < quota[groups]]
+
+
+def ks_statistic(a, b):
+    # Largest distance between the two empirical distribution functions
+    a, b = np.sort(a[~np.isnan(a)]), np.sort(b[~np.isnan(b)])
+    if len(a) == 0 or len(b) == 0:
+        return float("nan")
+
+    values = np.concatenate([a, b])
+    cdf_a = np.searchsorted(a, values, side="right") / len(a)
+    cdf_b = np.searchsorted(b, values, side="right") / len(b)
+    return float(np.abs(cdf_a - cdf_b).max())
+
+
+def fidelity_report(full, sample, target="target_next_stock", prediction="predict"):
+    """
+    How closely the sample tracks the full reference: per numeric column the
+    means, standard deviations and the KS statistic between the two, plus the
+    error metrics of both when they hold predictions.
+    """
+
+    report = {"rows": {"full": len(full), "sample": len(sample)}, "columns": {}}
+
+    for name in full.select_dtypes("number").columns:
+        a = full[name].to_numpy(dtype=float)
+        b = sample[name].to_numpy(dtype=float)
+        report["columns"][name] = {
+            "mean": [float(np.nanmean(a)), float(np.nanmean(b))],
+            "std": [float(np.nanstd(a)), float(np.nanstd(b))],
+            "ks": ks_statistic(a, b),
+        }
+
+    if prediction in full.columns and target in full.columns:
+        report["metrics"] = {}
+        for label, df in (("full", full), ("sample", sample)):
+            error = df[prediction] - df[target]
+            report["metrics"][label] = {
+                "rmse": float(np.sqrt((error**2).mean())),
+                "mae": float(error.abs().mean()),
+                "abs_error_max": float(error.abs().max()),
+            }
+
+    return report
@@ -1,3 +1,4 @@
+import os
 import pickle
 import sys
 from pathlib import Path
@@ -13,30 +14,65 @@ root_path = Path(__file__).resolve().parent.parent
 if str(root_path) not in sys.path:
     sys.path.append(str(root_path))
 
+# Serving unpickles a routing predictor by the flat module name `routing`
+if str(root_path / "src") not in sys.path:
+    sys.path.append(str(root_path / "src"))
+
 from prefect import flow, task  # noqa: E402
 
-from src.data_processing import (  # noqa: E402
-    feature_engineering,
-    feature_time_series,
-    preprocess,
-    remove_outlier,
-    wide_to_long,
+import routing  # noqa: E402
+from src import (  # noqa: E402
+    checkpoint,
+    data_processing,
+    lazy_processing,
+    parallel_processing,
 )
+from src import train as trainer  # noqa: E402
+from src.atomic import atomic_path  # noqa: E402
+
+# Feature pipeline stages by backend, each checkpointed in data/cache/;
+# pandas is the reference implementation
+STAGES = {
+    "pandas": [
+        data_processing.preprocess,
+        data_processing.remove_outlier,
+        data_processing.feature_time_series,
+        data_processing.wide_to_long,
+        data_processing.feature_engineering,
+    ],
+    "polars": [lazy_processing.pipeline],
+    "parallel": [parallel_processing.pipeline],
+}
+
+MODEL_NAME = "CitiBike_Predictor"
+
+# Boosting rounds added to the champion per incremental run
+INCREMENTAL_ESTIMATORS = 20
 
 
 @task(name="Read csv file")
-def read_csv(file):
-    return pd.read_csv(file)
+def read_csv(file, key):
+    return checkpoint.cached(key, lambda: pd.read_csv(file))
 
 
 @task(name="Preprocessing", retries=3, retry_delay_seconds=5, log_prints=True)
-def data_preprocessing(df):
-    df = preprocess(df)
-    df = remove_outlier(df)
-    df = feature_time_series(df)
-    df = wide_to_long(df)
-    df = feature_engineering(df)
-    return df
+def data_preprocessing(file, backend="pandas"):
+    # A retry resumes after the last checkpointed stage, and unchanged data
+    # with unchanged code is read straight from the last checkpoint
+    source_key = checkpoint.file_key(file)
+
+    if backend in ("pandas", "parallel"):
+        source_key = checkpoint.stage_key(source_key, pd.read_csv)
+
+        def load_source():
+            return read_csv(file, source_key)
+
+    else:
+        # The lazy backend scans the file itself to push projections down
+        def load_source():
+            return file
+
+    return checkpoint.run_stages(load_source, source_key, STAGES[backend])
 
 
 @task(name="Training")
@@ -73,6 +109,9 @@ def train(df):
         rmse = np.sqrt(mean_squared_error(y_test, preds))
 
         mlflow.log_metric("test_rmse", rmse)
+        # Latest (scaled) date trained on, where an incremental run picks up;
+        # the held-out (later) rows are left for it
+        mlflow.log_metric("train_max_date", X_train["date"].max())
 
         # sklearn flavor
         mlflow.sklearn.log_model(model, name="model")
@@ -82,13 +121,151 @@ def train(df):
     return run.info.run_id, rmse
 
 
+@task(name="Clustered training")
+def train_clustered(df, n_clusters=None):
+    """
+    One model per station cluster, trained in parallel, behind a routing
+    predictor. Same split and metrics as `train`, so promote_model ranks it
+    against single-model runs.
+    """
+
+    mlflow.set_tracking_uri("sqlite:///mlflow.db")
+    mlflow.set_experiment("citi-bike")
+
+    features = [col for col in df.columns if col != "target_next_stock"]
+
+    split_idx = int(len(df) * 0.8)
+    df_train, df_test = df.iloc[:split_idx], df.iloc[split_idx:]
+
+    n_stations = df_train["station"].nunique()
+    n_clusters = min(n_clusters or os.cpu_count(), n_stations)
+
+    clusters = trainer.cluster_stations(df_train, n_clusters)
+    models = trainer.train_clusters(df_train, clusters)
+
+    model = routing.RoutingPredictor(
+        models,
+        clusters,
+        {name: df[name].cat.categories for name in ["station", "rideable_type"]},
+    )
+
+    with mlflow.start_run() as run:
+        mlflow.set_tag("model_type", "xgboost")
+        mlflow.set_tag("developer", "prefect-pipeline")
+        mlflow.set_tag("training_mode", "clustered")
+        mlflow.log_param("n_clusters", n_clusters)
+
+        preds = model.predict(df_test[features])
+        rmse = np.sqrt(mean_squared_error(df_test["target_next_stock"], preds))
+
+        mlflow.log_metric("test_rmse", rmse)
+        mlflow.log_metric("train_max_date", df_train["date"].max())
+
+        mlflow.sklearn.log_model(model, name="model")
+
+    return run.info.run_id, rmse
+
+
+@task(name="Load champion")
+def load_champion():
+    mlflow.set_tracking_uri("sqlite:///mlflow.db")
+    client = MlflowClient()
+
+    try:
+        version = client.get_model_version_by_alias(MODEL_NAME, "Champion")
+    except mlflow.exceptions.MlflowException:
+        return None, None
+
+    # Champions registered before train_max_date was logged cannot be extended
+    trained_until = client.get_run(version.run_id).data.metrics.get("train_max_date")
+    if trained_until is None:
+        return None, None
+
+    model = mlflow.sklearn.load_model(f"models:/{MODEL_NAME}/{version.version}")
+
+    return model, trained_until
+
+
+@task(name="Incremental training")
+def train_incremental(df, champion):
+    """
+    Continue boosting the champion on new data only. Returns the new run and
+    the RMSE of the new model and of the champion on the same validation rows.
+    """
+
+    mlflow.set_tracking_uri("sqlite:///mlflow.db")
+    mlflow.set_experiment("citi-bike")
+
+    features = [col for col in df.columns if col != "target_next_stock"]
+
+    X = df[features]
+    y = df["target_next_stock"]
+
+    split_idx = int(len(X) * 0.8)
+
+    X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
+    y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+
+    champion_rmse = np.sqrt(mean_squared_error(y_test, champion.predict(X_test)))
+
+    with mlflow.start_run() as run:
+        mlflow.set_tag("model_type", "xgboost")
+        mlflow.set_tag("developer", "prefect-pipeline")
+        mlflow.set_tag("training_mode", "incremental")
+
+        model = xgb.XGBRegressor(
+            random_state=42,
+            enable_categorical=True,
+            n_estimators=INCREMENTAL_ESTIMATORS,
+            max_depth=6,
+            learning_rate=0.2089,
+        )
+
+        model.fit(X_train, y_train, xgb_model=champion.get_booster())
+
+        preds = model.predict(X_test)
+        rmse = np.sqrt(mean_squared_error(y_test, preds))
+
+        # Not logged as test_rmse: it is measured on the new rows only, so it is
+        # not comparable with the full runs promote_model ranks
+        mlflow.log_metric("incremental_rmse", rmse)
+        mlflow.log_metric("champion_rmse", champion_rmse)
+        mlflow.log_metric("train_max_date", X_train["date"].max())
+
+        mlflow.sklearn.log_model(model, name="model")
+
+    return run.info.run_id, rmse, champion_rmse
+
+
+def register_champion(run_id):
+    mlflow.set_tracking_uri("sqlite:///mlflow.db")
+    client = MlflowClient()
+
+    model_uri = f"runs:/{run_id}/model"
+    model_version = mlflow.register_model(model_uri=model_uri, name=MODEL_NAME)
+
+    client.set_registered_model_alias(
+        name=MODEL_NAME, alias="Champion", version=model_version.version
+    )
+
+    print(f"Model version {model_version.version} aliased as '@champion'.")
+
+    # Saving the model as local file(bin/model.bin)
+    loaded_model = mlflow.sklearn.load_model(model_uri)
+
+    # A serving process polling the file never picks up a partial model
+    with atomic_path("bin/model.bin") as tmp_path, open(tmp_path, "wb") as f_out:
+        pickle.dump(loaded_model, f_out)
+
+    print("Model saved locally at 'bin/model.bin'")
+
+
 @task(name="Promote Model")
 def promote_model(current_run_id, current_rmse):
     mlflow.set_tracking_uri("sqlite:///mlflow.db")
     client = MlflowClient()
 
     experiment_name = "citi-bike"
-    model_name = "CitiBike_Predictor"
 
     experiment = client.get_experiment_by_name(experiment_name)
     best_run = client.search_runs(
@@ -108,34 +285,55 @@ def promote_model(current_run_id, current_rmse):
 
     if current_run_id == best_run_id:
         print("New model is the best. Promoting to Champion")
+        register_champion(current_run_id)
+
+    else:
+        print("Current model is not the best. No promotion.")
+        print(f"Keep existing best run ({best_run_id}) as standard.")
 
-        model_uri = f"runs:/{current_run_id}/model"
-        model_version = mlflow.register_model(model_uri=model_uri, name=model_name)
 
-        client.set_registered_model_alias(
-            name=model_name, alias="Champion", version=model_version.version
-        )
+@task(name="Promote incremental model")
+def promote_incremental(run_id, rmse, champion_rmse):
+    # Guardrail: the extended model must not be worse than the champion it extends
+    if rmse > champion_rmse:
+        print(f"Incremental RMSE {rmse} is worse than the champion's {champion_rmse}")
+        return False
 
-        print(f"Model version {model_version.version} aliased as '@champion'.")
+    print(f"Incremental RMSE {rmse} (champion: {champion_rmse}). Promoting to Champion")
+    register_champion(run_id)
 
-        # Saving the model as local file(bin/model.bin)
-        loaded_model = mlflow.sklearn.load_model(model_uri)
+    return True
 
-        with open("bin/model.bin", "wb") as f_out:
-            pickle.dump(loaded_model, f_out)
 
-        print("Model saved locally at 'bin/model.bin'")
+@flow(name="Main flow", log_prints=True)
+def main(file, backend="pandas", mode="full", clusters=None):
+    df = data_preprocessing(file, backend)
 
-    else:
-        print("Current model is not the best. No promotion.")
-        print(f"Keep existing best run ({best_run_id}) as standard.")
+    if mode == "clustered":
+        run_id, rmse = train_clustered(df, int(clusters) if clusters else None)
+        promote_model(run_id, rmse)
+        return
 
+    if mode == "incremental":
+        champion, trained_until = load_champion()
 
-@flow(name="Main flow", log_prints=True)
-def main(file):
-    df = read_csv(file)
+        if champion is None:
+            print("No champion to extend, training from scratch")
+
+        elif isinstance(champion, routing.RoutingPredictor):
+            print("A clustered champion cannot be extended, training from scratch")
+
+        else:
+            new_df = df[df["date"] > trained_until]
+            if new_df.empty:
+                print("No new data since the champion was trained")
+                return
+
+            run_id, rmse, champion_rmse = train_incremental(new_df, champion)
+            if promote_incremental(run_id, rmse, champion_rmse):
+                return
 
-    df = data_preprocessing(df)
+            print("Falling back to a full retrain")
 
     run_id, rmse = train(df)
 
@@ -143,7 +341,7 @@ def main(file):
 
 
 if __name__ == "__main__":
-    main(sys.argv[1])
+    main(*sys.argv[1:5])
 
     # Scheduler if needed
     # main.serve(name="weekly-retraining-deployment",
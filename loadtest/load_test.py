@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+
+root_path = Path(__file__).resolve().parent.parent
+if str(root_path) not in sys.path:
+    sys.path.append(str(root_path))
+
+from src.history_store import open_history  # noqa: E402
+
+RESULTS_DIR = root_path / "loadtest" / "results"
+HISTORY_DIR = root_path / "data" / "2025_history"
+TIMESERIES_CSV = root_path / "data" / "2025_timeseries.csv"
+
+
+def query_mix(n, batch_share=0.1, batch_size=20, seed=42):
+    """
+    Requests of a realistic mix: every station and bike type, dates skewed
+    towards the most recent days (as most users ask about today or tomorrow),
+    and a share of batch requests.
+    """
+
+    rng = np.random.default_rng(seed)
+    # Built from the timeseries csv on a fresh checkout, as serving does
+    history = open_history(str(HISTORY_DIR), str(TIMESERIES_CSV))
+    shard = history.shard(0)
+
+    # Days with a full window (2h of lag context before, 24h after)
+    first_day = shard.start.normalize() + pd.Timedelta(days=1)
+    last_day = (shard.start + shard.n_slots * pd.Timedelta(minutes=15)).normalize()
+    last_day -= pd.Timedelta(days=1)
+    n_days = (last_day - first_day).days + 1
+
+    def queries(size):
+        days_back = np.minimum(rng.geometric(0.05, size) - 1, n_days - 1)
+        stations = rng.choice(history.stations, size)
+        rideable_types = rng.choice(history.rideable_types, size)
+
+        return [
+            {
+                "station": str(station),
+                "rideable_type": str(rideable_type),
+                "target_date": (last_day - pd.Timedelta(days=int(back))).strftime(
+                    "%Y-%m-%d"
+                ),
+            }
+            for station, rideable_type, back in zip(
+                stations, rideable_types, days_back, strict=True
+            )
+        ]
+
+    return [
+        ("batch", queries(batch_size))
+        if rng.random() < batch_share
+        else ("single", queries(1)[0])
+        for _ in range(n)
+    ]
+
+
+async def run_load(base_url, requests, concurrency, duration):
+    # Closed loop: `concurrency` clients, each sending its next request as soon
+    # as the previous one is answered, until `duration` seconds have passed
+    records = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+
+        async def worker(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                kind, payload = requests[i % len(requests)]
+                path = "/predict/batch" if kind == "batch" else "/predict"
+
+                start = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload, timeout=30)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latency = time.perf_counter() - start
+
+                n_queries = len(payload) if kind == "batch" else 1
+                records.append((kind, latency, ok, n_queries))
+                i += concurrency
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return records, elapsed
+
+
+def percentiles(latencies):
+    if not latencies:
+        return None
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"p50": round(p50, 2), "p95": round(p95, 2), "p99": round(p99, 2)}
+
+
+def summarize(records, elapsed):
+    ok = [record for record in records if record[2]]
+
+    return {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 1),
+        "queries_per_s": round(sum(record[3] for record in ok) / elapsed, 1),
+        "latency_ms": {
+            "all": percentiles([record[1] for record in ok]),
+            "single": percentiles([r[1] for r in ok if r[0] == "single"]),
+            "batch": percentiles([r[1] for r in ok if r[0] == "batch"]),
+        },
+    }
+
+
+def start_server(workers, port, cache=False):
+    # Without the answer cache the mix's repeated queries cost a prediction
+    # each, so the numbers measure the model, not cache lookups
+    env = {
+        **os.environ,
+        "MODEL_RELOAD_INTERVAL": "0",
+        "PREDICT_CACHE_SIZE": os.getenv("PREDICT_CACHE_SIZE", "4096") if cache else "0",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "serve:app",
+            "--app-dir",
+            "src",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=root_path,
+        env=env,
+    )
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+
+    process.terminate()
+    raise RuntimeError("Server did not become healthy")
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=root_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_runs(runs):
+    print(
+        f"{'workers':>7} {'rps':>8} {'queries/s':>10} {'errors':>7}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for run in runs:
+        latency = run["latency_ms"]["all"] or {"p50": 0, "p95": 0, "p99": 0}
+        print(
+            f"{run['workers']:>7} {run['throughput_rps']:>8} "
+            f"{run['queries_per_s']:>10} {run['errors']:>7} "
+            f"{latency['p50']:>8} {latency['p95']:>8} {latency['p99']:>8}"
+        )
+
+
+def compare():
+    # One table per saved run, oldest first
+    for path in sorted(RESULTS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime):
+        result = json.loads(path.read_text())
+        cached = ", answer cache on" if result["config"].get("cache") else ""
+        print(
+            f"\n{result['commit']} ({result['created']}, "
+            f"{result['cpu_count']} CPUs{cached})"
+        )
+        print_runs(result["runs"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FastAPI server")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--batch-share", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=9797)
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="keep the server's answer cache (measures cache hits, not the model)",
+    )
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare()
+        return
+
+    requests = query_mix(10_000, args.batch_share, args.batch_size)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    runs = []
+    for workers in args.workers:
+        process = start_server(workers, args.port, args.cache)
+        try:
+            asyncio.run(run_load(base_url, requests, args.concurrency, args.warmup))
+            records, elapsed = asyncio.run(
+                run_load(base_url, requests, args.concurrency, args.duration)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+
+        runs.append({"workers": workers, **summarize(records, elapsed)})
+
+    result = {
+        "commit": commit(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "machine": platform.machine(),
+        "config": vars(args),
+        "runs": runs,
+    }
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{result['commit']}.json"
+    path.write_text(json.dumps(result, indent=2))
+
+    print_runs(runs)
+    print(f"Saved to {path.relative_to(root_path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+# Files other processes read while they are being replaced (serving history
+# shards, the model, checkpoints, lake partitions) are written to a temp file
+# next to them and renamed over them, so a reader sees the old file or the new
+# one, never a partial write.
+
+
+@contextmanager
+def atomic_path(path, mode=0o644):
+    """
+    Temp path to write `path`'s content to; renamed to `path` (with `mode`)
+    once the block completes, removed if it raises. The temp name is
+    dot-prefixed, so dataset discovery (e.g. of the trip lake) skips it.
+    """
+
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,130 @@
+import ast
+import hashlib
+import inspect
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.atomic import atomic_path
+except ModuleNotFoundError:
+    from atomic import atomic_path
+
+# Content-addressed parquet checkpoints of pipeline stages. A stage's key hashes
+# its input's key with the stage's code (its module and the modules of the same
+# package it imports), so changed data or code misses the cache.
+
+CACHE_DIR = Path("data/cache")
+
+
+def file_key(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f_in:
+        for block in iter(lambda: f_in.read(2**20), b""):
+            digest.update(block)
+
+    return digest.hexdigest()[:16]
+
+
+def local_imports(path):
+    # Modules next to `path` it imports, in either the package style
+    # (from src.features import ...) or the flat one (from features import ...)
+    path = Path(path)
+    names = set()
+    for node in ast.walk(ast.parse(path.read_text())):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+
+    package = path.parent.name
+    return {
+        path.parent / f"{name.removeprefix(f'{package}.')}.py"
+        for name in names
+        if "." not in name.removeprefix(f"{package}.")
+    } & set(path.parent.glob("*.py"))
+
+
+def module_files(path):
+    # `path` and every module of its package it imports, directly or not
+    files, todo = set(), [Path(path)]
+    while todo:
+        file = todo.pop()
+        if file not in files:
+            files.add(file)
+            todo.extend(local_imports(file))
+
+    return sorted(files)
+
+
+def stage_key(parent_key, stage):
+    digest = hashlib.sha256(parent_key.encode())
+    digest.update(f"{stage.__module__}.{stage.__qualname__}".encode())
+
+    # Whole modules, so edits of helpers a stage calls (in its own module or
+    # one it imports, e.g. features) invalidate it too
+    try:
+        path = inspect.getsourcefile(sys.modules[stage.__module__])
+    except (TypeError, KeyError):
+        path = None
+
+    if path is not None:
+        for file in module_files(path):
+            digest.update(file.name.encode())
+            digest.update(file.read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+def path_of(key, cache_dir=CACHE_DIR):
+    return Path(cache_dir) / f"{key}.parquet"
+
+
+def save(df, key, cache_dir=CACHE_DIR):
+    path = path_of(key, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    # An interrupted write never leaves a valid-looking file
+    with atomic_path(path) as tmp_path:
+        df.to_parquet(tmp_path)
+
+
+def load(key, cache_dir=CACHE_DIR):
+    path = path_of(key, cache_dir)
+    return pd.read_parquet(path) if path.exists() else None
+
+
+def cached(key, compute, cache_dir=CACHE_DIR):
+    df = load(key, cache_dir)
+    if df is None:
+        df = compute()
+        save(df, key, cache_dir)
+
+    return df
+
+
+def run_stages(load_source, source_key, stages, cache_dir=CACHE_DIR):
+    """
+    Apply `stages` in order to the source, checkpointing every stage's output.
+    Resumes after the last stage with a checkpoint; the source is only loaded
+    (by calling `load_source`) when no stage output is cached.
+    """
+
+    keys = []
+    for stage in stages:
+        keys.append(stage_key(keys[-1] if keys else source_key, stage))
+
+    done = next(
+        (i for i in reversed(range(len(keys))) if path_of(keys[i], cache_dir).exists()),
+        None,
+    )
+    df = load_source() if done is None else load(keys[done], cache_dir)
+
+    start = 0 if done is None else done + 1
+    for stage, key in zip(stages[start:], keys[start:], strict=True):
+        df = stage(df)
+        save(df, key, cache_dir)
+
+    return df
@@ -3,6 +3,46 @@ import sys
 import numpy as np
 import pandas as pd
 
+try:
+    from src.features import build_features
+except ModuleNotFoundError:
+    # Run as a script from src/
+    from features import build_features
+
+# Stock every series is restored to at 00:00 (the dbt `initial_stock` var)
+INITIAL_STOCK = 10
+
+
+def read_trips(source, stations=None, start=None, end=None):
+    """
+    Trips started between the dates `start` and `end` (inclusive) that start or
+    end at one of `stations`. A trip lake (see trip_lake) is pruned to the
+    matching partitions; a csv is read whole and filtered.
+    """
+
+    try:
+        from src import trip_lake
+    except ModuleNotFoundError:
+        import trip_lake
+
+    if trip_lake.is_lake(source):
+        return trip_lake.read_trips(source, stations, start, end)
+
+    df = pd.read_csv(source)
+
+    started = pd.to_datetime(df["started_at"], format="mixed").dt.normalize()
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= started >= pd.Timestamp(start).normalize()
+    if end is not None:
+        mask &= started <= pd.Timestamp(end).normalize()
+    if stations is not None:
+        mask &= df["start_station_name"].isin(stations) | df["end_station_name"].isin(
+            stations
+        )
+
+    return df[mask].reset_index(drop=True)
+
 
 def preprocess(df):
     df = df.dropna()
@@ -23,7 +63,7 @@ def preprocess(df):
     return df
 
 
-def remove_outlier(df):
+def remove_outlier(df, mean=None, std=None):
     df["started_at"] = pd.to_datetime(df["started_at"], format="mixed")
     df["ended_at"] = pd.to_datetime(df["ended_at"], format="mixed")
 
@@ -42,44 +82,76 @@ def remove_outlier(df):
 
     df["duration"] = df["duration"].dt.total_seconds() / 60
 
-    df = df[
-        np.abs((df["duration"] - df["duration"].mean()) / df["duration"].std()) <= 2
-    ]
+    # Duration statistics of this frame unless fixed ones (e.g. of a reference) are given
+    mean = df["duration"].mean() if mean is None else mean
+    std = df["duration"].std() if std is None else std
+
+    df = df[np.abs((df["duration"] - mean) / std) <= 2]
 
     return df
 
 
-def feature_time_series(df):
-    top3_stations = (
-        df.groupby("start_station_name")
-        .size()
+def duration_stats(df):
+    # Mean/std of trip durations (minutes) as used by remove_outlier
+    duration = pd.to_datetime(df["ended_at"], format="mixed") - pd.to_datetime(
+        df["started_at"], format="mixed"
+    )
+    duration = duration.dt.total_seconds() / 60
+
+    return float(duration.mean()), float(duration.std())
+
+
+def top_stations(df, n=3):
+    return top_of_counts(df.groupby("start_station_name").size(), n)
+
+
+def top_of_counts(counts, n=3):
+    # `counts`: trips per start station, indexed by station name in sorted order
+    return (
+        counts.rename_axis("start_station_name")
         .reset_index(name="count")
         .sort_values(by="count", ascending=False)["start_station_name"]
-        .head(3)
+        .head(n)
         .tolist()
     )
 
-    # Outflow (-1) / Inflow (+1)
-    outflow = df[df["start_station_name"].isin(top3_stations)].copy()
-    outflow = outflow[["started_at", "start_station_name", "rideable_type"]]
-    outflow.columns = ["time", "station", "rideable_type"]
+
+def feature_time_series(df, stations=None):
+    # Busiest stations of this frame unless a fixed station set is given
+    top3_stations = top_stations(df) if stations is None else stations
+
+    return stock_from_flows(slot_flows(df, top3_stations))
+
+
+def slot_flows(df, stations=None):
+    """
+    Net flow per 15 min slot, station and rideable type (Outflow (-1) at trip
+    starts, Inflow (+1) at trip ends) of `stations`, or of every station
+    """
+
+    outflow = df[["started_at", "start_station_name", "rideable_type"]]
+    inflow = df[["ended_at", "end_station_name", "rideable_type"]]
+    if stations is not None:
+        outflow = outflow[outflow["start_station_name"].isin(stations)]
+        inflow = inflow[inflow["end_station_name"].isin(stations)]
+
+    outflow = outflow.set_axis(["time", "station", "rideable_type"], axis=1)
     outflow["flow"] = -1
 
-    inflow = df[df["end_station_name"].isin(top3_stations)].copy()
-    inflow = inflow[["ended_at", "end_station_name", "rideable_type"]]
-    inflow.columns = ["time", "station", "rideable_type"]
+    inflow = inflow.set_axis(["time", "station", "rideable_type"], axis=1)
     inflow["flow"] = 1
 
     combined = pd.concat([outflow, inflow])
 
     # Resampling (15 mins)
-    net_flow_df = (
-        combined.groupby(
-            [pd.Grouper(key="time", freq="15min"), "station", "rideable_type"]
-        )["flow"]
-        .sum()
-        .unstack(["station", "rideable_type"], fill_value=0)
-    )
+    return combined.groupby(
+        [pd.Grouper(key="time", freq="15min"), "station", "rideable_type"]
+    )["flow"].sum()
+
+
+def stock_from_flows(flows):
+    # Wide stock frame (time x (station, rideable_type)) of slot_flows output
+    net_flow_df = flows.unstack(["station", "rideable_type"], fill_value=0)
 
     # Reindexing to fill every 15 min
     start_date = net_flow_df.index.min().floor("D")
@@ -91,10 +163,27 @@ def feature_time_series(df):
     net_flow_df = net_flow_df.reindex(full_time_idx, fill_value=0)
 
     # Initial stock: Restore at every 00:00
-    initial_stock = 10
     daily_cumsum = net_flow_df.groupby(pd.Grouper(freq="D")).cumsum()
 
-    stock_df = initial_stock + daily_cumsum
+    stock_df = INITIAL_STOCK + daily_cumsum
+
+    stock_df = stock_df[24 * 4 :]
+
+    return stock_df
+
+
+def stock_from_net_flow(df):
+    # Aggregated series from dbt (fct_station_net_flow_15m) in feature_time_series layout
+    df = df.copy()
+    df["slot_time"] = pd.to_datetime(df["slot_time"])
+
+    stock_df = (
+        df.set_index(["slot_time", "station", "rideable_type"])["stock"]
+        # A slot without a row had no flow yet that day
+        .unstack(["station", "rideable_type"], fill_value=INITIAL_STOCK)
+        .sort_index()
+    )
+    stock_df.index.name = None
 
     stock_df = stock_df[24 * 4 :]
 
@@ -111,33 +200,30 @@ def wide_to_long(df):
     return df
 
 
-def feature_engineering(df):
-    df["hour"] = df["time"].dt.hour + df["time"].dt.minute / 60
-    df["dayofweek"] = df["time"].dt.dayofweek
+def feature_engineering(df, start=None, end=None):
+    # Rows before `start` or from `end` on (a partition's neighbours) only
+    # give lags and targets to the rows between
+    df = build_features(df, target=True)
 
-    morning_rush = (df["hour"] >= 8) & (df["hour"] <= 10)
-    evening_rush = (df["hour"] >= 17) & (df["hour"] <= 19)
+    if start is not None:
+        df = df[df["time"] >= start]
+    if end is not None:
+        df = df[df["time"] < end]
 
-    df["is_rush_hour"] = (morning_rush | evening_rush).astype(int)
-
-    grouper = df.groupby(["station", "rideable_type"], observed=False)["stock"]
-
-    df["lag_15m_stock"] = grouper.shift(1)
-    df["lag_30m_stock"] = grouper.shift(2)
-    df["lag_45m_stock"] = grouper.shift(3)
-    df["lag_60m_stock"] = grouper.shift(4)
-    df["target_next_stock"] = grouper.shift(-1)
+    df = df.dropna().copy()
 
-    start_ts = pd.to_datetime("2024-01-01").value
-    end_ts = pd.to_datetime("2025-01-01").value
+    df = df.drop(columns=["time"])
 
-    df["date"] = df["time"].dt.normalize().values.astype(np.int64)
+    return df
 
-    df["date"] = (df["date"] - start_ts) / (end_ts - start_ts)
 
-    df = df.dropna().copy()
-
-    df = df.drop(columns=["time"])
+def pipeline(df):
+    # Reference (eager pandas) implementation of the full feature chain
+    df = preprocess(df)
+    df = remove_outlier(df)
+    df = feature_time_series(df)
+    df = wide_to_long(df)
+    df = feature_engineering(df)
 
     return df
 
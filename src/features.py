@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Declared model feature schema, shared by training (data_processing), serving
+# (predict) and Lambda (lambda_function), so all of them build identical features.
+# The checkpointed stages importing it are keyed on it too (see checkpoint).
+
+SERIES = ["station", "rideable_type"]
+
+# Lag column -> number of 15 min slots back within the series
+LAGS = {
+    "lag_15m_stock": 1,
+    "lag_30m_stock": 2,
+    "lag_45m_stock": 3,
+    "lag_60m_stock": 4,
+}
+
+TARGET = "target_next_stock"
+
+# Rush hours, both bounds inclusive
+RUSH_HOURS = [(8, 10), (17, 19)]
+
+# 'date' is the day scaled to this range
+DATE_RANGE = ("2024-01-01", "2025-01-01")
+
+# Model input columns, in the order the model was trained with
+FEATURES = [
+    *SERIES,
+    "stock",
+    "hour",
+    "dayofweek",
+    "is_rush_hour",
+    *LAGS,
+    "date",
+]
+
+
+def scaled_date(day):
+    """'date' feature of a day (any timestamp of it), or of an array of days"""
+
+    start_ts = pd.to_datetime(DATE_RANGE[0]).value
+    end_ts = pd.to_datetime(DATE_RANGE[1]).value
+
+    if np.ndim(day) == 0:
+        day_ns = pd.Timestamp(day).normalize().value
+    else:
+        day_ns = np.asarray(day, dtype="datetime64[ns]").astype(np.int64)
+
+    return (day_ns - start_ts) / (end_ts - start_ts)
+
+
+def shift_within(values, group, periods):
+    # Positional shift inside each group; `group` must be sorted (stable)
+    out = np.full(len(values), np.nan)
+    if periods > 0:
+        same = group[periods:] == group[:-periods]
+        out[periods:] = np.where(same, values[:-periods], np.nan)
+    else:
+        same = group[:periods] == group[-periods:]
+        out[:periods] = np.where(same, values[-periods:], np.nan)
+
+    return out
+
+
+def build_features(df, target=False, keys=SERIES):
+    """
+    Add the model features to a long stock frame (time, station, rideable_type,
+    stock), one or many series, each in time order with 15 min slots. Fully
+    vectorized; lags (and the target) are NaN where the series has no history.
+    Rows sharing the `keys` columns form one series.
+    """
+
+    time = df["time"].to_numpy("datetime64[ns]")
+    day = time.astype("datetime64[D]")
+
+    minutes = (time - day) // np.timedelta64(1, "m")
+    hour = minutes // 60 + (minutes % 60) / 60
+
+    is_rush_hour = np.zeros(len(df), dtype=bool)
+    for start, end in RUSH_HOURS:
+        is_rush_hour |= (hour >= start) & (hour <= end)
+
+    # Lags are computed on the rows sorted by series, then scattered back
+    group = df.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    order = np.argsort(group, kind="stable")
+    sorted_group = group[order]
+    sorted_stock = df["stock"].to_numpy(np.float64)[order]
+
+    def lag(periods):
+        out = np.empty(len(df))
+        out[order] = shift_within(sorted_stock, sorted_group, periods)
+        return out
+
+    df = df.copy()
+    df["hour"] = hour
+    df["dayofweek"] = ((day.astype(np.int64) + 3) % 7).astype(np.int32)
+    df["is_rush_hour"] = is_rush_hour.astype(int)
+
+    for col, periods in LAGS.items():
+        df[col] = lag(periods)
+
+    if target:
+        df[TARGET] = lag(-1)
+
+    df["date"] = scaled_date(day)
+
+    return df
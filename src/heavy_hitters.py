@@ -0,0 +1,205 @@
+import json
+import sys
+
+import pandas as pd
+
+# Streaming top-K station counts with the Space-Saving summary: at most
+# `capacity` counters, each with the overestimate it may carry, so
+#   count - error <= true count <= count
+# and every item more frequent than total / capacity is guaranteed to be kept.
+# Summaries merge (e.g. across workers or days) with the same guarantee.
+
+
+class SpaceSaving:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.total = 0
+        self.counters = {}  # item -> [count, error]
+
+    def _min_count(self):
+        # Upper bound of any item not in the summary
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def update_counts(self, counts):
+        """Add pre-aggregated counts (item -> weight), e.g. of one chunk"""
+
+        for item, weight in counts.items():
+            weight = int(weight)
+            self.total += weight
+
+            if item in self.counters:
+                self.counters[item][0] += weight
+            elif len(self.counters) < self.capacity:
+                self.counters[item] = [weight, 0]
+            else:
+                # Replace the smallest counter; its count bounds the new
+                # item's unseen occurrences
+                victim = min(self.counters, key=lambda key: self.counters[key][0])
+                min_count = self.counters.pop(victim)[0]
+                self.counters[item] = [min_count + weight, min_count]
+
+    def update(self, items):
+        # A chunk of raw items (e.g. a column of station names)
+        counts = pd.Series(items).dropna().value_counts()
+        self.update_counts(counts.sort_values(ascending=False))
+
+    def merge(self, other):
+        """Summary of both streams, with the same error guarantee"""
+
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        merged.total = self.total + other.total
+
+        min_self, min_other = self._min_count(), other._min_count()
+        counters = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count_self, error_self = self.counters.get(item, (min_self, min_self))
+            count_other, error_other = other.counters.get(item, (min_other, min_other))
+            counters[item] = [count_self + count_other, error_self + error_other]
+
+        largest = sorted(counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        merged.counters = dict(largest[: merged.capacity])
+
+        return merged
+
+    def top(self, n):
+        """
+        The n largest counters with bounds of their true counts; `guaranteed`
+        marks items that are certainly among the true top n.
+        """
+
+        rows = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)
+        df = pd.DataFrame(
+            [(item, count, count - error) for item, (count, error) in rows],
+            columns=["item", "count", "lower_bound"],
+        )
+
+        # Anything ranked below n (or not kept at all) has at most this count
+        threshold = max(df["count"].iloc[n] if len(df) > n else 0, self._min_count())
+        df = df.head(n)
+        df["guaranteed"] = df["lower_bound"] >= threshold
+
+        return df
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "counters": [[item, *counter] for item, counter in self.counters.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data["capacity"])
+        summary.total = data["total"]
+        summary.counters = {
+            item: [count, error] for item, count, error in data["counters"]
+        }
+        return summary
+
+
+class WindowedTopK:
+    """
+    One Space-Saving summary per period (a day by default), so the top items of
+    any window of whole periods are a merge of its summaries: monthly, rolling,
+    or any range, without rescanning the trips.
+    """
+
+    def __init__(self, capacity=256, freq="D"):
+        self.capacity = capacity
+        self.freq = freq
+        self.periods = {}  # period start (ISO) -> SpaceSaving
+
+    def update(self, times, items):
+        periods = pd.to_datetime(pd.Series(times), format="mixed").dt.floor(self.freq)
+        counts = (
+            pd.DataFrame(
+                {"period": periods.to_numpy(), "item": pd.Series(items).values}
+            )
+            .dropna()
+            .groupby(["period", "item"])
+            .size()
+        )
+
+        for period, period_counts in counts.groupby(level="period"):
+            key = pd.Timestamp(period).isoformat()
+            summary = self.periods.setdefault(key, SpaceSaving(self.capacity))
+            summary.update_counts(
+                period_counts.droplevel("period").sort_values(ascending=False)
+            )
+
+    def window(self, start=None, end=None):
+        # Merged summary of the periods starting in [start, end)
+        merged = SpaceSaving(self.capacity)
+        for key, summary in self.periods.items():
+            period = pd.Timestamp(key)
+            if start is not None and period < pd.Timestamp(start):
+                continue
+            if end is not None and period >= pd.Timestamp(end):
+                continue
+            merged = merged.merge(summary)
+
+        return merged
+
+    def top(self, n, start=None, end=None):
+        return self.window(start, end).top(n)
+
+    def rolling_top(self, n, days, end):
+        end = pd.Timestamp(end)
+        return self.top(n, end - pd.Timedelta(days=days), end)
+
+    def merge(self, other):
+        merged = WindowedTopK(max(self.capacity, other.capacity), self.freq)
+        for key in self.periods.keys() | other.periods.keys():
+            empty = SpaceSaving(merged.capacity)
+            merged.periods[key] = self.periods.get(key, empty).merge(
+                other.periods.get(key, empty)
+            )
+
+        return merged
+
+    def prune(self, before):
+        # Drop periods no window will ask for anymore
+        before = pd.Timestamp(before)
+        self.periods = {
+            key: summary
+            for key, summary in self.periods.items()
+            if pd.Timestamp(key) >= before
+        }
+
+    def dumps(self):
+        return json.dumps(
+            {
+                "capacity": self.capacity,
+                "freq": self.freq,
+                "periods": {key: s.to_dict() for key, s in self.periods.items()},
+            }
+        )
+
+    @classmethod
+    def loads(cls, text):
+        data = json.loads(text)
+        windowed = cls(data["capacity"], data["freq"])
+        windowed.periods = {
+            key: SpaceSaving.from_dict(s) for key, s in data["periods"].items()
+        }
+        return windowed
+
+
+if __name__ == "__main__":
+    # python heavy_hitters.py <trips csv> <sketch json>: top start stations per month
+    windowed = WindowedTopK()
+    for chunk in pd.read_csv(
+        sys.argv[1], usecols=["started_at", "start_station_name"], chunksize=500_000
+    ):
+        windowed.update(chunk["started_at"], chunk["start_station_name"])
+
+    with open(sys.argv[2], "w") as f_out:
+        f_out.write(windowed.dumps())
+
+    months = sorted({key[:7] for key in windowed.periods})
+    for month in months:
+        start = pd.Timestamp(month + "-01")
+        top = windowed.top(3, start, start + pd.offsets.MonthBegin())
+        print(month, ", ".join(top["item"]))
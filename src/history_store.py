@@ -0,0 +1,365 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.atomic import atomic_path
+except ModuleNotFoundError:
+    from atomic import atomic_path
+
+MAGIC = b"CBHIST01"
+BLOCK_MAGIC = b"CBHIST02"
+HEADER_ALIGN = 64
+FREQ = pd.Timedelta(minutes=15)
+SLOTS_PER_DAY = 96
+
+# Stock of a series without trips (restored every midnight, see data_processing)
+INITIAL_STOCK = 10
+
+
+def regular_index(stock_df):
+    index = pd.DatetimeIndex(stock_df.index).as_unit("ns")
+    if index.tz is not None:
+        index = index.tz_convert(None)
+
+    if len(index) > 1 and (np.diff(index.asi8) != FREQ.value).any():
+        raise ValueError("History must be a regular 15 min series")
+
+    return index
+
+
+def series_of(stock_df):
+    return [
+        [str(station), str(rideable_type)]
+        for station, rideable_type in stock_df.columns
+    ]
+
+
+def smallest_int(values, dtypes=(np.int16, np.int32)):
+    for dtype in dtypes:
+        info = np.iinfo(dtype)
+        if values.size == 0 or (values.min() >= info.min and values.max() <= info.max):
+            return dtype
+
+    return np.int64
+
+
+def write_file(path, magic, header, data):
+    """Magic, header length, JSON header (padded to HEADER_ALIGN), then data"""
+
+    header_bytes = json.dumps(header).encode()
+
+    data_offset = len(magic) + 4 + len(header_bytes)
+    padding = -data_offset % HEADER_ALIGN
+
+    with atomic_path(path) as tmp_path, open(tmp_path, "wb") as f_out:
+        f_out.write(magic)
+        f_out.write(np.uint32(len(header_bytes) + padding).tobytes())
+        f_out.write(header_bytes + b" " * padding)
+        f_out.write(data.tobytes())
+
+
+def read_header(path):
+    # (magic, header, data offset) of a history file
+    with open(path, "rb") as f_in:
+        magic = f_in.read(len(MAGIC))
+        if magic not in (MAGIC, BLOCK_MAGIC):
+            raise ValueError(f"{path} is not a history file")
+        header_len = int(np.frombuffer(f_in.read(4), dtype=np.uint32)[0])
+        header = json.loads(f_in.read(header_len))
+
+    return magic, header, len(magic) + 4 + header_len
+
+
+def write_history(stock_df, path):
+    """
+    Write a wide stock frame (time x (station, rideable_type)) as a read-only
+    history file: magic, header length, JSON header, then one contiguous row of
+    stocks per series so a window is a single slice of the mapped file.
+    """
+
+    index = regular_index(stock_df)
+    values = stock_df.to_numpy().T
+    dtype = smallest_int(values)
+
+    header = {
+        "version": 1,
+        "dtype": np.dtype(dtype).str,
+        "start": index[0].isoformat(),
+        "n_slots": len(index),
+        "series": series_of(stock_df),
+    }
+    write_file(path, MAGIC, header, np.ascontiguousarray(values, dtype=dtype))
+
+
+def block_dtype(header):
+    # One (series, day) block: the day's first stock, then the 95 slot deltas
+    return np.dtype(
+        [
+            ("base", header["base_dtype"]),
+            ("deltas", header["delta_dtype"], (SLOTS_PER_DAY - 1,)),
+        ]
+    )
+
+
+def write_day_blocks(stock_df, path):
+    """
+    Write a wide stock frame as fixed-size (series, day) blocks: the first stock
+    of the day and the 95 changes after it, in the narrowest integer types that
+    hold them (int8 deltas for any real station). The block of a series and day
+    is at data offset (series * n_days + day) * block size.
+    """
+
+    index = regular_index(stock_df)
+    if len(index) and index[0] != index[0].normalize():
+        raise ValueError("Day-block history must start at midnight")
+
+    values = stock_df.to_numpy().T
+    n_series, n_slots = values.shape
+    n_days = -(-n_slots // SLOTS_PER_DAY)
+
+    # Pad the last day with its last stock (zero deltas); reads stop at n_slots
+    padded = np.pad(values, ((0, 0), (0, n_days * SLOTS_PER_DAY - n_slots)), "edge")
+    days = padded.reshape(n_series, n_days, SLOTS_PER_DAY).astype(np.int64)
+    deltas = np.diff(days, axis=2)
+
+    header = {
+        "version": 2,
+        "base_dtype": np.dtype(smallest_int(days[..., 0])).str,
+        "delta_dtype": np.dtype(smallest_int(deltas, (np.int8, np.int16))).str,
+        "start": index[0].isoformat(),
+        "n_slots": n_slots,
+        "n_days": n_days,
+        "series": series_of(stock_df),
+    }
+
+    blocks = np.empty((n_series, n_days), dtype=block_dtype(header))
+    blocks["base"] = days[..., 0]
+    blocks["deltas"] = deltas
+
+    write_file(path, BLOCK_MAGIC, header, blocks)
+
+
+class HistoryStore:
+    """
+    Memory-mapped view of a history file. Pages are shared through the OS page
+    cache, so every worker process on a node reads the same physical memory.
+    """
+
+    magic = MAGIC
+
+    def __init__(self, path, stations=None, rideable_types=None):
+        magic, header, offset = read_header(path)
+        if magic != self.magic:
+            raise ValueError(f"{path} is not a {type(self).__name__} file")
+
+        self.start = pd.Timestamp(header["start"])
+        self.n_slots = header["n_slots"]
+        self.series = [tuple(s) for s in header["series"]]
+        self._series_idx = {s: i for i, s in enumerate(self.series)}
+
+        # Categories of the returned frames; a shard passes the global lists so
+        # category codes match the model's training data
+        self.stations = stations or sorted({station for station, _ in self.series})
+        self.rideable_types = rideable_types or sorted(
+            {rideable_type for _, rideable_type in self.series}
+        )
+
+        self._data = self.map(path, header, offset)
+
+    def map(self, path, header, offset):
+        # One row of stocks per series
+        return np.memmap(
+            path,
+            dtype=np.dtype(header["dtype"]),
+            mode="r",
+            offset=offset,
+            shape=(len(self.series), self.n_slots),
+        )
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def slot(self, time):
+        """Index of the first slot at or after `time`"""
+        return -(-(pd.Timestamp(time) - self.start).value // FREQ.value)
+
+    def slots(self, start, end):
+        # [lo, hi) slot range of start <= time <= end within the history
+        lo = max(self.slot(start), 0)
+        hi = min((pd.Timestamp(end) - self.start).value // FREQ.value + 1, self.n_slots)
+        return lo, max(hi, lo)
+
+    def read(self, row, lo, hi):
+        return np.asarray(self._data[row, lo:hi], dtype=np.int64)
+
+    def window(self, station, rideable_type, start, end):
+        """Long-format rows for one series with start <= time <= end"""
+
+        row = self._series_idx[(station, rideable_type)]
+        lo, hi = self.slots(start, end)
+
+        n = hi - lo
+        return pd.DataFrame(
+            {
+                "time": pd.date_range(self.start + lo * FREQ, periods=n, freq=FREQ),
+                "station": pd.Categorical([station] * n, categories=self.stations),
+                "rideable_type": pd.Categorical(
+                    [rideable_type] * n, categories=self.rideable_types
+                ),
+                "stock": self.read(row, lo, hi),
+            }
+        )
+
+
+class DayBlockStore(HistoryStore):
+    """
+    Memory-mapped day-block history (see write_day_blocks). A window reads the
+    blocks of its days, found by offset, so lookups cost the same for any
+    history length.
+    """
+
+    magic = BLOCK_MAGIC
+
+    def map(self, path, header, offset):
+        # One block per series and day
+        return np.memmap(
+            path,
+            dtype=block_dtype(header),
+            mode="r",
+            offset=offset,
+            shape=(len(self.series), header["n_days"]),
+        )
+
+    def read(self, row, lo, hi):
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+
+        first, last = lo // SLOTS_PER_DAY, (hi - 1) // SLOTS_PER_DAY
+        blocks = self._data[row, first : last + 1]
+
+        stock = np.empty((len(blocks), SLOTS_PER_DAY), dtype=np.int64)
+        stock[:, 0] = blocks["base"]
+        stock[:, 1:] = blocks["deltas"]
+        stock = np.cumsum(stock, axis=1).ravel()
+
+        offset = first * SLOTS_PER_DAY
+        return stock[lo - offset : hi - offset]
+
+
+def open_store(path, stations=None, rideable_types=None):
+    # Either history file format, by its magic
+    magic, _, _ = read_header(path)
+    store = DayBlockStore if magic == BLOCK_MAGIC else HistoryStore
+    return store(path, stations=stations, rideable_types=rideable_types)
+
+
+def write_sharded_history(stock_df, directory):
+    """
+    Split a wide stock frame into one day-block history file per station plus a
+    station dictionary (stations.json) mapping each name to its integer id.
+    Every station has a series of every rideable type, a series without
+    trips staying at the initial stock, so any valid query has a history.
+    """
+
+    stations = sorted(stock_df.columns.get_level_values(0).unique())
+    rideable_types = sorted(stock_df.columns.get_level_values(1).unique())
+    stock_df = stock_df.reindex(
+        columns=pd.MultiIndex.from_product([stations, rideable_types]),
+        fill_value=INITIAL_STOCK,
+    )
+
+    # Build next to the target and rename, so readers only see complete shards
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+    try:
+        for station_id, station in enumerate(stations):
+            shard = stock_df.xs(station, axis=1, level=0, drop_level=False)
+            write_day_blocks(shard, os.path.join(tmp_dir, shard_name(station_id)))
+
+        with open(os.path.join(tmp_dir, "stations.json"), "w") as f_out:
+            json.dump({"stations": stations, "rideable_types": rideable_types}, f_out)
+
+        os.chmod(tmp_dir, 0o755)
+        os.rename(tmp_dir, directory)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another worker finished the same build first
+        if os.path.exists(os.path.join(directory, "stations.json")):
+            return
+        raise
+
+
+def shard_name(station_id):
+    return f"station_{station_id:06d}.bin"
+
+
+class ShardedHistory:
+    """
+    Per-station history shards behind a station dictionary. Shards are mapped
+    on first use and the least recently used ones are unmapped once the mapped
+    size exceeds `max_bytes`, so lookups cost the same for any station count.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        with open(os.path.join(directory, "stations.json")) as f_in:
+            dictionary = json.load(f_in)
+
+        self.stations = dictionary["stations"]
+        self.rideable_types = dictionary["rideable_types"]
+        self.station_ids = {station: i for i, station in enumerate(self.stations)}
+
+        self._shards = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def shard(self, station_id):
+        with self._lock:
+            store = self._shards.get(station_id)
+            if store is not None:
+                self._shards.move_to_end(station_id)
+                return store
+
+            store = open_store(
+                os.path.join(self.directory, shard_name(station_id)),
+                stations=self.stations,
+                rideable_types=self.rideable_types,
+            )
+            self._shards[station_id] = store
+            self._nbytes += store.nbytes
+
+            while self._nbytes > self.max_bytes and len(self._shards) > 1:
+                _, evicted = self._shards.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+            return store
+
+    def window(self, station, rideable_type, start, end):
+        store = self.shard(self.station_ids[station])
+        return store.window(station, rideable_type, start, end)
+
+
+def open_history(directory, csv_path, max_bytes=256 * 2**20):
+    """Open the sharded history, building it from the timeseries csv on first use"""
+
+    if not os.path.exists(os.path.join(directory, "stations.json")):
+        stock_df = pd.read_csv(csv_path, index_col=0, header=[0, 1], parse_dates=True)
+        write_sharded_history(stock_df, directory)
+
+    return ShardedHistory(directory, max_bytes=max_bytes)
+
+
+if __name__ == "__main__":
+    df = pd.read_csv(sys.argv[1], index_col=0, header=[0, 1], parse_dates=True)
+    write_sharded_history(df, sys.argv[2])
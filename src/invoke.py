@@ -1,8 +1,19 @@
 import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 
-lambda_client = boto3.client("lambda")
+FUNCTION_NAME = os.getenv("FUNCTION_NAME", "citibike-docker")
+
+# Queries per invocation, and invocations in flight at once
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "50"))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))
+
+# e.g. http://localhost:9000 with the Lambda runtime interface emulator
+# (FUNCTION_NAME=function)
+lambda_client = boto3.client("lambda", endpoint_url=os.getenv("LAMBDA_ENDPOINT_URL"))
 
 customer = {
     "station": "W 21 St & 6 Ave",
@@ -10,11 +21,64 @@ customer = {
     "target_date": "2025-03-01",
 }
 
-response = lambda_client.invoke(
-    FunctionName="citibike-docker",
-    InvocationType="RequestResponse",
-    Payload=json.dumps(customer),
-)
 
-result = json.loads(response["Payload"].read())
-print(json.dumps(result, indent=2))
+def call(payload):
+    # (FunctionError or None, decoded response payload)
+    response = lambda_client.invoke(
+        FunctionName=FUNCTION_NAME,
+        InvocationType="RequestResponse",
+        Payload=json.dumps(payload),
+    )
+
+    return response.get("FunctionError"), json.loads(response["Payload"].read())
+
+
+def invoke(payload):
+    return call(payload)[1]
+
+
+def invoke_batch(index, batch):
+    function_error, response = call(batch)
+
+    # A failed invocation returns the runtime's error payload instead of results
+    if not isinstance(response, dict):
+        response = {"errorMessage": response}
+    if function_error or "results" not in response:
+        raise RuntimeError(
+            f"Batch {index} ({len(batch)} queries from {batch[0]!r}) failed: "
+            f"{function_error or 'no results'}: {response.get('errorMessage', response)}"
+        )
+
+    return response["results"]
+
+
+def invoke_many(queries, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS):
+    """
+    Results of many queries, in order. Queries are sent in batches, with at
+    most `max_workers` invocations in flight (boto3 clients are thread-safe).
+    A batch whose invocation fails raises a RuntimeError naming it.
+    """
+
+    batches = [queries[i : i + batch_size] for i in range(0, len(queries), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        responses = executor.map(invoke_batch, range(len(batches)), batches)
+
+        return [result for results in responses for result in results]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # A JSON array of queries, e.g. a fleet-wide nightly run
+        with open(sys.argv[1]) as f_in:
+            queries = json.load(f_in)
+
+        results = invoke_many(queries)
+
+        failed = sum("error" in result for result in results)
+        print(f"{len(results)} queries, {failed} failed")
+        print(json.dumps(results, indent=2))
+
+    else:
+        result = invoke(customer)
+        print(json.dumps(result, indent=2))
@@ -1,18 +1,32 @@
+import base64
 import json
 import pickle
 from datetime import datetime
 from typing import Literal
 
-import numpy as np
 import pandas as pd
 from pydantic import BaseModel, field_validator
 
+from features import FEATURES, build_features
+from history_store import open_history
+
+# Map history globally to avoid overhead per invocation
+HISTORY = open_history("2025_history", "2025_timeseries.csv")
+
 
 class Info(BaseModel):
-    station: Literal["W 21 St & 6 Ave", "University Pl & E 14 St", "8 Ave & W 31 St"]
+    station: str
     rideable_type: Literal["classic_bike", "electric_bike"]
     target_date: str
 
+    @field_validator("station")
+    @classmethod
+    def check_station(cls, station):
+        if station not in HISTORY.station_ids:
+            raise ValueError("Unknown station")
+
+        return station
+
     @field_validator("target_date")
     @classmethod
     def check_target_date(cls, date_value):
@@ -33,89 +47,132 @@ class Info(BaseModel):
 with open("model.bin", "rb") as f:
     model = pickle.load(f)
 
-# Load data globally to avoid overhead per invocation
-DF_HISTORY = pd.read_csv("2025_long.csv", parse_dates=["time"])
-
-DF_HISTORY["station"] = DF_HISTORY["station"].astype("category")
-DF_HISTORY["rideable_type"] = DF_HISTORY["rideable_type"].astype("category")
-
-
-def predict_day(model, info):
-    start_search = pd.to_datetime(info.target_date) - pd.Timedelta(hours=2)
-    end_search = pd.to_datetime(info.target_date) + pd.Timedelta(hours=24)
-
-    mask = (
-        (DF_HISTORY["station"] == info.station)
-        & (DF_HISTORY["rideable_type"] == info.rideable_type)
-        & (DF_HISTORY["time"] >= start_search)
-        & (DF_HISTORY["time"] <= end_search)
-    )
-    data = DF_HISTORY.loc[mask].copy()
-
-    data["lag_15m_stock"] = data["stock"].shift(1)  # 1 row back (assuming 15min freq)
-    data["lag_30m_stock"] = data["stock"].shift(2)
-    data["lag_45m_stock"] = data["stock"].shift(3)
-    data["lag_60m_stock"] = data["stock"].shift(4)
-
-    # B. Time Features
-    data["hour"] = data["time"].dt.hour + data["time"].dt.minute / 60.0
-    data["dayofweek"] = data["time"].dt.dayofweek
-    data["is_rush_hour"] = data["hour"].apply(
-        lambda h: 1 if (8 <= h < 10) or (17 <= h < 19) else 0
-    )
-
-    # C. Date Numerical
-    start_ts = pd.to_datetime("2024-01-01").value
-    end_ts = pd.to_datetime("2025-01-01").value
-    data["date"] = (data["time"].dt.normalize().astype(np.int64) - start_ts) / (
-        end_ts - start_ts
-    )
-
-    target_mask = (data["time"] >= pd.to_datetime(info.target_date + " 00:00:00")) & (
-        data["time"] <= pd.to_datetime(info.target_date + " 23:45:00")
-    )
-
-    inference_df = data.loc[target_mask].copy()
-
-    features = [
-        "station",
-        "rideable_type",
-        "stock",
-        "hour",
-        "dayofweek",
-        "is_rush_hour",
-        "lag_15m_stock",
-        "lag_30m_stock",
-        "lag_45m_stock",
-        "lag_60m_stock",
-        "date",
-    ]
-
-    pred = model.predict(inference_df[features])
-    result_df = pd.DataFrame(
-        {"time": inference_df["time"] + pd.Timedelta(minutes=15), "prediction": pred}
-    )
-    result_df = result_df.reset_index()
 
+def alerts(times, predictions):
     initial_stock = 10
     target = 10
     ans = []
-    for i in range(len(result_df)):
-        if result_df.loc[i, "prediction"] < initial_stock - target:
-            ans.append(result_df.loc[i, "time"].strftime("%Y-%m-%d %H:%M:%S"))
+    for time, prediction in zip(times, predictions, strict=True):
+        if prediction < initial_stock - target:
+            ans.append(time.strftime("%Y-%m-%d %H:%M:%S"))
             initial_stock -= target
     return ans
 
 
-def lambda_handler(event, context):
-    print("Parameters:", event)
+def predict_days(model, infos):
+    """
+    Alerts for many queries, scored together: the windows of all queries are
+    featurized and predicted in one pass, each window being its own series.
+    """
+
+    windows = []
+    for i, info in enumerate(infos):
+        start_search = pd.to_datetime(info.target_date) - pd.Timedelta(hours=2)
+        end_search = pd.to_datetime(info.target_date) + pd.Timedelta(hours=24)
+
+        window = HISTORY.window(
+            info.station, info.rideable_type, start_search, end_search
+        )
+        window["query"] = i
+        window["target_date"] = pd.to_datetime(info.target_date)
+        windows.append(window)
+
+    data = build_features(pd.concat(windows, ignore_index=True), keys=["query"])
 
-    if "body" in event:
+    day = data["time"].dt.normalize()
+    inference_df = data.loc[day == data["target_date"]]
+
+    pred = model.predict(inference_df[FEATURES])
+    times = inference_df["time"] + pd.Timedelta(minutes=15)
+
+    query = inference_df["query"].to_numpy()
+    return [alerts(times[query == i], pred[query == i]) for i in range(len(infos))]
+
+
+def predict_day(model, info):
+    return predict_days(model, [info])[0]
+
+
+def parse_event(event):
+    """
+    Queries of an event as (id, payload) pairs, and whether it is a batch.
+    Accepts a single query, an array of queries (directly or as HTTP body),
+    and SQS/Kinesis style Records batches.
+    """
+
+    if "Records" in event:
+        items = []
+        for record in event["Records"]:
+            if "kinesis" in record:
+                item_id = record["kinesis"]["sequenceNumber"]
+                body = base64.b64decode(record["kinesis"]["data"])
+            else:
+                item_id = record["messageId"]
+                body = record["body"]
+            items.append((item_id, body))
+        return items, True
+
+    if isinstance(event, dict) and "body" in event:
         # Call HTTP (curl)
-        data = json.loads(event["body"])
-    else:
-        data = event
+        event = json.loads(event["body"])
+
+    if isinstance(event, list):
+        return list(enumerate(event)), True
 
-    info = Info(**data)
-    prediction = predict_day(model, info)
-    return {"prediction": prediction, "warning": bool(prediction)}
+    return [(0, event)], False
+
+
+def lambda_handler(event, context):
+    items, batch = parse_event(event)
+    print("Queries:", len(items) if batch else event)
+
+    if not batch:
+        info = Info(**items[0][1])
+        prediction = predict_day(model, info)
+        return {"prediction": prediction, "warning": bool(prediction)}
+
+    # Validate one by one, so a bad query only fails itself
+    results = {}
+    valid = []
+    for item_id, payload in items:
+        try:
+            if isinstance(payload, (str, bytes)):
+                payload = json.loads(payload)
+            valid.append((item_id, Info(**payload)))
+        except (ValueError, TypeError) as err:
+            results[item_id] = {"error": str(err)}
+
+    if valid:
+        try:
+            predictions = predict_days(model, [info for _, info in valid])
+        except Exception:
+            # Isolate the failing queries
+            predictions = []
+            for _, info in valid:
+                try:
+                    predictions.append(predict_day(model, info))
+                except Exception as err:
+                    predictions.append(err)
+
+        for (item_id, _), prediction in zip(valid, predictions, strict=True):
+            if isinstance(prediction, Exception):
+                results[item_id] = {"error": str(prediction)}
+            else:
+                results[item_id] = {
+                    "prediction": prediction,
+                    "warning": bool(prediction),
+                }
+
+    response = {
+        "results": [{"id": item_id, **results[item_id]} for item_id, _ in items]
+    }
+
+    # Partial batch response: SQS/Kinesis only retry the failed records
+    if "Records" in event:
+        response["batchItemFailures"] = [
+            {"itemIdentifier": item_id}
+            for item_id, _ in items
+            if "error" in results[item_id]
+        ]
+
+    return response
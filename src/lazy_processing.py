@@ -0,0 +1,172 @@
+import sys
+
+import pandas as pd
+import polars as pl
+
+try:
+    from src.features import DATE_RANGE
+except ModuleNotFoundError:
+    from features import DATE_RANGE
+
+# Lazy, multi-threaded counterpart of the data_processing chain
+# (preprocess -> remove_outlier -> feature_time_series -> wide_to_long ->
+# feature_engineering). The pandas functions stay the reference implementation.
+
+DROP_COLUMNS = [
+    "ride_id",
+    "start_station_id",
+    "end_station_id",
+    "start_lat",
+    "start_lng",
+    "end_lat",
+    "end_lng",
+    "member_casual",
+]
+
+SERIES = ["station", "rideable_type"]
+
+
+def scan(source):
+    # A path is scanned lazily so only the needed columns are read from disk
+    if isinstance(source, pd.DataFrame):
+        return pl.from_pandas(source).lazy()
+    return pl.scan_csv(source, infer_schema=False)
+
+
+def preprocess(lf):
+    return lf.drop_nulls().drop(DROP_COLUMNS)
+
+
+def remove_outlier(lf):
+    schema = lf.collect_schema()
+    lf = lf.with_columns(
+        [
+            pl.col(col).str.strptime(pl.Datetime("us"), "%Y-%m-%d %H:%M:%S%.f")
+            if schema[col] == pl.String
+            else pl.col(col).cast(pl.Datetime("us"))
+            for col in ["started_at", "ended_at"]
+        ]
+    )
+
+    duration = (pl.col("ended_at") - pl.col("started_at")).dt.total_microseconds() / (
+        1e6 * 60
+    )
+    lf = lf.with_columns(duration=duration)
+
+    z_score = (pl.col("duration") - pl.col("duration").mean()) / pl.col(
+        "duration"
+    ).std()
+
+    return lf.filter(z_score.abs() <= 2)
+
+
+def feature_time_series(lf):
+    top3_stations = (
+        lf.group_by("start_station_name")
+        .len()
+        .sort("len", descending=True)
+        .head(3)
+        .select(station=pl.col("start_station_name"))
+    )
+
+    # Outflow (-1) / Inflow (+1)
+    outflow = lf.select(
+        time=pl.col("started_at"),
+        station=pl.col("start_station_name"),
+        rideable_type=pl.col("rideable_type"),
+        flow=pl.lit(-1, dtype=pl.Int64),
+    )
+    inflow = lf.select(
+        time=pl.col("ended_at"),
+        station=pl.col("end_station_name"),
+        rideable_type=pl.col("rideable_type"),
+        flow=pl.lit(1, dtype=pl.Int64),
+    )
+    combined = pl.concat([outflow, inflow]).join(
+        top3_stations, on="station", how="semi"
+    )
+
+    # Resampling (15 mins)
+    net_flow = combined.group_by([pl.col("time").dt.truncate("15m"), *SERIES]).agg(
+        pl.col("flow").sum()
+    )
+
+    # Reindexing to fill every 15 min
+    first_day = pl.col("time").min().dt.truncate("1d")
+    last_day = pl.col("time").max().dt.truncate("1d")
+    last_day = (
+        pl.when(last_day == pl.col("time").max())
+        .then(last_day)
+        .otherwise(last_day.dt.offset_by("1d"))
+    )
+    spine = (
+        net_flow.select(
+            time=pl.datetime_range(first_day, last_day, "15m", closed="left")
+        )
+        .join(net_flow.select(SERIES).unique(), how="cross")
+        .join(net_flow, on=["time", *SERIES], how="left")
+        .with_columns(pl.col("flow").fill_null(0))
+    )
+
+    # Initial stock: Restore at every 00:00
+    initial_stock = 10
+    stock = spine.sort("time").with_columns(
+        stock=initial_stock
+        + pl.col("flow").cum_sum().over([*SERIES, pl.col("time").dt.date()])
+    )
+
+    return stock.filter(
+        pl.col("time") >= pl.col("time").min().dt.offset_by("1d")
+    ).select(["time", *SERIES, "stock"])
+
+
+def feature_engineering(lf):
+    hour = pl.col("time").dt.hour() + pl.col("time").dt.minute() / 60
+    morning_rush = (hour >= 8) & (hour <= 10)
+    evening_rush = (hour >= 17) & (hour <= 19)
+
+    start_ts = pd.to_datetime(DATE_RANGE[0]).value
+    end_ts = pd.to_datetime(DATE_RANGE[1]).value
+    date_ns = pl.col("time").dt.truncate("1d").dt.epoch("ns")
+
+    stock = pl.col("stock").cast(pl.Float64)
+
+    lf = lf.sort([*SERIES, "time"]).with_columns(
+        hour=hour,
+        dayofweek=(pl.col("time").dt.weekday() - 1).cast(pl.Int32),
+        is_rush_hour=(morning_rush | evening_rush).cast(pl.Int64),
+        lag_15m_stock=stock.shift(1).over(SERIES),
+        lag_30m_stock=stock.shift(2).over(SERIES),
+        lag_45m_stock=stock.shift(3).over(SERIES),
+        lag_60m_stock=stock.shift(4).over(SERIES),
+        target_next_stock=stock.shift(-1).over(SERIES),
+        date=(date_ns - start_ts) / (end_ts - start_ts),
+    )
+
+    return lf.drop_nulls().sort(["time", *SERIES]).drop("time")
+
+
+def pipeline(source):
+    """
+    Build the model features from raw trips (a csv path or DataFrame) as one
+    optimized Polars query plan, returned as pandas in the same layout as
+    data_processing.pipeline.
+    """
+
+    lf = scan(source)
+    lf = preprocess(lf)
+    lf = remove_outlier(lf)
+    lf = feature_time_series(lf)
+    lf = feature_engineering(lf)
+
+    df = lf.collect().to_pandas()
+
+    for col in SERIES:
+        df[col] = df[col].astype("category")
+
+    return df
+
+
+if __name__ == "__main__":
+    df_feature = pipeline(sys.argv[1])
+    df_feature.to_csv(sys.argv[2], index=False)
@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FileSource:
+    """Pickled model on disk, versioned by the hash of its content"""
+
+    def __init__(self, path):
+        self.path = path
+        self._stat = None
+        self._version = None
+
+    def fingerprint(self):
+        # Hash only when mtime/size change, so polling is a single stat call
+        st = os.stat(self.path)
+        stat = (st.st_mtime_ns, st.st_size)
+
+        if stat != self._stat:
+            with open(self.path, "rb") as f_in:
+                self._version = hashlib.sha256(f_in.read()).hexdigest()[:12]
+            self._stat = stat
+
+        return self._version
+
+    def load(self):
+        with open(self.path, "rb") as f_in:
+            content = f_in.read()
+        return pickle.loads(content), hashlib.sha256(content).hexdigest()[:12]
+
+
+class MlflowAliasSource:
+    """Registered MLflow model, versioned by the model version behind an alias"""
+
+    def __init__(self, model_name, alias="Champion"):
+        import mlflow
+        from mlflow.tracking import MlflowClient
+
+        self._mlflow = mlflow
+        self._client = MlflowClient()
+        self.model_name = model_name
+        self.alias = alias
+
+    def fingerprint(self):
+        return self._client.get_model_version_by_alias(
+            self.model_name, self.alias
+        ).version
+
+    def load(self):
+        version = self.fingerprint()
+        model = self._mlflow.sklearn.load_model(f"models:/{self.model_name}/{version}")
+        return model, version
+
+
+class ModelHolder:
+    """
+    Holds the serving model and swaps in new versions without a restart.
+    A new version is loaded and warmed up off the request path, then published
+    with a single reference assignment, so in-flight requests keep the model
+    they started with.
+    """
+
+    def __init__(self, source, warmup=None):
+        self.source = source
+        self.warmup = warmup
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failed = None
+
+        model, version = source.load()
+        self._current = (model, version)
+
+    def get(self):
+        return self._current
+
+    @property
+    def version(self):
+        return self._current[1]
+
+    def on_swap(self, listener):
+        self._listeners.append(listener)
+
+    def check(self):
+        """Load the source's latest version if it changed. Returns True on swap"""
+
+        with self._lock:
+            fingerprint = None
+            try:
+                fingerprint = self.source.fingerprint()
+                if fingerprint in (self.version, self._failed):
+                    return False
+
+                model, version = self.source.load()
+                if self.warmup is not None:
+                    self.warmup(model)
+            except Exception:
+                # Keep serving the current model if the new one is broken
+                self._failed = fingerprint
+                logger.exception(
+                    "Model reload failed, keeping version %s", self.version
+                )
+                return False
+
+            self._current = (model, version)
+
+        logger.info("Model version %s is now serving", version)
+        for listener in self._listeners:
+            listener(version)
+
+        return True
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            self.check()
+
+    def start(self, interval):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, args=(interval,), name="model-reload", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def model_source(uri):
+    # "models:/<name>@<alias>" watches the MLflow registry, anything else is a file
+    if uri.startswith("models:/"):
+        name, _, alias = uri.removeprefix("models:/").partition("@")
+        return MlflowAliasSource(name, alias or "Champion")
+
+    return FileSource(uri)
@@ -0,0 +1,310 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time as time_module
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.history_store import FREQ
+except ModuleNotFoundError:
+    from history_store import FREQ
+
+logger = logging.getLogger(__name__)
+
+# Online stock updates from trip events. Each event is one trip start (flow -1
+# at the start station) or end (flow +1 at the end station); it updates the
+# running stock of its (station, rideable_type) series in O(1) and writes it
+# into a ring buffer of the latest 15 min slots. As in feature_time_series,
+# the stock of a slot includes every event up to the end of the slot and is
+# restored to `initial_stock` at midnight.
+
+SLOTS_PER_DAY = 96
+
+
+class OnlineStock:
+    def __init__(
+        self,
+        stations,
+        rideable_types,
+        window_slots=2 * SLOTS_PER_DAY,
+        initial_stock=10,
+        start=None,
+    ):
+        self.stations = list(stations)
+        self.rideable_types = list(rideable_types)
+        self.station_ids = {station: i for i, station in enumerate(self.stations)}
+        self.series = [(s, r) for s in self.stations for r in self.rideable_types]
+        self._series_idx = {s: i for i, s in enumerate(self.series)}
+
+        self.window_slots = window_slots
+        self.initial_stock = initial_stock
+
+        n_series = len(self.series)
+        self._ring = np.full((n_series, window_slots), initial_stock, dtype=np.int32)
+        self._stock = np.full(n_series, initial_stock, dtype=np.int64)
+        self._last = np.zeros(n_series, dtype=np.int64)
+
+        # Nothing before the origin (midnight of the first event or `start`) is known
+        self.origin = None
+        self.now = None  # latest slot with an event
+        if start is not None:
+            self._set_origin(slot_of(start))
+
+        self.version = 0  # events applied so far
+        self.dropped = 0  # events older than the window (or the origin)
+        self._lock = threading.Lock()
+
+    def _set_origin(self, slot):
+        self.origin = slot - slot % SLOTS_PER_DAY
+        self.now = self.origin
+        self._last[:] = self.origin - 1
+
+    def _advance(self, row, slot):
+        # Carry the stock forward to `slot`, restoring it at every midnight
+        last = self._last[row]
+        if slot <= last:
+            return
+
+        if slot // SLOTS_PER_DAY != last // SLOTS_PER_DAY:
+            self._stock[row] = self.initial_stock
+
+        # Only the last window_slots filled slots can still be read
+        filled = np.arange(max(last + 1, slot - self.window_slots + 1), slot + 1)
+        same_day = filled // SLOTS_PER_DAY == last // SLOTS_PER_DAY
+        carried = self._ring[row, last % self.window_slots]
+        self._ring[row, filled % self.window_slots] = np.where(
+            same_day, carried, self.initial_stock
+        )
+        self._last[row] = slot
+
+    def apply(self, time, station, rideable_type, flow):
+        row = self._series_idx.get((station, rideable_type))
+        if row is None:
+            return False  # Not a served series
+
+        slot = slot_of(time)
+        with self._lock:
+            if self.origin is None:
+                self._set_origin(slot)
+
+            last = self._last[row]
+            if slot < max(self.origin, last - self.window_slots + 1):
+                self.dropped += 1
+                return False
+
+            if slot >= last:
+                self._advance(row, slot)
+                self._stock[row] += flow
+                self._ring[row, slot % self.window_slots] = self._stock[row]
+            else:
+                # Late event: it changes the stocks from its slot to the end
+                # of its day (at most one day of slots)
+                day_end = slot - slot % SLOTS_PER_DAY + SLOTS_PER_DAY - 1
+                late = np.arange(slot, min(last, day_end) + 1)
+                self._ring[row, late % self.window_slots] += flow
+                if day_end >= last:
+                    self._stock[row] += flow
+
+            self.now = max(self.now, slot)
+            self.version += 1
+
+        return True
+
+    def window(self, station, rideable_type, start, end):
+        """
+        Long-format rows, as HistoryStore.window, for start <= time <= end
+        within the buffered slots up to the latest event.
+        """
+
+        row = self._series_idx[(station, rideable_type)]
+
+        with self._lock:
+            if self.origin is None:
+                lo, hi = 0, -1
+            else:
+                self._advance(row, self.now)
+                first = max(self.origin, self.now - self.window_slots + 1)
+                lo = max(-(-pd.Timestamp(start).value // FREQ.value), first)
+                hi = min(pd.Timestamp(end).value // FREQ.value, self.now)
+
+            slots = np.arange(lo, hi + 1)
+            stock = self._ring[row, slots % self.window_slots].astype(np.int64)
+
+        n = len(slots)
+        return pd.DataFrame(
+            {
+                "time": pd.to_datetime(slots * FREQ.value),
+                "station": pd.Categorical([station] * n, categories=self.stations),
+                "rideable_type": pd.Categorical(
+                    [rideable_type] * n, categories=self.rideable_types
+                ),
+                "stock": stock,
+            }
+        )
+
+
+def slot_of(time):
+    return pd.Timestamp(time).value // FREQ.value
+
+
+class LiveHistory:
+    """
+    The static history with the online stocks layered on top: a window reads
+    the history up to the first buffered slot and the online buffer from there.
+    """
+
+    def __init__(self, history, online):
+        self.history = history
+        self.online = online
+        self.stations = history.stations
+        self.rideable_types = history.rideable_types
+        self.station_ids = history.station_ids
+
+    @property
+    def version(self):
+        return self.online.version
+
+    def window(self, station, rideable_type, start, end):
+        live = self.online.window(station, rideable_type, start, end)
+        if live.empty:
+            return self.history.window(station, rideable_type, start, end)
+
+        before = self.history.window(
+            station, rideable_type, start, live["time"].iloc[0] - FREQ
+        )
+        return pd.concat([before, live], ignore_index=True)
+
+
+def trip_events(trips):
+    """Start (-1) and end (+1) events of a trips frame, in time order"""
+
+    starts = pd.DataFrame(
+        {
+            "time": pd.to_datetime(trips["started_at"], format="mixed"),
+            "station": trips["start_station_name"],
+            "rideable_type": trips["rideable_type"],
+            "flow": -1,
+        }
+    )
+    ends = pd.DataFrame(
+        {
+            "time": pd.to_datetime(trips["ended_at"], format="mixed"),
+            "station": trips["end_station_name"],
+            "rideable_type": trips["rideable_type"],
+            "flow": 1,
+        }
+    )
+
+    events = pd.concat([starts, ends]).dropna(subset=["station"])
+    return events.sort_values("time", kind="stable", ignore_index=True)
+
+
+# Event sources: anything with events(stop) yielding event dicts
+# {"time", "station", "rideable_type", "flow"} until `stop` is set
+
+
+class InProcessQueue:
+    def __init__(self, maxsize=0):
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        self._queue.put(event)
+
+    def events(self, stop, timeout=0.2):
+        while not stop.is_set():
+            try:
+                yield self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+
+class FileTail:
+    """Follows an NDJSON file of events as lines are appended to it"""
+
+    def __init__(self, path, poll_interval=0.2, from_end=False):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.from_end = from_end
+
+    def events(self, stop):
+        while not os.path.exists(self.path):
+            if stop.wait(self.poll_interval):
+                return
+
+        with open(self.path) as f_in:
+            if self.from_end:
+                f_in.seek(0, os.SEEK_END)
+
+            pending = ""
+            while not stop.is_set():
+                line = f_in.readline()
+                if not line:
+                    stop.wait(self.poll_interval)
+                    continue
+
+                # A line still being written is completed on the next read
+                pending += line
+                if not pending.endswith("\n"):
+                    continue
+
+                line, pending = pending.strip(), ""
+                if not line:
+                    continue
+
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("Skipping malformed event line: %.200s", line)
+
+
+def consume(source, online, stop):
+    # One bad event must not stop the thread, or the live stocks freeze silently
+    for event in source.events(stop):
+        try:
+            online.apply(
+                event["time"], event["station"], event["rideable_type"], event["flow"]
+            )
+        except (KeyError, ValueError, TypeError) as err:
+            logger.warning("Skipping invalid event %.200r: %r", event, err)
+
+
+def start_consumer(source, online):
+    """Apply the source's events in a background thread; set the returned event to stop"""
+
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=consume, args=(source, online, stop), name="online-stock", daemon=True
+    )
+    thread.start()
+
+    return stop
+
+
+def live_history(history, source, **kwargs):
+    online = OnlineStock(history.stations, history.rideable_types, **kwargs)
+    start_consumer(source, online)
+
+    return LiveHistory(history, online)
+
+
+if __name__ == "__main__":
+    # python online_features.py <trips csv> <events ndjson> [speedup]:
+    # replay trips as a live event feed for FileTail, in time order
+    events = trip_events(pd.read_csv(sys.argv[1]))
+    speedup = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    with open(sys.argv[2], "a") as f_out:
+        previous = None
+        for event in events.itertuples(index=False):
+            if speedup and previous is not None:
+                time_module.sleep((event.time - previous).total_seconds() / speedup)
+            previous = event.time
+
+            record = {**event._asdict(), "time": event.time.isoformat()}
+            f_out.write(json.dumps(record) + "\n")
+            f_out.flush()
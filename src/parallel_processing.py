@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src import data_processing
+    from src.features import LAGS
+    from src.pools import process_pool
+except ModuleNotFoundError:
+    import data_processing
+    from features import LAGS
+    from pools import process_pool
+
+# Month-parallel driver of the data_processing chain, with the same output as
+# data_processing.pipeline. The stock restarts at every midnight, so months
+# are independent once the few statistics of the whole year are fixed:
+#   1. per month: preprocess and parse the trips, return the trip durations
+#   2. duration mean/std of the year (the outlier bounds)
+#   3. per month: drop outliers, count start stations and sum the net flow of
+#      every station per slot (trips ending next month included)
+#   4. top stations of the year and their stock series, from the summed flows
+#   5. per month: features, with the neighbouring slots as lag/target context
+
+
+def month_positions(df):
+    # Row positions of the trips started in each month ("YYYY-MM")
+    months = df["started_at"].astype(str).str[:7]
+    return [
+        positions for _, positions in sorted(months.groupby(months).indices.items())
+    ]
+
+
+def parse_month(trips, path):
+    df = data_processing.preprocess(trips)
+
+    df["started_at"] = pd.to_datetime(df["started_at"], format="mixed")
+    df["ended_at"] = pd.to_datetime(df["ended_at"], format="mixed")
+    df.to_parquet(path)
+
+    return (df["ended_at"] - df["started_at"]).dt.total_seconds() / 60
+
+
+def month_flows(path, mean, std):
+    df = data_processing.remove_outlier(pd.read_parquet(path), mean, std)
+
+    counts = df.groupby("start_station_name").size()
+    return counts, data_processing.slot_flows(df)
+
+
+def month_features(stock_window, offset, start, end):
+    long_df = data_processing.wide_to_long(stock_window)
+    # Row labels of the same rows in the long frame of the whole year
+    long_df.index += offset
+
+    return data_processing.feature_engineering(long_df, start, end)
+
+
+def pipeline(df, workers=None):
+    parts = month_positions(df)
+
+    with (
+        tempfile.TemporaryDirectory() as tmp_dir,
+        process_pool(workers) as pool,
+    ):
+        paths = [os.path.join(tmp_dir, f"{i}.parquet") for i in range(len(parts))]
+        months = [df.iloc[positions].set_axis(positions) for positions in parts]
+
+        # In trip order, so the statistics equal those of the whole frame
+        duration = pd.concat(pool.map(parse_month, months, paths)).sort_index()
+        mean, std = duration.mean(), duration.std()
+
+        results = list(pool.map(month_flows, paths, repeat(mean), repeat(std)))
+
+        counts = pd.concat([counts for counts, _ in results])
+        stations = data_processing.top_of_counts(counts.groupby(level=0).sum())
+
+        flows = pd.concat([flows for _, flows in results])
+        flows = flows[flows.index.get_level_values("station").isin(stations)]
+        stock_df = data_processing.stock_from_flows(
+            flows.groupby(level=[0, 1, 2]).sum()
+        )
+
+        # Month chunks of the stock rows, each with max lag rows before and
+        # one row (the target) after
+        context = max(LAGS.values())
+        bounds = np.flatnonzero(np.diff(stock_df.index.month)) + 1
+        starts = [0, *bounds]
+        ends = [*bounds, len(stock_df)]
+        n_series = stock_df.shape[1]
+
+        windows, offsets, chunk_starts, chunk_ends = [], [], [], []
+        for start, end in zip(starts, ends, strict=True):
+            lo, hi = max(start - context, 0), min(end + 1, len(stock_df))
+            windows.append(stock_df.iloc[lo:hi])
+            offsets.append(lo * n_series)
+            chunk_starts.append(stock_df.index[start])
+            chunk_ends.append(stock_df.index[end - 1] + pd.Timedelta(minutes=15))
+
+        features = pool.map(month_features, windows, offsets, chunk_starts, chunk_ends)
+
+        return pd.concat(features)
+
+
+if __name__ == "__main__":
+    # python parallel_processing.py <trips csv> <features csv> [workers]
+    df = pd.read_csv(sys.argv[1])
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    pipeline(df, workers).to_csv(sys.argv[2], index=False)
@@ -0,0 +1,16 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(workers=None):
+    """
+    Process pool of `workers` (one per core by default). Workers are spawned,
+    not forked: the caller (e.g. a Prefect flow) may be running threads, whose
+    locks a forked child would inherit in whatever state they were.
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+    )
@@ -1,111 +1,164 @@
+import os
 from datetime import datetime
 from typing import Literal
 
-import numpy as np
 import pandas as pd
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from features import FEATURES, build_features
+from history_store import open_history
+from online_features import FileTail, live_history
+
+# Station dictionary and per-station history shards, loaded once at startup
+HISTORY_CACHE_BYTES = int(os.getenv("HISTORY_CACHE_BYTES", str(256 * 2**20)))
+
+try:
+    HISTORY = open_history(
+        "data/2025_history", "data/2025_timeseries.csv", HISTORY_CACHE_BYTES
+    )
+except FileNotFoundError:
+    HISTORY = open_history("2025_history", "2025_timeseries.csv", HISTORY_CACHE_BYTES)
+
+# Live trip events (NDJSON, see online_features) update the latest stocks on
+# top of the history as they arrive
+ONLINE_EVENTS = os.getenv("ONLINE_EVENTS")
+if ONLINE_EVENTS:
+    HISTORY = live_history(HISTORY, FileTail(ONLINE_EVENTS))
+
+
+def validate_date(date_value):
+    try:
+        parsed_date = datetime.strptime(date_value, "%Y-%m-%d")
+
+        if parsed_date.year != 2025:
+            raise ValueError("Year should be 2025")
+
+    except ValueError as err:
+        raise ValueError("Incorrect date") from err
+
+    return date_value
+
+
+def validate_station(station):
+    if station not in HISTORY.station_ids:
+        raise ValueError("Unknown station")
+
+    return station
 
 
 class Info(BaseModel):
-    station: Literal["W 21 St & 6 Ave", "University Pl & E 14 St", "8 Ave & W 31 St"]
+    station: str
     rideable_type: Literal["classic_bike", "electric_bike"]
     target_date: str
 
+    @field_validator("station")
+    @classmethod
+    def check_station(cls, station):
+        return validate_station(station)
+
     @field_validator("target_date")
     @classmethod
     def check_target_date(cls, date_value):
-        try:
-            parsed_date = datetime.strptime(date_value, "%Y-%m-%d")
+        return validate_date(date_value)
+
+
+class Series(BaseModel):
+    station: str
+    rideable_type: Literal["classic_bike", "electric_bike"]
 
-            if parsed_date.year != 2025:
-                raise ValueError("Year should be 2025")
+    @field_validator("station")
+    @classmethod
+    def check_station(cls, station):
+        return validate_station(station)
 
-        except ValueError as err:
-            raise ValueError("Incorrect date") from err
 
-        return date_value
+class RangeQuery(BaseModel):
+    series: list[Series] = Field(min_length=1)
+    start_date: str
+    end_date: str
 
+    @field_validator("start_date", "end_date")
+    @classmethod
+    def check_dates(cls, date_value):
+        return validate_date(date_value)
 
-def predict_day(model, info):
-    try:
-        df_history = pd.read_csv(
-            "data/2025_timeseries.csv", index_col=0, header=[0, 1], parse_dates=True
-        )
-    except FileNotFoundError:
-        df_history = pd.read_csv(
-            "2025_timeseries.csv", index_col=0, header=[0, 1], parse_dates=True
-        )
-    df_history = df_history.stack(level=[0, 1], future_stack=True).reset_index()
-    df_history.columns = ["time", "station", "rideable_type", "stock"]
+    @model_validator(mode="after")
+    def check_range(self):
+        days = (pd.Timestamp(self.end_date) - pd.Timestamp(self.start_date)).days + 1
+        if days < 1:
+            raise ValueError("end_date is before start_date")
 
-    df_history["station"] = df_history["station"].astype("category")
-    df_history["rideable_type"] = df_history["rideable_type"].astype("category")
+        return self
 
+
+def predict_day(model, info):
     start_search = pd.to_datetime(info.target_date) - pd.Timedelta(hours=2)
     end_search = pd.to_datetime(info.target_date) + pd.Timedelta(hours=24)
 
-    mask = (
-        (df_history["station"] == info.station)
-        & (df_history["rideable_type"] == info.rideable_type)
-        & (df_history["time"].dt.tz_localize(None) >= start_search)
-        & (df_history["time"].dt.tz_localize(None) <= end_search)
-    )
-    data = df_history.loc[mask].copy()
-
-    data["lag_15m_stock"] = data["stock"].shift(1)  # 1 row back (assuming 15min freq)
-    data["lag_30m_stock"] = data["stock"].shift(2)
-    data["lag_45m_stock"] = data["stock"].shift(3)
-    data["lag_60m_stock"] = data["stock"].shift(4)
-
-    # B. Time Features
-    data["hour"] = data["time"].dt.hour + data["time"].dt.minute / 60.0
-    data["dayofweek"] = data["time"].dt.dayofweek
-    data["is_rush_hour"] = data["hour"].apply(
-        lambda h: 1 if (8 <= h < 10) or (17 <= h < 19) else 0
-    )
+    data = HISTORY.window(info.station, info.rideable_type, start_search, end_search)
 
-    # C. Date Numerical
-    start_ts = pd.to_datetime("2024-01-01").value
-    end_ts = pd.to_datetime("2025-01-01").value
-    data["date"] = (data["time"].dt.normalize().astype(np.int64) - start_ts) / (
-        end_ts - start_ts
-    )
+    data = build_features(data)
 
-    target_mask = (
-        data["time"].dt.tz_localize(None)
-        >= pd.to_datetime(info.target_date + " 00:00:00")
-    ) & (
-        data["time"].dt.tz_localize(None)
-        <= pd.to_datetime(info.target_date + " 23:45:00")
+    target_mask = (data["time"] >= pd.to_datetime(info.target_date + " 00:00:00")) & (
+        data["time"] <= pd.to_datetime(info.target_date + " 23:45:00")
     )
 
     inference_df = data.loc[target_mask].copy()
 
-    features = [
-        "station",
-        "rideable_type",
-        "stock",
-        "hour",
-        "dayofweek",
-        "is_rush_hour",
-        "lag_15m_stock",
-        "lag_30m_stock",
-        "lag_45m_stock",
-        "lag_60m_stock",
-        "date",
-    ]
-
-    pred = model.predict(inference_df[features])
-    result_df = pd.DataFrame(
-        {"time": inference_df["time"] + pd.Timedelta(minutes=15), "prediction": pred}
-    )
-    result_df = result_df.reset_index()
+    pred = model.predict(inference_df[FEATURES])
+    return alerts(inference_df["time"] + pd.Timedelta(minutes=15), pred)
+
 
+def alerts(times, predictions):
     initial_stock = 10
     target = 10
     ans = []
-    for i in range(len(result_df)):
-        if result_df.loc[i, "prediction"] < initial_stock - target:
-            ans.append(result_df.loc[i, "time"].strftime("%Y-%m-%d %H:%M:%S"))
+    for time, prediction in zip(times, predictions, strict=True):
+        if prediction < initial_stock - target:
+            ans.append(time.strftime("%Y-%m-%d %H:%M:%S"))
             initial_stock -= target
     return ans
+
+
+def predict_range(model, series, start_date, end_date, chunk_days=31):
+    """
+    Alerts of every series for each day from start_date to end_date, as
+    (series, day, alerts) in day order. Each chunk of days slices every
+    series' history once and is featurized and scored in one pass, so a
+    caller can stream a chunk's days while the next one is computed.
+    """
+
+    days = pd.date_range(start_date, end_date, freq="D")
+    for first in range(0, len(days), chunk_days):
+        chunk = days[first : first + chunk_days]
+
+        windows = []
+        for i, one in enumerate(series):
+            window = HISTORY.window(
+                one.station,
+                one.rideable_type,
+                chunk[0] - pd.Timedelta(hours=2),
+                chunk[-1] + pd.Timedelta(hours=24),
+            )
+            window["query"] = i
+            windows.append(window)
+
+        data = build_features(pd.concat(windows, ignore_index=True), keys=["query"])
+
+        day = data["time"].dt.normalize()
+        data = data.loc[(day >= chunk[0]) & (day <= chunk[-1])]
+
+        result = pd.DataFrame(
+            {
+                "time": data["time"] + pd.Timedelta(minutes=15),
+                "prediction": model.predict(data[FEATURES]),
+                "day": data["time"].dt.normalize(),
+                "query": data["query"],
+            }
+        )
+
+        rows_of = result.groupby(["day", "query"]).indices
+        for target_day in chunk:
+            for i, one in enumerate(series):
+                rows = result.iloc[rows_of.get((target_day, i), [])]
+                yield one, target_day, alerts(rows["time"], rows["prediction"])
@@ -0,0 +1,139 @@
+import itertools
+import sys
+
+import numpy as np
+import pandas as pd
+
+# What-if simulation of rebalancing policies. A policy is a starting stock
+# (also the level trucks restock towards), a dock capacity, a truck restock
+# size and a truck schedule (hours of the day with a visit). All policies are
+# replayed at once over the 15 min net flows of every station and day.
+
+SLOTS_PER_DAY = 96
+SLOT_MINUTES = 15
+
+
+def net_flow(stock_df, initial_stock=10):
+    """
+    Net flows (days, 96, series) of a wide stock frame as built by
+    feature_time_series (stock restored to `initial_stock` every midnight),
+    e.g. data/2025_timeseries.csv, or of forecast stocks in the same layout.
+    """
+
+    index = pd.DatetimeIndex(stock_df.index)
+    if len(index) % SLOTS_PER_DAY or index[0] != index[0].normalize():
+        raise ValueError("Stock frame must hold whole days of 15 min slots")
+
+    n_days = len(index) // SLOTS_PER_DAY
+    stock = stock_df.to_numpy(np.float64).reshape(n_days, SLOTS_PER_DAY, -1)
+
+    previous = np.concatenate(
+        [np.full_like(stock[:, :1], initial_stock), stock[:, :-1]], axis=1
+    )
+
+    return stock - previous
+
+
+def policy_grid(initial_stock, capacity, restock_size, schedules):
+    """All combinations as a frame; a schedule is a tuple of visit hours"""
+
+    rows = itertools.product(initial_stock, capacity, restock_size, schedules)
+    return pd.DataFrame(
+        rows, columns=["initial_stock", "capacity", "restock_size", "schedule"]
+    )
+
+
+def visit_mask(schedules):
+    # (policies, 96): True in the slot at each visit hour
+    mask = np.zeros((len(schedules), SLOTS_PER_DAY), dtype=bool)
+    for i, schedule in enumerate(schedules):
+        for hour in schedule:
+            mask[i, int(hour * 60 // SLOT_MINUTES)] = True
+
+    return mask
+
+
+def simulate(flow, policies, daily_reset=True, chunk=256):
+    """
+    Replay `flow` (days, 96, series) under every policy. Rentals that find the
+    station empty and returns that find it full are lost; a station that ends
+    a slot empty (full) counts that slot's minutes as stockout (overflow).
+    Without `daily_reset`, stock carries over midnight instead of restarting.
+    Returns one row of totals (over stations and days) per policy.
+    """
+
+    flow = np.asarray(flow, dtype=np.float64)
+    if not daily_reset:
+        # One long day: the schedule repeats every 96 slots
+        flow = flow.reshape(1, -1, flow.shape[-1])
+    n_slots = flow.shape[1]
+
+    results = []
+    for start in range(0, len(policies), chunk):
+        part = policies.iloc[start : start + chunk]
+
+        # (policies, 1, 1) against (days, series) per slot
+        target = part["initial_stock"].to_numpy(np.float64)[:, None, None]
+        capacity = part["capacity"].to_numpy(np.float64)[:, None, None]
+        restock = part["restock_size"].to_numpy(np.float64)[:, None, None]
+        visits = visit_mask(part["schedule"].tolist())
+
+        shape = (len(part), flow.shape[0], flow.shape[2])
+        stock = np.broadcast_to(np.minimum(target, capacity), shape).copy()
+        empty = np.zeros(shape)
+        full = np.zeros(shape)
+        lost_rentals = np.zeros(shape)
+        lost_returns = np.zeros(shape)
+        moved = np.zeros(shape)
+
+        for t in range(n_slots):
+            stock += flow[:, t]
+
+            lost_rentals += np.maximum(-stock, 0)
+            lost_returns += np.maximum(stock - capacity, 0)
+            np.clip(stock, 0, capacity, out=stock)
+
+            empty += stock == 0
+            full += stock == capacity
+
+            # Trucks move the stock towards the target by at most restock_size
+            visit = visits[:, t % SLOTS_PER_DAY][:, None, None]
+            move = np.where(visit, np.clip(target - stock, -restock, restock), 0)
+            move = np.clip(stock + move, 0, capacity) - stock
+            stock += move
+            moved += np.abs(move)
+
+        results.append(
+            pd.DataFrame(
+                {
+                    "stockout_minutes": empty.sum(axis=(1, 2)) * SLOT_MINUTES,
+                    "overflow_minutes": full.sum(axis=(1, 2)) * SLOT_MINUTES,
+                    "lost_rentals": lost_rentals.sum(axis=(1, 2)),
+                    "lost_returns": lost_returns.sum(axis=(1, 2)),
+                    "bikes_moved": moved.sum(axis=(1, 2)),
+                },
+                index=part.index,
+            )
+        )
+
+    return policies.join(pd.concat(results))
+
+
+if __name__ == "__main__":
+    # python rebalancing.py <timeseries csv> <results csv>
+    stock_df = pd.read_csv(sys.argv[1], index_col=0, header=[0, 1], parse_dates=True)
+    flow = net_flow(stock_df)
+
+    grid = policy_grid(
+        initial_stock=range(0, 41, 5),
+        capacity=[20, 30, 40, 60],
+        restock_size=[0, 5, 10, 20],
+        schedules=[(), (8,), (8, 17), (6, 12, 18), tuple(range(6, 22, 2))],
+    )
+    results = simulate(flow, grid)
+    results.to_csv(sys.argv[2], index=False)
+
+    results["missed_minutes"] = (
+        results["stockout_minutes"] + results["overflow_minutes"]
+    )
+    print(results.sort_values("missed_minutes").head(10).to_string(index=False))
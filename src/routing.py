@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from src.features import FEATURES
+except ModuleNotFoundError:
+    from features import FEATURES
+
+# Model of per-station-cluster regressors (see train.train_clusters) behind
+# the predict() of a single one, so serving loads it from bin/model.bin like
+# any other model. Pickles refer to this module as `routing`, the name the
+# serving code imports it by.
+
+
+class RoutingPredictor:
+    """
+    Rows are dispatched to the model of their station's cluster and the
+    predictions put back in row order. All models were trained with the same
+    station categories, so a station code means the same to each of them.
+    """
+
+    def __init__(self, models, routes, categories):
+        self.models = list(models)
+        # Station name -> index of its model
+        self.routes = dict(routes)
+        # Category lists the station/rideable_type codes refer to
+        self.categories = {name: list(values) for name, values in categories.items()}
+
+        self._code_routes = np.array(
+            [self.routes.get(station, -1) for station in self.categories["station"]]
+        )
+
+    def station_codes(self, X):
+        if isinstance(X, pd.DataFrame):
+            # -1 for stations outside the categories
+            return pd.Index(self.categories["station"]).get_indexer(X["station"])
+
+        # Feature matrix with the categorical columns as codes (see scoring)
+        codes = np.asarray(X)[:, FEATURES.index("station")]
+        return np.where(np.isnan(codes), -1, codes).astype(np.int64)
+
+    def route(self, X):
+        codes = self.station_codes(X)
+        known = (codes >= 0) & (codes < len(self._code_routes))
+        model_idx = np.where(known, self._code_routes[np.where(known, codes, 0)], -1)
+
+        if (model_idx < 0).any():
+            raise ValueError(
+                f"{(model_idx < 0).sum()} rows of stations without a model"
+            )
+
+        return model_idx
+
+    def predict(self, X):
+        model_idx = self.route(X)
+        used = np.unique(model_idx)
+
+        # A single station (serving's usual request) needs no scatter
+        if len(used) == 1:
+            return self.models[used[0]].predict(X)
+
+        out = np.empty(len(model_idx), dtype=np.float32)
+        for i in used:
+            rows = np.flatnonzero(model_idx == i)
+            part = X.iloc[rows] if isinstance(X, pd.DataFrame) else X[rows]
+            out[rows] = self.models[i].predict(part)
+
+        return out
@@ -0,0 +1,127 @@
+import io
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from src.features import FEATURES
+except ModuleNotFoundError:
+    from features import FEATURES
+
+# Scoring of precomputed feature rows straight from binary payloads, without
+# building a DataFrame: rows become one float32 matrix in FEATURES order with
+# the categorical columns as the model's category codes.
+
+NPY = "application/x-npy"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ARROW_FILE = "application/vnd.apache.arrow.file"
+CONTENT_TYPES = [NPY, ARROW_STREAM, ARROW_FILE]
+
+CATEGORICAL = ["station", "rideable_type"]
+
+
+@lru_cache(maxsize=4)
+def model_categories(model, stations, rideable_types):
+    """
+    Category lists the model's codes refer to: those of a routing predictor
+    or stored in the booster (xgboost >= 3.1, trained from a DataFrame), else
+    the given ones, which are the sorted categories training used.
+    """
+
+    # A routing predictor (see routing) keeps the categories of its models
+    if isinstance(getattr(model, "categories", None), dict):
+        return {name: list(model.categories[name]) for name in CATEGORICAL}
+
+    categories = {"station": list(stations), "rideable_type": list(rideable_types)}
+    try:
+        exported = model.get_booster().get_categories(export_to_arrow=True)
+        stored = dict(exported.to_arrow())
+    except (AttributeError, TypeError, ValueError):
+        return categories
+
+    for name in CATEGORICAL:
+        if stored.get(name) is not None:
+            categories[name] = stored[name].to_pylist()
+
+    return categories
+
+
+def check_codes(matrix, categories):
+    for name in CATEGORICAL:
+        codes = matrix[:, FEATURES.index(name)]
+        valid = np.isnan(codes) | ((codes >= 0) & (codes < len(categories[name])))
+        if not valid.all():
+            raise ValueError(f"{name} codes must be in [0, {len(categories[name])})")
+
+
+def matrix_from_npy(body):
+    # A (rows, len(FEATURES)) numeric array, categorical columns as codes
+    if not body.startswith(b"\x93NUMPY"):
+        raise ValueError("Invalid npy payload")
+    try:
+        array = np.load(io.BytesIO(body), allow_pickle=False)
+    except ValueError as err:
+        raise ValueError(f"Invalid npy payload: {err}") from err
+
+    if array.ndim != 2 or array.shape[1] != len(FEATURES):
+        raise ValueError(f"Expected shape (rows, {len(FEATURES)}), got {array.shape}")
+    if array.dtype.kind not in "biuf":
+        raise ValueError(f"Expected a numeric array, got {array.dtype}")
+
+    return np.asarray(array, dtype=np.float32)
+
+
+def matrix_from_arrow(body, categories, file_format=False):
+    """
+    A table with (at least) the FEATURES columns. Categorical columns are
+    codes, or strings (plain or dictionary encoded) mapped to the codes.
+    """
+
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        reader = pa.ipc.open_file if file_format else pa.ipc.open_stream
+        table = reader(pa.BufferReader(body)).read_all()
+    except pa.ArrowInvalid as err:
+        raise ValueError(f"Invalid Arrow payload: {err}") from err
+
+    missing = [name for name in FEATURES if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    matrix = np.empty((table.num_rows, len(FEATURES)), dtype=np.float32)
+    for i, name in enumerate(FEATURES):
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+
+        if name in CATEGORICAL and (
+            pa.types.is_string(column.type) or pa.types.is_large_string(column.type)
+        ):
+            codes = pc.index_in(column, value_set=pa.array(categories[name]))
+            unknown = pc.sum(pc.and_(codes.is_null(), column.is_valid())).as_py()
+            if unknown:
+                raise ValueError(f"{unknown} rows with an unknown {name}")
+            column = codes
+
+        try:
+            column = column.cast(pa.float32())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as err:
+            raise ValueError(f"Column {name} is not numeric") from err
+        matrix[:, i] = column.to_numpy()
+
+    return matrix
+
+
+def score(model, body, content_type, categories):
+    """Predictions (float32) for the rows of a binary payload"""
+
+    if content_type == NPY:
+        matrix = matrix_from_npy(body)
+    else:
+        matrix = matrix_from_arrow(body, categories, content_type == ARROW_FILE)
+
+    check_codes(matrix, categories)
+
+    return np.asarray(model.predict(matrix), dtype=np.float32)
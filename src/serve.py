@@ -1,10 +1,24 @@
-import pickle
+import json
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from predict import Info, predict_day
+import scoring
+from features import FEATURES
+from model_loader import ModelHolder, model_source
+from predict import HISTORY, Info, RangeQuery, predict_day, predict_range
+
+# Seconds between checks for a new model version (0 disables hot reload)
+RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+# Answers kept per worker (0 disables the cache, e.g. to load test model cost)
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "4096"))
 
 
 class PredictResponse(BaseModel):
@@ -12,29 +26,156 @@ class PredictResponse(BaseModel):
     warning: bool
 
 
-try:
-    with open("bin/model.bin", "rb") as f:
-        model = pickle.load(f)
+def warmup(model):
+    # Run one real prediction so the first request on a new model is not cold
+    info = Info(
+        station=HISTORY.stations[0],
+        rideable_type=HISTORY.rideable_types[0],
+        target_date="2025-01-02",
+    )
+    predict_day(model, info)
 
 
+try:
+    holder = ModelHolder(
+        model_source(os.getenv("MODEL_URI", "bin/model.bin")), warmup=warmup
+    )
+
 except FileNotFoundError:
-    with open("model.bin", "rb") as f:
-        model = pickle.load(f)
+    holder = ModelHolder(model_source("model.bin"), warmup=warmup)
 
 
-app = FastAPI(title="citi-bike")
+@lru_cache(maxsize=PREDICT_CACHE_SIZE)
+def cached_predict(
+    model, version, history_version, station, rideable_type, target_date
+):
+    # Keyed by model version (cleared whenever a new version is swapped in) and
+    # by the live history version, so new trip events are never served stale
+    info = Info.model_construct(
+        station=station, rideable_type=rideable_type, target_date=target_date
+    )
+    return tuple(predict_day(model, info))
 
 
-@app.post("/predict")
-def predict(info: Info) -> PredictResponse:
-    prediction = predict_day(model, info)
+holder.on_swap(lambda version: cached_predict.cache_clear())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if RELOAD_INTERVAL > 0:
+        holder.start(RELOAD_INTERVAL)
+    yield
+    holder.stop()
+
+
+app = FastAPI(title="citi-bike", lifespan=lifespan)
+
+
+def respond(model, version, info):
+    prediction = list(
+        cached_predict(
+            model,
+            version,
+            getattr(HISTORY, "version", None),
+            info.station,
+            info.rideable_type,
+            info.target_date,
+        )
+    )
 
     return PredictResponse(prediction=prediction, warning=bool(prediction))
 
 
+@app.post("/predict")
+def predict(info: Info) -> PredictResponse:
+    model, version = holder.get()
+    return respond(model, version, info)
+
+
+@app.post("/predict/batch")
+def predict_batch(infos: list[Info]) -> list[PredictResponse]:
+    # Many queries in one request, all answered by the same model version
+    model, version = holder.get()
+    return [respond(model, version, info) for info in infos]
+
+
+@app.post("/predict/range")
+def predict_range_stream(query: RangeQuery) -> StreamingResponse:
+    """
+    Alerts of every series for each day from start_date to end_date, streamed
+    as NDJSON (one line per day and series, in day order) by one model version
+    """
+
+    model, version = holder.get()
+
+    def lines():
+        for series, day, prediction in predict_range(
+            model, query.series, query.start_date, query.end_date
+        ):
+            line = {
+                "station": series.station,
+                "rideable_type": series.rideable_type,
+                "target_date": day.strftime("%Y-%m-%d"),
+                "prediction": prediction,
+                "warning": bool(prediction),
+                "model_version": version,
+            }
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def score_categories(model):
+    return scoring.model_categories(
+        model, tuple(HISTORY.stations), tuple(HISTORY.rideable_types)
+    )
+
+
+@app.post("/score")
+async def score(request: Request) -> Response:
+    """
+    Precomputed feature rows as an npy array or an Arrow IPC table (see
+    /score/schema), answered with the predictions as raw little-endian float32
+    """
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in scoring.CONTENT_TYPES:
+        raise HTTPException(415, f"Content-Type must be one of {scoring.CONTENT_TYPES}")
+
+    body = await request.body()
+    model, version = holder.get()
+    try:
+        predictions = await run_in_threadpool(
+            scoring.score, model, body, content_type, score_categories(model)
+        )
+    except ImportError as err:
+        raise HTTPException(415, "Arrow payloads need pyarrow") from err
+    except ValueError as err:
+        raise HTTPException(400, str(err)) from err
+
+    return Response(
+        predictions.tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Model-Version": str(version), "X-Rows": str(len(predictions))},
+    )
+
+
+@app.get("/score/schema")
+def score_schema():
+    # Column order of npy payloads, and the category lists codes refer to
+    model, version = holder.get()
+    return {
+        "features": FEATURES,
+        "categories": score_categories(model),
+        "content_types": scoring.CONTENT_TYPES,
+        "response": "<f4",
+        "model_version": version,
+    }
+
+
 @app.get("/health")  # check if the app works
 def health():
-    return {"status": "healthy"}
+    return {"status": "healthy", "model_version": holder.version}
 
 
 if __name__ == "__main__":
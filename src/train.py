@@ -1,10 +1,18 @@
+import os
 import pickle
+from itertools import repeat
 
+import numpy as np
 import pandas as pd
 import xgboost as xgb
 
+try:
+    from src.pools import process_pool
+except ModuleNotFoundError:
+    from pools import process_pool
 
-def train(df, seed=42):
+
+def train(df, seed=42, n_jobs=None):
     features = [col for col in df.columns if col != "target_next_stock"]
 
     X = df[features]
@@ -16,6 +24,7 @@ def train(df, seed=42):
         n_estimators=58,
         max_depth=6,
         learning_rate=0.2089,
+        n_jobs=n_jobs,
     )
 
     model.fit(X, y)
@@ -23,6 +32,43 @@ def train(df, seed=42):
     return model
 
 
+def cluster_stations(df, n_clusters):
+    """
+    Station -> cluster: stations ranked by volume (mean absolute stock change
+    per slot) and cut into contiguous bands of about equal row counts, so
+    similar stations share a model and every cluster trains in similar time.
+    """
+
+    volume = (df["stock"] - df["lag_15m_stock"]).abs()
+    volume = volume.groupby(df["station"], observed=True).mean()
+    volume = volume.sort_values(ascending=False, kind="stable")
+
+    rows = df["station"].value_counts().reindex(volume.index)
+    # Share of the rows before each station's midpoint
+    position = (rows.cumsum() - rows / 2) / rows.sum()
+    band = np.minimum((position * n_clusters).astype(int), n_clusters - 1)
+
+    return dict(zip(volume.index, pd.factorize(band)[0].tolist(), strict=True))
+
+
+def train_clusters(df, clusters, workers=None, seed=42):
+    """
+    One model per cluster (station -> cluster), fitted in a process pool. Each
+    worker's xgboost gets an equal share of the cores, so a run takes about
+    the time of the largest cluster on its share.
+    """
+
+    n_clusters = max(clusters.values()) + 1
+    workers = min(workers or os.cpu_count(), n_clusters)
+    threads = max(os.cpu_count() // workers, 1)
+
+    cluster = df["station"].map(clusters).astype(int)
+    parts = [df[cluster == i] for i in range(n_clusters)]
+
+    with process_pool(workers) as pool:
+        return list(pool.map(train, parts, repeat(seed), repeat(threads)))
+
+
 if __name__ == "__main__":
     df = pd.read_csv("data/2024_top3_fe.csv")
     df["station"] = df["station"].astype("category")
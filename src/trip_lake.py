@@ -0,0 +1,174 @@
+import glob
+import json
+import os
+import sys
+import zlib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from src.atomic import atomic_path
+except ModuleNotFoundError:
+    from atomic import atomic_path
+
+# Local trip lake: raw monthly CSVs rewritten as hive-partitioned parquet,
+#   <root>/trip_date=YYYY-MM-DD/station_bucket=NN/part-<source csv>.parquet
+# A trip is stored under the bucket of each of its stations (start and end),
+# with a `station` column holding that station, so "trips touching stations S"
+# only reads the buckets of S. Files are sorted by station and start time, so
+# the row-group min/max statistics of both prune inside a partition too.
+
+N_BUCKETS = 16
+ROW_GROUP_SIZE = 16_384
+LAKE_FILE = "_lake.json"
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("trip_date", pa.string()), ("station_bucket", pa.int32())]),
+    flavor="hive",
+)
+
+# Columns only used for partitioning/pruning, not part of a trip
+INDEX_COLUMNS = ["station", "primary", "trip_date", "station_bucket"]
+
+
+def bucket_of(station, n_buckets=N_BUCKETS):
+    # Stable across processes (unlike hash())
+    return zlib.crc32(str(station).encode()) % n_buckets
+
+
+def index_trips(df, n_buckets=N_BUCKETS):
+    """One row per (trip, station): the start station copy is the primary one"""
+
+    df = df.copy()
+    df["started_at"] = pd.to_datetime(df["started_at"], format="mixed")
+    df["ended_at"] = pd.to_datetime(df["ended_at"], format="mixed")
+    # Explicit string types, so a partition with only missing values (or numeric
+    # looking ids) gets the same schema as all others
+    for col in df.columns.difference(["started_at", "ended_at"]):
+        if not pd.api.types.is_float_dtype(df[col]) or col.endswith("_id"):
+            df[col] = df[col].astype("string")
+
+    start = df.assign(station=df["start_station_name"], primary=True)
+    # Trips without a start station are kept under their end station
+    end = df.assign(
+        station=df["end_station_name"], primary=df["start_station_name"].isna()
+    )
+    end = end[
+        end["station"].notna()
+        & (end["primary"] | (df["end_station_name"] != df["start_station_name"]))
+    ]
+    # Trips without any station are kept once, as their start copy
+    start = start[start["station"].notna() | start["end_station_name"].isna()]
+
+    rows = pd.concat([start, end], ignore_index=True)
+    rows["trip_date"] = rows["started_at"].dt.strftime("%Y-%m-%d")
+
+    station = rows["station"].fillna("")
+    buckets = {name: bucket_of(name, n_buckets) for name in station.unique()}
+    rows["station_bucket"] = station.map(buckets).astype(int)
+
+    return rows.sort_values(["station", "started_at"], kind="stable")
+
+
+def write_part(table, path):
+    with atomic_path(path) as tmp_path:
+        pq.write_table(
+            table, tmp_path, row_group_size=ROW_GROUP_SIZE, write_statistics=True
+        )
+
+
+def add_month(csv_path, root, n_buckets=N_BUCKETS):
+    """
+    Convert one raw monthly CSV into the lake. Its files are named after the
+    CSV, so converting a month again replaces exactly that month's data.
+    """
+
+    root = Path(root)
+    lake_file = root / LAKE_FILE
+    if lake_file.exists():
+        n_buckets = json.loads(lake_file.read_text())["n_buckets"]
+    else:
+        root.mkdir(parents=True, exist_ok=True)
+        lake_file.write_text(json.dumps({"n_buckets": n_buckets}))
+
+    part = f"part-{Path(csv_path).stem}.parquet"
+    for old in root.glob(f"trip_date=*/station_bucket=*/{part}"):
+        old.unlink()
+
+    rows = index_trips(pd.read_csv(csv_path, low_memory=False), n_buckets)
+
+    for (trip_date, bucket), group in rows.groupby(
+        ["trip_date", "station_bucket"], sort=False
+    ):
+        directory = root / f"trip_date={trip_date}" / f"station_bucket={bucket}"
+        directory.mkdir(parents=True, exist_ok=True)
+
+        table = pa.Table.from_pandas(
+            group.drop(columns=["trip_date", "station_bucket"]), preserve_index=False
+        )
+        write_part(table, directory / part)
+
+    return len(rows)
+
+
+def read_trips(root, stations=None, start=None, end=None):
+    """
+    Trips started between the dates `start` and `end` (inclusive, either may be
+    None) that start or end at one of `stations` (all trips if None). Only the
+    matching date/bucket partitions and row groups are read.
+    """
+
+    root = Path(root)
+    n_buckets = json.loads((root / LAKE_FILE).read_text())["n_buckets"]
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field("trip_date") >= str(pd.Timestamp(start).date()))
+    if end is not None:
+        conditions.append(ds.field("trip_date") <= str(pd.Timestamp(end).date()))
+
+    if stations is None:
+        conditions.append(ds.field("primary"))
+    else:
+        stations = list(stations)
+        buckets = sorted({bucket_of(station, n_buckets) for station in stations})
+        conditions.append(ds.field("station_bucket").isin(buckets))
+        conditions.append(ds.field("station").isin(stations))
+        # A trip between two of the stations is kept once, as its start copy
+        conditions.append(
+            ds.field("primary") | ~ds.field("start_station_name").isin(stations)
+        )
+
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression &= condition
+
+    df = dataset.to_table(filter=expression).to_pandas()
+    df = df.drop(columns=[col for col in INDEX_COLUMNS if col in df.columns])
+
+    return df.sort_values("started_at", kind="stable").reset_index(drop=True)
+
+
+def last_date(root):
+    """Date of the newest trip_date partition (None for an empty lake)"""
+
+    dates = [
+        path.name.removeprefix("trip_date=") for path in Path(root).glob("trip_date=*")
+    ]
+    return max((pd.Timestamp(date).date() for date in dates), default=None)
+
+
+def is_lake(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, LAKE_FILE))
+
+
+if __name__ == "__main__":
+    # python trip_lake.py <lake dir> <monthly csv>...
+    for pattern in sys.argv[2:]:
+        for path in sorted(glob.glob(pattern)):
+            print(f"{path}: {add_month(path, sys.argv[1])} rows")
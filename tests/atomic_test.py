@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+from src.atomic import atomic_path
+
+
+def test_atomic_path(tmp_path):
+    path = tmp_path / "model.bin"
+    path.write_bytes(b"old")
+
+    # A failed write leaves the old file and no temp file behind
+    with pytest.raises(RuntimeError), atomic_path(path) as tmp:
+        with open(tmp, "wb") as f_out:
+            f_out.write(b"partial")
+        raise RuntimeError("interrupted")
+
+    assert path.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["model.bin"]
+
+    with atomic_path(path) as tmp, open(tmp, "wb") as f_out:
+        assert os.path.basename(tmp).startswith(".")
+        f_out.write(b"new")
+
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["model.bin"]
+    assert path.stat().st_mode & 0o777 == 0o644
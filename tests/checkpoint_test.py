@@ -0,0 +1,93 @@
+import importlib
+import sys
+
+import pandas as pd
+import pytest
+
+from src import checkpoint, data_processing, parallel_processing
+
+pytest.importorskip("pyarrow")
+
+STAGES = [
+    data_processing.preprocess,
+    data_processing.remove_outlier,
+    data_processing.feature_time_series,
+    data_processing.wide_to_long,
+    data_processing.feature_engineering,
+]
+
+
+@pytest.fixture
+def raw_df(make_trips):
+    stations = ["St1", "St2", "St3", "St4"]
+    return make_trips(
+        [3], stations, n=1000, days=3, weights=[0.4, 0.3, 0.2, 0.1], seed=7
+    )
+
+
+def test_resume_matches_uncached(raw_df, tmp_path):
+    expected = data_processing.pipeline(raw_df.copy())
+
+    actual = checkpoint.run_stages(lambda: raw_df.copy(), "src", STAGES, tmp_path)
+    pd.testing.assert_frame_equal(actual, expected)
+
+    # Resume from every intermediate checkpoint (e.g. a retry after a failure)
+    keys = []
+    for stage in STAGES:
+        keys.append(checkpoint.stage_key(keys[-1] if keys else "src", stage))
+
+    for key in reversed(keys[1:]):
+        checkpoint.path_of(key, tmp_path).unlink()
+
+        def fail():
+            raise AssertionError("source loaded although a stage is cached")
+
+        actual = checkpoint.run_stages(fail, "src", STAGES, tmp_path)
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_key_changes_with_input(tmp_path):
+    path = tmp_path / "trips.csv"
+    path.write_text("a\n1\n")
+    key = checkpoint.file_key(path)
+
+    path.write_text("a\n2\n")
+    assert checkpoint.file_key(path) != key
+
+    assert checkpoint.stage_key(key, data_processing.preprocess) != (
+        checkpoint.stage_key(key, data_processing.remove_outlier)
+    )
+
+
+def test_key_changes_with_imported_module(tmp_path, monkeypatch):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "ckpt_helper.py").write_text("SCALE = 2\n")
+    (package / "ckpt_stage.py").write_text(
+        "try:\n"
+        "    from pkg.ckpt_helper import SCALE\n"
+        "except ModuleNotFoundError:\n"
+        "    from ckpt_helper import SCALE\n"
+        "\n"
+        "\n"
+        "def scale(df):\n"
+        "    return df * SCALE\n"
+    )
+    monkeypatch.syspath_prepend(str(package))
+    for name in ("ckpt_stage", "ckpt_helper"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    stage = importlib.import_module("ckpt_stage").scale
+
+    key = checkpoint.stage_key("src", stage)
+    assert checkpoint.stage_key("src", stage) == key
+
+    # Editing only the imported module invalidates the stage
+    (package / "ckpt_helper.py").write_text("SCALE = 3\n")
+    assert checkpoint.stage_key("src", stage) != key
+
+
+def test_feature_stages_cover_feature_schema():
+    # The feature logic lives in features, outside the stages' own modules
+    for stage in (data_processing.feature_engineering, parallel_processing.pipeline):
+        files = checkpoint.module_files(sys.modules[stage.__module__].__file__)
+        assert "features.py" in {file.name for file in files}
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+class LinearModel:
+    # Depends on the stock and every lag, so window offsets change its output
+    def predict(self, X):
+        lags = X[["lag_15m_stock", "lag_30m_stock", "lag_45m_stock", "lag_60m_stock"]]
+        return (X["stock"] - lags.mean(axis=1) * 0.5 - 5 + X["hour"] * 0.1).to_numpy()
+
+
+@pytest.fixture(scope="session")
+def make_trips():
+    """
+    Synthetic raw trips (the columns of the monthly CSVs) starting in `months`
+    of 2024, anywhere in each month or in its first `days`, between `stations`
+    (names, or a count of St0, St1, ...), start stations drawn with `weights`
+    """
+
+    def make(
+        months,
+        stations,
+        n=2000,
+        days=None,
+        weights=None,
+        max_duration=3600,
+        seed=0,
+    ):
+        rng = np.random.default_rng(seed)
+        if isinstance(stations, int):
+            stations = [f"St{i}" for i in range(stations)]
+
+        month_starts = pd.to_datetime([f"2024-{month:02d}-01" for month in months])
+        spans = [
+            pd.Timedelta(days=days) if days else start + pd.offsets.MonthBegin() - start
+            for start in month_starts
+        ]
+        seconds = np.array([span.total_seconds() for span in spans])
+
+        month = rng.integers(0, len(months), n)
+        offsets = (rng.random(n) * seconds[month]).astype(int)
+        started_at = month_starts[month] + pd.to_timedelta(offsets, unit="s")
+        ended_at = started_at + pd.to_timedelta(
+            rng.integers(60, max_duration, n), unit="s"
+        )
+
+        return pd.DataFrame(
+            {
+                "ride_id": [f"R{seed}-{i}" for i in range(n)],
+                "rideable_type": rng.choice(["classic_bike", "electric_bike"], n),
+                "started_at": started_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "ended_at": ended_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                "start_station_name": rng.choice(stations, n, p=weights),
+                "start_station_id": 1,
+                "end_station_name": rng.choice(stations, n),
+                "end_station_id": 2,
+                "start_lat": 40.1,
+                "start_lng": -73.1,
+                "end_lat": 40.2,
+                "end_lng": -73.2,
+                "member_casual": "member",
+            }
+        )
+
+    return make
+
+
+@pytest.fixture
+def linear_model():
+    return LinearModel()
+
+
+@pytest.fixture
+def write_timeseries():
+    """
+    Writes a wide stock csv (as data/2025_timeseries.csv) of 20 days from
+    2025-03-01 for the given stations and rideable types
+    """
+
+    def write(path, stations, rideable_types, seed=0):
+        rng = np.random.default_rng(seed)
+        index = pd.date_range("2025-03-01", periods=20 * 96, freq="15min")
+        columns = pd.MultiIndex.from_product([stations, rideable_types])
+        flows = rng.integers(-2, 3, (len(index), len(columns)))
+        day = np.repeat(np.arange(20), 96)
+        stock = pd.DataFrame(flows, index=index, columns=columns).groupby(day).cumsum()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        (10 + stock).to_csv(path)
+
+    return write
@@ -132,3 +132,41 @@ def test_feature_engineering(sample_raw_df):
     actual_columns = set(df_out.columns.tolist())
 
     assert actual_columns == expected_columns
+
+
+def test_stock_from_net_flow():
+    slot_time = pd.date_range("2024-01-01", periods=2 * 24 * 4, freq="15min")
+    df = pd.DataFrame(
+        {
+            "slot_time": list(slot_time) * 2,
+            "station": ["St1"] * len(slot_time) * 2,
+            "rideable_type": ["classic_bike"] * len(slot_time)
+            + ["electric_bike"] * len(slot_time),
+            "stock": range(len(slot_time) * 2),
+        }
+    )
+
+    df_out = data_processing.stock_from_net_flow(df)
+
+    assert df_out.shape == (24 * 4, 2)
+    assert df_out.index[0] == pd.Timestamp("2024-01-02")
+    assert set(df_out.columns.tolist()) == set(
+        [("St1", "classic_bike"), ("St1", "electric_bike")]
+    )
+
+
+def test_stock_from_net_flow_fills_initial_stock():
+    slot_time = pd.date_range("2024-01-01", periods=2 * 24 * 4, freq="15min")
+    df = pd.DataFrame(
+        {
+            "slot_time": list(slot_time) + [slot_time[-1]],
+            "station": ["St1"] * len(slot_time) + ["St2"],
+            "rideable_type": "classic_bike",
+            "stock": [5] * len(slot_time) + [7],
+        }
+    )
+
+    df_out = data_processing.stock_from_net_flow(df)
+
+    assert df_out[("St2", "classic_bike")].iloc[:-1].eq(10).all()
+    assert df_out[("St2", "classic_bike")].iloc[-1] == 7
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from src import features
+
+
+def long_stock(days=2):
+    time = pd.date_range("2024-03-01", periods=96 * days, freq="15min")
+    rng = np.random.default_rng(0)
+
+    frames = [
+        pd.DataFrame(
+            {
+                "time": time,
+                "station": station,
+                "rideable_type": rideable_type,
+                "stock": rng.integers(0, 20, len(time)),
+            }
+        )
+        for station in ["St1", "St2"]
+        for rideable_type in ["classic_bike", "electric_bike"]
+    ]
+
+    # Training layout: time-major, series interleaved
+    df = pd.concat(frames).sort_values("time", kind="stable").reset_index(drop=True)
+    for col in features.SERIES:
+        df[col] = df[col].astype("category")
+
+    return df
+
+
+def test_window_matches_bulk():
+    df = long_stock()
+    bulk = features.build_features(df, target=True)
+
+    # One series window, as built at serving time
+    series = (df["station"] == "St2") & (df["rideable_type"] == "electric_bike")
+    window = df[series].reset_index(drop=True)
+    single = features.build_features(window)
+
+    pd.testing.assert_frame_equal(
+        single[features.FEATURES],
+        bulk.loc[series, features.FEATURES].reset_index(drop=True),
+    )
+
+
+def test_lags_and_rush_hours():
+    df = long_stock(days=1)
+    out = features.build_features(df, target=True)
+
+    series = out[(out["station"] == "St1") & (out["rideable_type"] == "classic_bike")]
+    stock = series["stock"].to_numpy(float)
+
+    np.testing.assert_array_equal(series["lag_30m_stock"].to_numpy()[2:], stock[:-2])
+    assert series["lag_30m_stock"].iloc[:2].isna().all()
+    np.testing.assert_array_equal(
+        series["target_next_stock"].to_numpy()[:-1], stock[1:]
+    )
+
+    # Both bounds inclusive
+    rush = series.set_index("hour")["is_rush_hour"]
+    assert rush[7.75] == 0 and rush[8.0] == 1 and rush[10.0] == 1 and rush[10.25] == 0
+    assert rush[19.0] == 1 and rush[19.25] == 0
+
+
+def test_scaled_date():
+    out = features.build_features(long_stock(days=2))
+
+    # Any time of a day scales like the day, as the monitoring day filters expect
+    for time, date in zip(out["time"], out["date"], strict=True):
+        assert features.scaled_date(time) == date
+    assert features.scaled_date(features.DATE_RANGE[0]) == 0
+    assert features.scaled_date(features.DATE_RANGE[1]) == 1
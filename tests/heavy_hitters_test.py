@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from src import data_processing
+from src.heavy_hitters import SpaceSaving, WindowedTopK
+
+
+def zipf_stream(n=50_000, n_items=500, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, n_items + 1) ** 1.2
+    items = np.array([f"St{i}" for i in range(n_items)], dtype=object)
+    return pd.Series(rng.choice(items, n, p=weights / weights.sum()))
+
+
+def check_bounds(summary, stream):
+    true = stream.value_counts()
+    for item, (count, error) in summary.counters.items():
+        assert count - error <= true[item] <= count
+
+
+def test_bounds_and_top():
+    stream = zipf_stream()
+    summary = SpaceSaving(capacity=64)
+    for start in range(0, len(stream), 5000):
+        summary.update(stream.iloc[start : start + 5000])
+
+    check_bounds(summary, stream)
+
+    top = summary.top(3)
+    assert list(top["item"]) == list(stream.value_counts().index[:3])
+    assert top["guaranteed"].all()
+
+
+def test_merge_and_serialize():
+    stream = zipf_stream(seed=1)
+    left, right = SpaceSaving(64), SpaceSaving(64)
+    left.update(stream.iloc[:20_000])
+    right.update(stream.iloc[20_000:])
+
+    merged = SpaceSaving.from_dict(left.merge(right).to_dict())
+
+    assert merged.total == len(stream)
+    check_bounds(merged, stream)
+    assert list(merged.top(3)["item"]) == list(stream.value_counts().index[:3])
+
+
+def test_windowed_matches_exact_month():
+    rng = np.random.default_rng(2)
+    stream = zipf_stream(20_000, 50, seed=2)
+    trips = pd.DataFrame(
+        {
+            "started_at": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 60 * 24 * 3600, len(stream)), unit="s"),
+            "start_station_name": stream,
+        }
+    )
+
+    windowed = WindowedTopK(capacity=64)
+    for start in range(0, len(trips), 5000):
+        chunk = trips.iloc[start : start + 5000]
+        windowed.update(chunk["started_at"], chunk["start_station_name"])
+    windowed = WindowedTopK.loads(windowed.dumps())
+
+    february = trips[trips["started_at"].dt.month == 2]
+    top = windowed.top(3, "2024-02-01", "2024-03-01")
+
+    assert list(top["item"]) == data_processing.top_stations(february)
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+from src import history_store
+
+
+@pytest.fixture
+def stock_df():
+    index = pd.date_range("2025-01-01", periods=8, freq="15min", tz="UTC")
+    columns = pd.MultiIndex.from_tuples(
+        [("St1", "classic_bike"), ("St2", "electric_bike")]
+    )
+    data = [[10 + i, 10 - i] for i in range(8)]
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def test_window(stock_df, tmp_path):
+    path = tmp_path / "history.bin"
+    history_store.write_history(stock_df, path)
+    store = history_store.HistoryStore(path)
+
+    df_out = store.window(
+        "St2", "electric_bike", "2025-01-01 00:20:00", "2025-01-01 01:00:00"
+    )
+
+    assert df_out["stock"].tolist() == [8, 7, 6]
+    assert df_out["time"].iloc[0] == pd.Timestamp("2025-01-01 00:30:00")
+    assert df_out["station"].cat.categories.tolist() == ["St1", "St2"]
+
+
+def test_window_out_of_range(stock_df, tmp_path):
+    path = tmp_path / "history.bin"
+    history_store.write_history(stock_df, path)
+    store = history_store.HistoryStore(path)
+
+    df_out = store.window("St1", "classic_bike", "2024-12-31", "2025-01-01 00:15:00")
+
+    assert df_out["stock"].tolist() == [10, 11]
+    assert store.window("St1", "classic_bike", "2025-02-01", "2025-02-02").empty
+
+
+def test_sharded_history(stock_df, tmp_path):
+    directory = tmp_path / "history"
+    history_store.write_sharded_history(stock_df, directory)
+
+    shard_bytes = 2 + 95  # one day block: int16 base, int8 deltas
+    history = history_store.ShardedHistory(directory, max_bytes=shard_bytes)
+
+    assert history.station_ids == {"St1": 0, "St2": 1}
+
+    df_out = history.window("St2", "electric_bike", "2025-01-01", "2025-01-01 00:15")
+
+    assert df_out["stock"].tolist() == [10, 9]
+    assert df_out["station"].cat.categories.tolist() == ["St1", "St2"]
+    assert df_out["rideable_type"].cat.categories.tolist() == [
+        "classic_bike",
+        "electric_bike",
+    ]
+
+    history.window("St1", "classic_bike", "2025-01-01", "2025-01-01 00:15")
+
+    # Only one shard fits under the cap, the least recently used one is released
+    assert list(history._shards) == [0]
+
+    # A station x type pair without a series reads as the initial stock
+    df_out = history.window("St1", "electric_bike", "2025-01-01", "2025-01-01 00:15")
+    assert df_out["stock"].tolist() == [10, 10]
+
+
+def test_day_blocks(tmp_path):
+    index = pd.date_range("2025-01-01", periods=96 * 2 + 10, freq="15min")
+    columns = pd.MultiIndex.from_tuples([("St1", "classic_bike")])
+    stock = [(i * 7) % 300 - 150 for i in range(len(index))]
+    stock_df = pd.DataFrame({columns[0]: stock}, index=index)
+
+    path = tmp_path / "history.bin"
+    history_store.write_day_blocks(stock_df, path)
+    store = history_store.open_store(path)
+
+    assert isinstance(store, history_store.DayBlockStore)
+    assert store.nbytes == 3 * (2 + 95 * 2)  # deltas beyond int8 widen to int16
+
+    df_out = store.window("St1", "classic_bike", "2025-01-01 23:00", "2025-01-03 02:00")
+
+    assert df_out["stock"].tolist() == stock[92:201]
+    assert df_out["time"].iloc[0] == pd.Timestamp("2025-01-01 23:00")
+    assert store.window("St1", "classic_bike", "2025-02-01", "2025-02-02").empty
+
+
+def test_day_blocks_require_midnight(stock_df, tmp_path):
+    with pytest.raises(ValueError, match="midnight"):
+        history_store.write_day_blocks(stock_df.iloc[1:], tmp_path / "history.bin")
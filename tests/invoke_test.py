@@ -0,0 +1,85 @@
+import importlib
+import io
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("boto3")
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+
+class StubLambda:
+    """
+    Answers each batch with one result per query (its date), slower for the
+    earlier batches so they complete out of order; a batch holding a query
+    for `fail_station` fails as an unhandled function error.
+    """
+
+    def __init__(self, fail_station=None):
+        self.fail_station = fail_station
+        self.payloads = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        batch = json.loads(Payload)
+        self.payloads.append(batch)
+
+        if any(query["station"] == self.fail_station for query in batch):
+            body = {"errorMessage": "boom", "errorType": "KeyError"}
+            return {"FunctionError": "Unhandled", "Payload": self.payload(body)}
+
+        time.sleep(0.02 / (1 + int(batch[0]["target_date"][-2:])))
+        results = [
+            {"id": i, "date": query["target_date"]} for i, query in enumerate(batch)
+        ]
+        return {"Payload": self.payload({"results": results})}
+
+    @staticmethod
+    def payload(body):
+        return io.BytesIO(json.dumps(body).encode())
+
+
+def queries(n):
+    return [
+        {
+            "station": f"St{i % 3}",
+            "rideable_type": "classic_bike",
+            "target_date": f"2025-03-{i + 1:02d}",
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def invoke(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.syspath_prepend(SRC)
+    sys.modules.pop("invoke", None)
+    yield importlib.import_module("invoke")
+    sys.modules.pop("invoke", None)
+
+
+def test_invoke_many_keeps_order(invoke, monkeypatch):
+    client = StubLambda()
+    monkeypatch.setattr(invoke, "lambda_client", client)
+
+    results = invoke.invoke_many(queries(25), batch_size=4, max_workers=4)
+
+    assert [result["date"] for result in results] == [
+        query["target_date"] for query in queries(25)
+    ]
+    assert sorted(len(batch) for batch in client.payloads) == [1, 4, 4, 4, 4, 4, 4]
+
+
+def test_invoke_batch_names_failed_batch(invoke, monkeypatch):
+    monkeypatch.setattr(invoke, "lambda_client", StubLambda(fail_station="St2"))
+    batch = queries(3)
+
+    with pytest.raises(RuntimeError, match=r"Batch 7 \(3 queries .*Unhandled: boom"):
+        invoke.invoke_batch(7, batch)
+
+    with pytest.raises(RuntimeError, match=r"Batch 1 \(2 queries"):
+        invoke.invoke_many(queries(4), batch_size=2)
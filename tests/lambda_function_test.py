@@ -0,0 +1,107 @@
+import base64
+import importlib
+import json
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+STATIONS = ["St1", "St2"]
+TYPES = ["classic_bike", "electric_bike"]
+
+QUERIES = [
+    {"station": "St1", "rideable_type": "classic_bike", "target_date": "2025-03-03"},
+    {"station": "St2", "rideable_type": "electric_bike", "target_date": "2025-03-05"},
+]
+BAD_QUERY = {"station": "Nowhere", "rideable_type": "classic_bike", "target_date": "x"}
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch, write_timeseries, linear_model):
+    # The image's working directory: history csv and model.bin next to the code
+    write_timeseries(tmp_path / "2025_timeseries.csv", STATIONS, TYPES)
+    (tmp_path / "model.bin").write_bytes(pickle.dumps(None))
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(SRC)
+    sys.modules.pop("lambda_function", None)
+    module = importlib.import_module("lambda_function")
+    monkeypatch.setattr(module, "model", linear_model)
+    yield module
+    sys.modules.pop("lambda_function", None)
+
+
+def expected(handler, query):
+    prediction = handler.predict_day(handler.model, handler.Info(**query))
+    return {"prediction": prediction, "warning": bool(prediction)}
+
+
+def test_single_query(handler):
+    assert handler.lambda_handler(QUERIES[0], None) == expected(handler, QUERIES[0])
+    http = {"body": json.dumps(QUERIES[0])}
+    assert handler.lambda_handler(http, None) == expected(handler, QUERIES[0])
+
+
+@pytest.mark.parametrize("http", [False, True])
+def test_batch_of_queries(handler, http):
+    event = {"body": json.dumps(QUERIES)} if http else QUERIES
+
+    response = handler.lambda_handler(event, None)
+
+    assert response == {
+        "results": [
+            {"id": i, **expected(handler, query)} for i, query in enumerate(QUERIES)
+        ]
+    }
+    assert any(result["prediction"] for result in response["results"])
+
+
+def test_invalid_query_fails_alone(handler):
+    response = handler.lambda_handler([QUERIES[0], BAD_QUERY], None)
+
+    first, second = response["results"]
+    assert first == {"id": 0, **expected(handler, QUERIES[0])}
+    assert second["id"] == 1
+    assert "Unknown station" in second["error"]
+    assert "batchItemFailures" not in response
+
+
+def test_sqs_records(handler):
+    event = {
+        "Records": [
+            {"messageId": "m1", "body": json.dumps(QUERIES[0])},
+            {"messageId": "m2", "body": json.dumps(BAD_QUERY)},
+            {"messageId": "m3", "body": "not json"},
+            {"messageId": "m4", "body": json.dumps(QUERIES[1])},
+        ]
+    }
+
+    response = handler.lambda_handler(event, None)
+
+    results = {result["id"]: result for result in response["results"]}
+    assert list(results) == ["m1", "m2", "m3", "m4"]
+    assert results["m1"] == {"id": "m1", **expected(handler, QUERIES[0])}
+    assert results["m4"] == {"id": "m4", **expected(handler, QUERIES[1])}
+    assert "error" in results["m2"] and "error" in results["m3"]
+    # Only the failed messages are retried
+    assert response["batchItemFailures"] == [
+        {"itemIdentifier": "m2"},
+        {"itemIdentifier": "m3"},
+    ]
+
+
+def test_kinesis_records(handler):
+    def record(sequence_number, query):
+        data = base64.b64encode(json.dumps(query).encode()).decode()
+        return {"kinesis": {"sequenceNumber": sequence_number, "data": data}}
+
+    event = {"Records": [record("1", QUERIES[1]), record("2", BAD_QUERY)]}
+
+    response = handler.lambda_handler(event, None)
+
+    assert response["results"][0] == {"id": "1", **expected(handler, QUERIES[1])}
+    assert response["results"][1]["id"] == "2"
+    assert response["batchItemFailures"] == [{"itemIdentifier": "2"}]
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from src import data_processing
+
+pl = pytest.importorskip("polars")
+
+from src import lazy_processing  # noqa: E402
+
+
+@pytest.fixture
+def raw_df(make_trips):
+    stations = ["St1", "St2", "St3", "St4", "St5"]
+    return make_trips(
+        [3], stations, n=2000, days=4, weights=[0.4, 0.3, 0.2, 0.05, 0.05], seed=42
+    )
+
+
+def sort_rows(df):
+    df = df.copy()
+    for col in ["station", "rideable_type"]:
+        df[col] = df[col].astype(str)
+    return df.sort_values(["date", "hour", "station", "rideable_type"]).reset_index(
+        drop=True
+    )
+
+
+def test_pipeline_matches_pandas(raw_df, tmp_path):
+    expected = data_processing.pipeline(raw_df.copy())
+
+    path = tmp_path / "trips.csv"
+    raw_df.to_csv(path, index=False)
+
+    for source in [raw_df.copy(), str(path)]:
+        actual = lazy_processing.pipeline(source)
+
+        assert actual.columns.tolist() == expected.columns.tolist()
+        pd.testing.assert_frame_equal(
+            sort_rows(actual), sort_rows(expected), check_dtype=False
+        )
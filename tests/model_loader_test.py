@@ -0,0 +1,43 @@
+import pickle
+
+from src import model_loader
+
+
+def write_model(path, model):
+    with open(path, "wb") as f_out:
+        pickle.dump(model, f_out)
+
+
+def test_hot_reload(tmp_path):
+    path = tmp_path / "model.bin"
+    write_model(path, {"name": "v1"})
+
+    swapped = []
+    holder = model_loader.ModelHolder(model_loader.FileSource(path))
+    holder.on_swap(swapped.append)
+    model, version = holder.get()
+
+    assert model == {"name": "v1"}
+    assert not holder.check()
+
+    write_model(path, {"name": "v2"})
+
+    assert holder.check()
+    assert holder.get()[0] == {"name": "v2"}
+    assert swapped == [holder.version]
+    assert holder.version != version
+
+
+def test_failed_reload_keeps_model(tmp_path):
+    path = tmp_path / "model.bin"
+    write_model(path, {"name": "v1"})
+
+    def warmup(model):
+        if model["name"] == "broken":
+            raise ValueError("warmup failed")
+
+    holder = model_loader.ModelHolder(model_loader.FileSource(path), warmup=warmup)
+    write_model(path, {"name": "broken"})
+
+    assert not holder.check()
+    assert holder.get()[0] == {"name": "v1"}
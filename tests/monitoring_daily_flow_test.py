@@ -0,0 +1,39 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("pyarrow")
+
+from flows import monitoring_daily_flow  # noqa: E402
+from src import trip_lake  # noqa: E402
+
+STATIONS = ["St1", "St2", "St3"]
+
+
+def test_partial_last_day_is_not_evaluated(tmp_path, make_trips):
+    # Three full days, then a lake written at 09:00 of the fourth
+    csv = tmp_path / "202403-citibike-tripdata.csv"
+    df = make_trips([3], STATIONS, n=2400, days=4)
+    df[df["started_at"] < "2024-03-04 09:00"].to_csv(csv, index=False)
+    lake = tmp_path / "lake"
+    trip_lake.add_month(csv, lake)
+
+    until = monitoring_daily_flow.complete_until(lake, datetime.date(2024, 3, 10))
+    assert until == datetime.date(2024, 3, 4)
+    # Nor today, while it is still going on
+    today = datetime.date(2024, 3, 3)
+    assert monitoring_daily_flow.complete_until(lake, today) == today
+
+    summary = {"stations": STATIONS, "duration_mean": 15.0, "duration_std": 60.0}
+    df = trip_lake.read_trips(lake, STATIONS)
+    watermark = datetime.date(2024, 3, 1)
+
+    _, days = monitoring_daily_flow.featurize.fn(df, summary, watermark, until)
+    assert days == [datetime.date(2024, 3, 2), datetime.date(2024, 3, 3)]
+
+    # Once the day is complete (the next one has started) it is evaluated
+    _, days = monitoring_daily_flow.featurize.fn(
+        df, summary, watermark, datetime.date(2024, 3, 5)
+    )
+    assert days[-1] == datetime.date(2024, 3, 4)
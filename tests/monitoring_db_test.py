@@ -0,0 +1,103 @@
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from flows import monitoring_db  # noqa: E402
+
+
+class RecordingCursor:
+    # Enough of a psycopg2 cursor for execute_values
+    connection = SimpleNamespace(encoding="UTF8")
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        self.statements.append((sql, params))
+
+    def mogrify(self, template, args):
+        return repr(tuple(args)).encode()
+
+
+def test_period_bounds():
+    days = [datetime.date(2025, 1, 30), datetime.date(2025, 2, 3)]
+
+    assert monitoring_db.period_bounds(days, "week") == (
+        datetime.datetime(2025, 1, 27),
+        datetime.datetime(2025, 2, 10),
+    )
+    assert monitoring_db.period_bounds(days, "month") == (
+        datetime.datetime(2025, 1, 1),
+        datetime.datetime(2025, 3, 1),
+    )
+    assert monitoring_db.next_month(datetime.datetime(2025, 12, 1)) == (
+        datetime.datetime(2026, 1, 1)
+    )
+
+
+def test_write_metrics():
+    cur = RecordingCursor()
+    day = datetime.datetime(2025, 12, 31)
+    monitoring_db.write_metrics(
+        cur, performance_rows=[(day, 1.5, 1.0, 4.0)], version="abc123"
+    )
+    sql = [statement for statement, _ in cur.statements]
+
+    # Partitions of the month, then the upsert, then both rollups
+    assert "model_performance_2025_12 partition of model_performance" in sql[2]
+    assert "for values from ('2025-12-01') to ('2026-01-01')" in sql[2]
+    assert sql[3].startswith("INSERT INTO model_performance (timestamp, station")
+    assert f"'{monitoring_db.ALL_STATIONS}', 'abc123', 1.5" in sql[3]
+    assert "ON CONFLICT (timestamp, station, model_version)" in sql[3]
+    assert [statement.split()[2] for statement in sql[4:]] == [
+        "model_performance_weekly",
+        "model_performance_monthly",
+    ]
+    assert cur.statements[-1][1] == (
+        datetime.datetime(2025, 12, 1),
+        datetime.datetime(2026, 1, 1),
+    )
+
+
+def test_schema_keys():
+    statements = "\n".join(monitoring_db.schema_statements())
+
+    assert statements.count("PARTITION BY RANGE (timestamp)") == 3
+    assert "PRIMARY KEY (timestamp, station, model_version, column_name)" in statements
+    assert (
+        "PRIMARY KEY (period_start, station, model_version, column_name)" in statements
+    )
+
+
+def test_write_station_metrics():
+    cur = RecordingCursor()
+    day = datetime.datetime(2025, 3, 4)
+    monitoring_db.write_metrics(
+        cur,
+        performance_rows=[(day, 1.5, 1.0, 4.0)],
+        version="abc123",
+        station_performance_rows=[
+            ("St1", (day, 1.0, 0.5, 2.0)),
+            ("St2", (day, 2.0, 1.5, 4.0)),
+        ],
+    )
+    upserts = [
+        sql
+        for sql, _ in cur.statements
+        if sql.startswith("INSERT INTO model_performance ")
+    ]
+
+    # One upsert per station, each row under its own station
+    assert len(upserts) == 3
+    assert f"'{monitoring_db.ALL_STATIONS}', 'abc123', 1.5" in upserts[0]
+    assert "'St1', 'abc123', 1.0" in upserts[1]
+    assert "'St2', 'abc123', 2.0" in upserts[2]
+    # The rollups are refreshed once for all of them
+    rollups = [
+        sql.split()[2] for sql, _ in cur.statements if "_weekly" in sql.split()[2]
+    ]
+    assert rollups == ["model_performance_weekly"]
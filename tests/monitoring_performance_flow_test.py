@@ -0,0 +1,31 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("evidently")
+pytest.importorskip("psycopg2")
+
+from flows import monitoring_performance_flow  # noqa: E402
+from src.features import scaled_date  # noqa: E402
+
+
+def test_station_performance_rows():
+    days = [datetime.datetime(2025, 3, 4), datetime.datetime(2025, 3, 5)]
+    df = pd.DataFrame(
+        {
+            "station": pd.Categorical(["St1", "St1", "St2", "St2", "St1", "St3"]),
+            "date": [scaled_date(days[0])] * 4 + [scaled_date(days[1])] * 2,
+            "target_next_stock": [10.0, 12.0, 5.0, np.nan, 7.0, 3.0],
+            "predict": [11.0, 9.0, 5.5, 4.0, 7.0, 3.0],
+        }
+    )
+
+    rows = monitoring_performance_flow.station_performance_rows(df, days[0])
+
+    # Only the day's rows with a target, one row per station
+    assert rows == [
+        ("St1", (days[0], float(np.sqrt(5)), 2.0, 3.0)),
+        ("St2", (days[0], 0.5, 0.5, 0.5)),
+    ]
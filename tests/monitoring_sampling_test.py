@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from flows import monitoring_sampling
+
+
+def reference(n_days=14):
+    time = pd.date_range("2024-03-04", periods=n_days * 96, freq="15min")
+    # Fractional hours, as built by features.build_features
+    hour = time.hour + time.minute / 60
+    frames = []
+    for station, rideable_type, scale in [
+        ("St1", "classic_bike", 1),
+        ("St1", "electric_bike", 2),
+        ("St2", "classic_bike", 3),
+    ]:
+        frames.append(
+            pd.DataFrame(
+                {
+                    "station": station,
+                    "rideable_type": rideable_type,
+                    "hour": hour,
+                    "dayofweek": time.dayofweek,
+                    "stock": scale * (time.hour + np.arange(len(time)) % 5),
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_allocate():
+    counts = pd.Series([50, 30, 15, 5])
+
+    assert monitoring_sampling.allocate(counts, 10).tolist() == [5, 3, 1, 1]
+    assert monitoring_sampling.allocate(counts, 200).tolist() == [50, 30, 15, 5]
+    assert monitoring_sampling.allocate(counts, 3).sum() == 3
+
+    # More strata than rows: seeded draws, at most one row each here
+    many = pd.Series(np.full(1000, 10))
+    quota = monitoring_sampling.allocate(many, 100, rng=0)
+    assert quota.sum() == 100
+    assert quota.isin([0, 1]).all()
+    assert quota.equals(monitoring_sampling.allocate(many, 100, rng=0))
+    assert not quota.equals(monitoring_sampling.allocate(many, 100, rng=1))
+
+
+def test_stratified_sample():
+    df = reference()
+    sample = monitoring_sampling.stratified_sample(df, size=1008, seed=1)
+
+    assert len(sample) == 1008
+    # 3 series x 7 days x 24 hours (not 15 min slots), each equally large
+    strata = monitoring_sampling.strata_frame(sample)
+    assert strata.groupby(monitoring_sampling.STRATA).size().eq(2).all()
+    assert sample.index.is_monotonic_increasing
+    assert sample.equals(monitoring_sampling.stratified_sample(df, 1008, seed=1))
+    assert not sample.equals(monitoring_sampling.stratified_sample(df, 1008, seed=2))
+
+
+def test_stratified_sample_more_strata_than_rows():
+    time = pd.date_range("2024-03-04", periods=96, freq="15min")
+    stations = [f"S{i:03d}" for i in range(200)]
+    df = pd.DataFrame(
+        {
+            "station": np.repeat(stations, len(time)),
+            "rideable_type": "classic_bike",
+            "hour": np.tile(time.hour + time.minute / 60, len(stations)),
+            "dayofweek": 0,
+        }
+    )
+
+    # 4800 strata for 480 rows: spread over the stations, not the first ones
+    sample = monitoring_sampling.stratified_sample(df, size=480, seed=1)
+
+    assert len(sample) == 480
+    assert sample["station"].nunique() > 150
+    assert sample["station"].isin(stations[-50:]).sum() > 80
+    assert monitoring_sampling.strata_frame(sample).duplicated().sum() == 0
+
+
+def test_fidelity_report():
+    df = reference()
+    df["target_next_stock"] = df["stock"]
+    df["predict"] = df["stock"] + 1.0
+    sample = monitoring_sampling.stratified_sample(df, size=2016)
+
+    report = monitoring_sampling.fidelity_report(df, sample)
+
+    assert report["rows"] == {"full": len(df), "sample": 2016}
+    assert report["columns"]["dayofweek"]["ks"] == 0
+    assert report["columns"]["hour"]["ks"] < 0.01
+    assert report["columns"]["stock"]["ks"] < 0.05
+    assert report["metrics"]["sample"]["mae"] == report["metrics"]["full"]["mae"]
@@ -0,0 +1,185 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import data_processing
+from src.online_features import (
+    FileTail,
+    InProcessQueue,
+    LiveHistory,
+    OnlineStock,
+    start_consumer,
+    trip_events,
+)
+
+STATIONS = ["St1", "St2", "St3"]
+TYPES = ["classic_bike", "electric_bike"]
+
+
+def random_trips(n=4000, days=3, seed=0):
+    rng = np.random.default_rng(seed)
+    started_at = pd.Timestamp("2025-03-01") + pd.to_timedelta(
+        rng.integers(0, days * 24 * 3600, n), unit="s"
+    )
+    ended_at = started_at + pd.to_timedelta(rng.integers(60, 3600, n), unit="s")
+    stations = np.array([*STATIONS, "Other"], dtype=object)
+
+    trips = pd.DataFrame(
+        {
+            "started_at": started_at,
+            "ended_at": ended_at,
+            "start_station_name": rng.choice(stations, n),
+            "end_station_name": rng.choice(stations, n),
+            "rideable_type": rng.choice(TYPES, n),
+        }
+    )
+    # Trips running past the last day are not complete yet
+    return trips[
+        trips["ended_at"] < pd.Timestamp("2025-03-01") + pd.Timedelta(days=days)
+    ]
+
+
+def batch_stock(trips):
+    stock_df = data_processing.feature_time_series(trips, stations=STATIONS)
+    return stock_df.reindex(columns=pd.MultiIndex.from_product([STATIONS, TYPES]))
+
+
+def online_stock(online, series, start, end):
+    return online.window(*series, start, end).set_index("time")["stock"]
+
+
+def test_matches_feature_time_series():
+    trips = random_trips()
+    expected = batch_stock(trips)
+
+    # Events arrive up to a few minutes late and out of order
+    events = trip_events(trips)
+    jitter = np.random.default_rng(1).integers(0, 600, len(events))
+    events = events.iloc[np.argsort(events["time"].astype("int64") + jitter * 10**9)]
+
+    online = OnlineStock(STATIONS, TYPES, window_slots=3 * 96)
+    for event in events.itertuples(index=False):
+        online.apply(event.time, event.station, event.rideable_type, event.flow)
+
+    assert online.dropped == 0
+    for series in expected.columns:
+        actual = online_stock(online, series, expected.index[0], expected.index[-1])
+        np.testing.assert_array_equal(
+            actual.to_numpy(), expected[series].fillna(10).to_numpy()
+        )
+
+
+def test_window_is_bounded():
+    online = OnlineStock(STATIONS, TYPES, window_slots=8)
+    online.apply("2025-03-01 10:05", "St1", "classic_bike", -1)
+    online.apply("2025-03-01 12:20", "St1", "classic_bike", 1)
+    online.apply("2025-03-01 10:20", "St1", "classic_bike", 1)
+
+    assert online.dropped == 1
+
+    df_out = online.window("St1", "classic_bike", "2025-03-01", "2025-03-02")
+    assert len(df_out) == 8
+    assert df_out["time"].iloc[-1] == pd.Timestamp("2025-03-01 12:15")
+    assert df_out["stock"].tolist() == [9] * 7 + [10]
+    assert (
+        online.window("St2", "classic_bike", "2025-03-01", "2025-03-02")["stock"]
+        .eq(10)
+        .all()
+    )
+
+
+def test_live_history_from_sources(tmp_path):
+    trips = random_trips(n=500, days=1)
+    events = trip_events(trips)
+    expected = batch_stock(
+        pd.concat(
+            [
+                trips,
+                trips.assign(
+                    started_at=trips["started_at"] - pd.Timedelta(days=1),
+                    ended_at=trips["ended_at"] - pd.Timedelta(days=1),
+                ),
+            ]
+        )
+    )
+
+    path = tmp_path / "events.ndjson"
+    with open(path, "w") as f_out:
+        for event in events.itertuples(index=False):
+            record = {**event._asdict(), "time": event.time.isoformat()}
+            f_out.write(json.dumps(record) + "\n")
+
+    queue_source = InProcessQueue()
+    for source in [FileTail(path, poll_interval=0.01), queue_source]:
+        online = OnlineStock(STATIONS, TYPES)
+        stop = start_consumer(source, online)
+        if source is queue_source:
+            for event in events.to_dict("records"):
+                queue_source.put(event)
+
+        deadline = time.time() + 10
+        while online.version < events["station"].isin(STATIONS).sum():
+            assert time.time() < deadline
+            time.sleep(0.01)
+        stop.set()
+
+        history = LiveHistory(StaticHistory(), online)
+        df_out = history.window(
+            "St2", "electric_bike", "2025-02-28 23:00", "2025-03-01 23:45"
+        )
+        assert (
+            df_out["stock"].tolist()
+            == [-1] * 4 + expected[("St2", "electric_bike")].tolist()
+        )
+
+
+class StaticHistory:
+    stations = STATIONS
+    rideable_types = TYPES
+    station_ids = {station: i for i, station in enumerate(STATIONS)}
+
+    def window(self, station, rideable_type, start, end):
+        time = pd.date_range(pd.Timestamp(start).ceil("15min"), end, freq="15min")
+        return pd.DataFrame(
+            {
+                "time": time,
+                "station": station,
+                "rideable_type": rideable_type,
+                "stock": -1,
+            }
+        )
+
+
+def test_consumer_skips_bad_events(tmp_path):
+    valid = {
+        "time": "2025-03-01T08:05:00",
+        "station": "St1",
+        "rideable_type": "classic_bike",
+        "flow": -1,
+    }
+    path = tmp_path / "events.ndjson"
+    path.write_text(
+        "{not json\n"
+        + json.dumps({**valid, "time": "yesterday"})
+        + "\n"
+        + json.dumps({"station": "St1"})
+        + "\n"
+        + json.dumps(valid)
+        + "\n"
+    )
+
+    online = OnlineStock(STATIONS, TYPES)
+    stop = start_consumer(FileTail(path, poll_interval=0.01), online)
+
+    deadline = time.time() + 10
+    while online.version < 1:
+        assert time.time() < deadline
+        time.sleep(0.01)
+    stop.set()
+
+    stock = online_stock(
+        online, ("St1", "classic_bike"), "2025-03-01 08:00", "2025-03-01 08:00"
+    )
+    assert stock.tolist() == [9]
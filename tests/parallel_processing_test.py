@@ -0,0 +1,14 @@
+import pandas as pd
+
+from src import data_processing, parallel_processing
+
+
+def test_matches_serial_pipeline(make_trips):
+    # Three months; some trips end after midnight of the month's last day
+    df = make_trips([1, 2, 3], 8, n=6000, max_duration=7200)
+    df.loc[::97, "end_station_name"] = None
+
+    expected = data_processing.pipeline(df.copy())
+    actual = parallel_processing.pipeline(df, workers=2)
+
+    pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,57 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pydantic
+import pytest
+
+SRC = str(Path(__file__).resolve().parent.parent / "src")
+
+STATIONS = ["St1", "St2"]
+TYPES = ["classic_bike", "electric_bike"]
+
+
+@pytest.fixture
+def predict(tmp_path, monkeypatch, write_timeseries):
+    # predict loads its history from data/ at import (flat imports, as served)
+    write_timeseries(tmp_path / "data" / "2025_timeseries.csv", STATIONS, TYPES)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("ONLINE_EVENTS", raising=False)
+    monkeypatch.syspath_prepend(SRC)
+    sys.modules.pop("predict", None)
+    yield importlib.import_module("predict")
+    sys.modules.pop("predict", None)
+
+
+def test_predict_range_matches_predict_day(predict, linear_model):
+    series = [
+        predict.Series(station="St1", rideable_type="classic_bike"),
+        predict.Series(station="St2", rideable_type="electric_bike"),
+    ]
+
+    # Chunks of 3 days: the range spans two chunk boundaries
+    results = list(
+        predict.predict_range(
+            linear_model, series, "2025-03-02", "2025-03-08", chunk_days=3
+        )
+    )
+
+    assert len(results) == 7 * len(series)
+    assert any(alerts for _, _, alerts in results)
+    for one, day, alerts in results:
+        info = predict.Info(
+            station=one.station,
+            rideable_type=one.rideable_type,
+            target_date=day.strftime("%Y-%m-%d"),
+        )
+        assert alerts == predict.predict_day(linear_model, info)
+
+
+def test_range_query_rejects_reversed_dates(predict):
+    with pytest.raises(pydantic.ValidationError, match="before start_date"):
+        predict.RangeQuery(
+            series=[{"station": "St1", "rideable_type": "classic_bike"}],
+            start_date="2025-03-05",
+            end_date="2025-03-01",
+        )
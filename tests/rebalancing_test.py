@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import rebalancing
+
+
+def replay(flow, policy, daily_reset):
+    # Straightforward per-slot replay of one policy, as a reference
+    target = policy["initial_stock"]
+    capacity = policy["capacity"]
+    visits = {int(hour * 4) for hour in policy["schedule"]}
+    totals = dict.fromkeys(
+        ["stockout", "overflow", "lost_rentals", "lost_returns", "moved"], 0.0
+    )
+
+    n_days, n_slots, n_series = flow.shape
+    for s in range(n_series):
+        stock = min(target, capacity)
+        for d in range(n_days):
+            if daily_reset:
+                stock = min(target, capacity)
+            for t in range(n_slots):
+                stock += flow[d, t, s]
+                if stock < 0:
+                    totals["lost_rentals"] -= stock
+                    stock = 0
+                if stock > capacity:
+                    totals["lost_returns"] += stock - capacity
+                    stock = capacity
+                totals["stockout"] += stock == 0
+                totals["overflow"] += stock == capacity
+                if t in visits:
+                    move = max(-policy["restock_size"], target - stock)
+                    move = min(policy["restock_size"], move)
+                    move = min(max(stock + move, 0), capacity) - stock
+                    stock += move
+                    totals["moved"] += abs(move)
+
+    return totals
+
+
+@pytest.mark.parametrize("daily_reset", [True, False])
+def test_simulate_matches_replay(daily_reset):
+    rng = np.random.default_rng(3)
+    flow = rng.integers(-3, 4, size=(3, 96, 2)).astype(float)
+
+    grid = rebalancing.policy_grid(
+        initial_stock=[0, 10],
+        capacity=[8, 15],
+        restock_size=[0, 4],
+        schedules=[(), (8, 17.5)],
+    )
+    results = rebalancing.simulate(flow, grid, daily_reset=daily_reset, chunk=5)
+
+    for _, row in results.iterrows():
+        expected = replay(flow, row, daily_reset)
+        assert row["stockout_minutes"] == expected["stockout"] * 15
+        assert row["overflow_minutes"] == expected["overflow"] * 15
+        assert row["lost_rentals"] == expected["lost_rentals"]
+        assert row["lost_returns"] == expected["lost_returns"]
+        assert row["bikes_moved"] == expected["moved"]
+
+
+def test_net_flow_restores_stock():
+    time = pd.date_range("2025-01-02", periods=96 * 2, freq="15min")
+    columns = pd.MultiIndex.from_tuples([("St1", "classic_bike")])
+    rng = np.random.default_rng(0)
+    flow = rng.integers(-2, 3, size=(2, 96))
+    stock = 10 + flow.cumsum(axis=1)
+
+    stock_df = pd.DataFrame(stock.reshape(-1, 1), index=time, columns=columns)
+
+    np.testing.assert_array_equal(rebalancing.net_flow(stock_df)[..., 0], flow)
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import routing, train
+from src.features import FEATURES
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value, dtype=np.float32)
+
+
+def frame(stations, stock_change):
+    n = 4
+    rows = []
+    for station in stations:
+        for i in range(n):
+            stock = 10 + i * stock_change[station]
+            rows.append(
+                {
+                    "station": station,
+                    "rideable_type": "classic_bike",
+                    "stock": stock,
+                    "hour": i,
+                    "dayofweek": 0,
+                    "is_rush_hour": 0,
+                    "lag_15m_stock": stock - stock_change[station],
+                    "lag_30m_stock": np.nan,
+                    "lag_45m_stock": np.nan,
+                    "lag_60m_stock": np.nan,
+                    "date": 0.0,
+                }
+            )
+
+    df = pd.DataFrame(rows)
+    df["station"] = pd.Categorical(df["station"], categories=sorted(stations))
+    df["rideable_type"] = pd.Categorical(df["rideable_type"])
+    return df
+
+
+def test_cluster_stations():
+    df = frame(["A", "B", "C", "D"], {"A": 1, "B": 4, "C": 3, "D": 0})
+
+    # Volume bands of equal row counts, busiest first
+    assert train.cluster_stations(df, 2) == {"B": 0, "C": 0, "A": 1, "D": 1}
+    assert set(train.cluster_stations(df, 4).values()) == {0, 1, 2, 3}
+
+
+def test_routing_predictor():
+    df = frame(["A", "B", "C"], {"A": 1, "B": 2, "C": 3})
+    predictor = routing.RoutingPredictor(
+        [ConstantModel(1.0), ConstantModel(2.0)],
+        {"A": 0, "B": 1, "C": 0},
+        {"station": ["A", "B", "C"], "rideable_type": ["classic_bike"]},
+    )
+
+    expected = df["station"].map({"A": 1.0, "B": 2.0, "C": 1.0}).astype(float)
+    assert predictor.predict(df[FEATURES]).tolist() == expected.tolist()
+
+    # Code matrices (as built by scoring) are routed by their station codes
+    matrix = (
+        df[FEATURES]
+        .assign(station=df["station"].cat.codes, rideable_type=0)
+        .to_numpy(dtype=np.float32)
+    )
+    assert predictor.predict(matrix).tolist() == expected.tolist()
+
+    unknown = df[FEATURES].assign(station=pd.Categorical(["Z"] * len(df)))
+    with pytest.raises(ValueError, match="without a model"):
+        predictor.predict(unknown)
@@ -0,0 +1,85 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+from src import scoring
+from src.features import FEATURES
+
+pa = pytest.importorskip("pyarrow")
+
+STATIONS = ("St1", "St2", "St3")
+TYPES = ("classic_bike", "electric_bike")
+
+
+@pytest.fixture(scope="module")
+def model_and_rows():
+    rng = np.random.default_rng(0)
+    n = 500
+    df = pd.DataFrame(
+        {
+            "station": pd.Categorical(rng.choice(STATIONS, n), categories=STATIONS),
+            "rideable_type": pd.Categorical(rng.choice(TYPES, n), categories=TYPES),
+            **{name: rng.random(n) * 20 for name in FEATURES[2:]},
+        }
+    )[FEATURES]
+    target = df["stock"] + (df["station"] == "St2") * 5
+
+    model = xgb.XGBRegressor(n_estimators=10, enable_categorical=True)
+    model.fit(df, target)
+
+    return model, df
+
+
+def npy_payload(matrix):
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    return buffer.getvalue()
+
+
+def test_npy_and_arrow_match_dataframe(model_and_rows):
+    model, df = model_and_rows
+    categories = scoring.model_categories(model, STATIONS, TYPES)
+    expected = model.predict(df)
+
+    codes = df.assign(
+        station=df["station"].cat.codes, rideable_type=df["rideable_type"].cat.codes
+    )
+    from_npy = scoring.score(
+        model, npy_payload(codes.to_numpy()), scoring.NPY, categories
+    )
+    np.testing.assert_allclose(from_npy, expected, rtol=1e-6)
+
+    # Strings mapped to the model's codes, columns in any order
+    table = pa.Table.from_pandas(df[FEATURES[::-1]].astype({"station": str}))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    from_arrow = scoring.score(
+        model, sink.getvalue().to_pybytes(), scoring.ARROW_STREAM, categories
+    )
+    np.testing.assert_allclose(from_arrow, expected, rtol=1e-6)
+
+
+def test_rejects_bad_payloads(model_and_rows):
+    model, df = model_and_rows
+    categories = scoring.model_categories(model, STATIONS, TYPES)
+
+    with pytest.raises(ValueError, match="shape"):
+        scoring.score(model, npy_payload(np.zeros((3, 2))), scoring.NPY, categories)
+
+    matrix = np.zeros((3, len(FEATURES)))
+    matrix[0, 0] = 7
+    with pytest.raises(ValueError, match="station codes"):
+        scoring.score(model, npy_payload(matrix), scoring.NPY, categories)
+
+    table = pa.table({name: ["Unknown"] * 3 for name in FEATURES})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    with pytest.raises(ValueError, match="unknown station"):
+        scoring.score(
+            model, sink.getvalue().to_pybytes(), scoring.ARROW_FILE, categories
+        )
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import data_processing
+
+pytest.importorskip("pyarrow")
+
+from src import trip_lake  # noqa: E402
+
+
+def monthly_csv(make_trips, path, month, n=3000, seed=0):
+    df = make_trips([month], 40, n=n, days=7, seed=seed)
+
+    rng = np.random.default_rng(seed)
+    df["start_station_id"] = rng.integers(1000, 9999, n)
+    df["end_station_id"] = rng.integers(1000, 9999, n)
+    df.loc[:9, "start_station_name"] = None
+    df.loc[5:14, "end_station_name"] = None
+
+    df.to_csv(path, index=False)
+
+
+@pytest.fixture(scope="module")
+def lake(tmp_path_factory, make_trips):
+    tmp_path = tmp_path_factory.mktemp("trips")
+    paths = [tmp_path / f"2024{month:02d}-citibike-tripdata.csv" for month in (3, 4)]
+    for month, path in zip((3, 4), paths, strict=True):
+        monthly_csv(make_trips, path, month, seed=month)
+        trip_lake.add_month(path, tmp_path / "lake")
+
+    combined = tmp_path / "combined.csv"
+    pd.concat([pd.read_csv(path) for path in paths]).to_csv(combined, index=False)
+
+    return tmp_path / "lake", combined
+
+
+def ride_ids(df):
+    return sorted(df["ride_id"])
+
+
+@pytest.mark.parametrize(
+    "stations,start,end",
+    [
+        (None, None, None),
+        (["St1", "St2", "St3"], None, None),
+        (["St7"], "2024-03-05", "2024-04-02"),
+        (None, "2024-04-05", "2024-04-05"),
+    ],
+)
+def test_read_matches_csv(lake, stations, start, end):
+    root, combined = lake
+
+    expected = data_processing.read_trips(combined, stations, start, end)
+    actual = data_processing.read_trips(root, stations, start, end)
+
+    assert ride_ids(actual) == ride_ids(expected)
+    assert list(actual.columns) == list(expected.columns)
+
+
+def test_add_month_replaces_its_files(lake):
+    root, _ = lake
+    n_trips = len(trip_lake.read_trips(root))
+
+    trip_lake.add_month(root.parent / "202403-citibike-tripdata.csv", root)
+
+    assert len(trip_lake.read_trips(root)) == n_trips